@@ -5,6 +5,7 @@ class Article(models.Model):
     title = models.CharField(max_length=100)
     body = models.TextField(null=True, blank=True)
     published_date = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def get_absolute_url(self):
         return reverse("blogapp:article", kwargs={"pk": self.pk})
\ No newline at end of file
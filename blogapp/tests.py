@@ -1,3 +1,22 @@
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone, translation
 
-# Create your tests here.
+from .models import Article
+
+
+class ArticlesDetailViewTestCase(TestCase):
+    def test_article_detail_conditional_get(self):
+        article = Article.objects.create(
+            title="Hello", body="World", published_date=timezone.now(),
+        )
+        with translation.override("en"):
+            url = reverse("blogapp:article", kwargs={"pk": article.pk})
+        etag = self.client.get(url)["ETag"]
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        article.title = "Hello again"
+        article.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
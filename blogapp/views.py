@@ -1,8 +1,16 @@
+from functools import partial
+
 from django.contrib.syndication.views import Feed
+from django.http import HttpRequest, HttpResponse
 from django.urls import reverse, reverse_lazy
 from django.views.generic import ListView, DetailView
 
 from blogapp.models import Article
+from mysite.conditional import (
+    collection_validators,
+    conditional_response,
+    object_validators,
+)
 
 
 # Create your views here.
@@ -18,12 +26,30 @@ class ArticlesListView(ListView):
 class ArticlesDetailView(DetailView):
     model = Article
 
+    def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        validators = object_validators(Article.objects, kwargs["pk"])
+        return conditional_response(
+            request,
+            validators,
+            partial(super().get, request, *args, **kwargs),
+        )
+
 
 class LatestArticlesFeed(Feed):
     title = "Blog articles (latest)"
     description = "Updates or change and addition blog articles"
     link = reverse_lazy("blogapp:articles")
 
+    def __call__(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        validators = collection_validators(
+            Article.objects.filter(published_date__isnull=False)
+        )
+        return conditional_response(
+            request,
+            validators,
+            partial(super().__call__, request, *args, **kwargs),
+        )
+
     def items(self):
         return (
         Article.objects
@@ -0,0 +1,60 @@
+from django.contrib import admin
+from django.db.models import QuerySet
+from django.http import HttpRequest
+from django.utils import timezone
+
+from .models import Job
+
+
+@admin.action(description="Retry selected jobs")
+def retry_jobs(modeladmin: admin.ModelAdmin, request: HttpRequest, queryset: QuerySet):
+    """Admin action: queue failed (or stuck) jobs again with fresh attempts."""
+    updated = queryset.exclude(status=Job.STATUS_RUNNING).update(
+        status=Job.STATUS_QUEUED,
+        attempts=0,
+        run_after=timezone.now(),
+        locked_by="",
+        locked_until=None,
+        finished_at=None,
+    )
+    modeladmin.message_user(request, f"{updated} jobs queued again")
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Read-only status page of background jobs."""
+
+    actions = [retry_jobs]
+    list_display = (
+        "pk",
+        "name",
+        "status",
+        "attempts",
+        "created_by",
+        "created_at",
+        "started_at",
+        "finished_at",
+    )
+    list_filter = ("status", "name")
+    list_select_related = ("created_by",)
+    show_full_result_count = False
+    readonly_fields = (
+        "name",
+        "payload",
+        "status",
+        "priority",
+        "attempts",
+        "max_attempts",
+        "run_after",
+        "locked_by",
+        "locked_until",
+        "result",
+        "error",
+        "created_by",
+        "created_at",
+        "started_at",
+        "finished_at",
+    )
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class JobsappConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'jobsapp'
+
+    def ready(self):
+        # Tasks are registered by ``tasks`` modules of the installed apps.
+        autodiscover_modules("tasks")
@@ -0,0 +1,30 @@
+import json
+
+from django.core.management import BaseCommand, CommandError
+
+from jobsapp.registry import enqueue, tasks
+
+
+class Command(BaseCommand):
+    """
+        Queues a registered task, e.g. enqueue_job shopapp.reconcile_order_totals
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("name", nargs="?")
+        parser.add_argument("--payload", default="{}", help="JSON object passed to the task")
+        parser.add_argument("--priority", type=int, default=0)
+        parser.add_argument("--list", action="store_true", help="List registered tasks")
+
+    def handle(self, *args, **options):
+        if options["list"] or not options["name"]:
+            for name, registered in sorted(tasks.items()):
+                self.stdout.write(f"{name} (concurrency={registered.concurrency}, "
+                                  f"max_attempts={registered.max_attempts})")
+            return
+        try:
+            payload = json.loads(options["payload"])
+            job = enqueue(options["name"], payload, priority=options["priority"])
+        except (ValueError, LookupError) as exc:
+            raise CommandError(exc)
+        self.stdout.write(self.style.SUCCESS(f"Done... job {job.pk} queued"))
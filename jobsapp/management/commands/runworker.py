@@ -0,0 +1,36 @@
+import signal
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from jobsapp.runner import Worker
+
+
+class Command(BaseCommand):
+    """
+        Runs background jobs from the jobs table in a process pool
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=settings.JOBS_CONCURRENCY)
+        parser.add_argument("--lease", type=int, default=settings.JOBS_LEASE_SECONDS,
+                            help="Seconds a claimed job stays locked without renewal")
+        parser.add_argument("--poll", type=float, default=1.0,
+                            help="Seconds between polls when the queue is empty")
+        parser.add_argument("--once", action="store_true",
+                            help="Exit when no job is ready to run")
+        parser.add_argument("--max-jobs", type=int, default=None)
+
+    def handle(self, *args, **options):
+        worker = Worker(
+            concurrency=options["concurrency"],
+            lease=options["lease"],
+            poll=options["poll"],
+            stdout=self.stdout,
+        )
+        signal.signal(signal.SIGTERM, worker.stop)
+        signal.signal(signal.SIGINT, worker.stop)
+        self.stdout.write(f"Worker {worker.worker_id} started "
+                          f"with {options['concurrency']} processes")
+        processed = worker.run(once=options["once"], max_jobs=options["max_jobs"])
+        self.stdout.write(self.style.SUCCESS(f"Done... {processed} jobs processed"))
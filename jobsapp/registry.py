@@ -0,0 +1,74 @@
+"""
+Task registry and enqueueing.
+
+A task is a plain function taking the job payload (a JSON-serializable
+dict) and returning a JSON-serializable result::
+
+    @task("shopapp.import_products_csv", concurrency=1)
+    def import_products_csv(payload: dict) -> dict:
+        ...
+
+    enqueue("shopapp.import_products_csv", {"name": name}, user=request.user)
+
+Tasks live in ``tasks`` modules of the installed apps, which are imported
+when the app registry is ready.
+"""
+
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from django.conf import settings
+
+from .models import Job
+
+
+@dataclass(frozen=True)
+class Task:
+    name: str
+    func: Callable[[dict], object]
+    # Maximum number of jobs of this task running at once (None = no limit).
+    concurrency: int | None = None
+    max_attempts: int = 3
+
+
+tasks: dict[str, Task] = {}
+
+
+def task(name: str, concurrency: int | None = None, max_attempts: int = 3):
+    """Register the decorated function as task ``name``."""
+    def decorator(func):
+        tasks[name] = Task(name, func, concurrency, max_attempts)
+        return func
+    return decorator
+
+
+def get_task(name: str) -> Task:
+    try:
+        return tasks[name]
+    except KeyError:
+        raise LookupError(f"Unknown task {name!r}") from None
+
+
+def enqueue(name: str, payload: dict | None = None, user=None, priority: int = 0) -> Job:
+    """
+    Create a queued job for task ``name``.
+
+    The row is written in the caller's transaction, so a worker only
+    sees the job once that transaction commits. With
+    ``JOBS_RUN_INLINE = True`` the job is run right away in this
+    process (tests, local debugging).
+    """
+    registered = get_task(name)
+    job = Job.objects.create(
+        name=name,
+        payload=payload or {},
+        priority=priority,
+        max_attempts=registered.max_attempts,
+        created_by=user if user is not None and user.is_authenticated else None,
+    )
+    if settings.JOBS_RUN_INLINE:
+        from .runner import run_inline
+
+        run_inline(job)
+        job.refresh_from_db()
+    return job
@@ -0,0 +1,325 @@
+"""
+Job worker: leasing, execution, retries.
+
+Claiming is a compare-and-swap ``UPDATE ... WHERE status = <seen status>``,
+so several ``runworker`` processes (or hosts sharing the database) never
+run the same job twice while its lease is valid. The worker renews the
+leases of its running jobs; if it dies, the leases expire and another
+worker picks the jobs up again.
+"""
+
+import logging
+import os
+import socket
+import time
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.db import OperationalError, connections
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import Job
+from .registry import get_task, tasks
+
+log = logging.getLogger(__name__)
+
+# Retries of a write that found SQLite's database locked, and the first pause.
+LOCKED_RETRIES = 5
+LOCKED_RETRY_DELAY = 0.05
+
+
+def init_worker() -> None:
+    """
+    Initializer of pool processes that use the ORM.
+
+    Database connections inherited through ``fork`` belong to the parent:
+    they must neither be used nor closed here, so they are just dropped.
+    With ``spawn`` Django is set up again.
+    """
+    if not apps.ready:
+        django.setup()
+    for conn in connections.all(initialized_only=True):
+        conn.connection = None
+
+
+def make_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff: base, 2*base, 4*base, ..."""
+    return timedelta(seconds=settings.JOBS_RETRY_DELAY * 2 ** max(attempts - 1, 0))
+
+
+def is_locked(exc: BaseException) -> bool:
+    """SQLite's "database is locked": another connection holds the write lock."""
+    return isinstance(exc, OperationalError) and "database is locked" in str(exc)
+
+
+def retry_locked(func, *args, **kwargs):
+    """Call ``func`` again, with backoff, while the database is locked."""
+    for retry in range(LOCKED_RETRIES):
+        try:
+            return func(*args, **kwargs)
+        except OperationalError as exc:
+            if not is_locked(exc) or retry == LOCKED_RETRIES - 1:
+                raise
+            time.sleep(LOCKED_RETRY_DELAY * 2 ** retry)
+
+
+def claimable(now=None):
+    """Jobs that are due, or whose worker lost the lease."""
+    now = now or timezone.now()
+    return Job.objects.filter(
+        Q(status=Job.STATUS_QUEUED, run_after__lte=now)
+        | Q(status=Job.STATUS_RUNNING, locked_until__lt=now, attempts__lt=F("max_attempts"))
+    )
+
+
+def running_counts(now=None) -> dict[str, int]:
+    now = now or timezone.now()
+    return dict(
+        Job.objects
+        .filter(status=Job.STATUS_RUNNING, locked_until__gte=now)
+        .values_list("name")
+        .annotate(count=Count("pk"))
+        .order_by()
+    )
+
+
+def claim_jobs(worker_id: str, limit: int, lease: int) -> list[int]:
+    """
+    Take up to ``limit`` jobs, respecting per-task concurrency limits.
+
+    :return: ids of the claimed jobs
+    """
+    if limit <= 0:
+        return []
+    now = timezone.now()
+    counts = running_counts(now)
+    full = [
+        name for name, registered in tasks.items()
+        if registered.concurrency is not None and counts.get(name, 0) >= registered.concurrency
+    ]
+    candidates = (
+        claimable(now)
+        .exclude(name__in=full)
+        .order_by("-priority", "pk")
+        .values_list("pk", "name", "status")[:limit * 4]
+    )
+    claimed = []
+    for pk, name, status in candidates:
+        if len(claimed) >= limit:
+            break
+        registered = tasks.get(name)
+        if registered is None:
+            Job.objects.filter(pk=pk, status=status).update(
+                status=Job.STATUS_FAILED,
+                error=f"Unknown task {name!r}",
+                finished_at=now,
+            )
+            continue
+        if registered.concurrency is not None and counts.get(name, 0) >= registered.concurrency:
+            continue
+        updated = (
+            claimable(now)
+            .filter(pk=pk, status=status)
+            .update(
+                status=Job.STATUS_RUNNING,
+                locked_by=worker_id,
+                locked_until=now + timedelta(seconds=lease),
+                attempts=F("attempts") + 1,
+                started_at=now,
+            )
+        )
+        if updated:
+            counts[name] = counts.get(name, 0) + 1
+            claimed.append(pk)
+    return claimed
+
+
+def renew_leases(worker_id: str, job_ids, lease: int) -> int:
+    return Job.objects.filter(
+        pk__in=list(job_ids),
+        status=Job.STATUS_RUNNING,
+        locked_by=worker_id,
+    ).update(locked_until=timezone.now() + timedelta(seconds=lease))
+
+
+def fail_expired() -> int:
+    """Mark jobs whose lease expired on their last attempt as failed."""
+    now = timezone.now()
+    return Job.objects.filter(
+        status=Job.STATUS_RUNNING,
+        locked_until__lt=now,
+        attempts__gte=F("max_attempts"),
+    ).update(status=Job.STATUS_FAILED, error="Lease expired", finished_at=now)
+
+
+def record_failure(job_id: int, worker_id: str | None, error: str) -> None:
+    """Requeue the job with a delay, or fail it after the last attempt."""
+    job = Job.objects.filter(pk=job_id).values("attempts", "max_attempts").first()
+    if job is None:
+        return
+    now = timezone.now()
+    jobs = Job.objects.filter(pk=job_id, status=Job.STATUS_RUNNING)
+    if worker_id is not None:
+        jobs = jobs.filter(locked_by=worker_id)
+    if job["attempts"] < job["max_attempts"]:
+        jobs.update(
+            status=Job.STATUS_QUEUED,
+            run_after=now + retry_delay(job["attempts"]),
+            locked_by="",
+            locked_until=None,
+            error=error,
+        )
+    else:
+        jobs.update(
+            status=Job.STATUS_FAILED,
+            locked_until=None,
+            error=error,
+            finished_at=now,
+        )
+
+
+def run_job(job_id: int, worker_id: str | None) -> str:
+    """
+    Execute a claimed job and store its outcome.
+
+    Runs in a pool process. The final update is guarded by the lease
+    owner, so a worker that lost its lease cannot overwrite the result
+    of the worker that took the job over.
+
+    The worker's own bookkeeping writes are retried while the database
+    is locked. A lock error raised by the task is an ordinary failed
+    attempt: the task may have committed part of its work, and only
+    ``max_attempts`` says whether running it again is safe.
+
+    :return: final status
+    """
+    job = Job.objects.get(pk=job_id)
+    try:
+        result = get_task(job.name).func(job.payload)
+    except Exception:
+        log.exception("Job %s (%s) failed", job.pk, job.name)
+        retry_locked(record_failure, job.pk, worker_id, traceback.format_exc(limit=20))
+        return Job.objects.values_list("status", flat=True).get(pk=job_id)
+    jobs = Job.objects.filter(pk=job.pk, status=Job.STATUS_RUNNING)
+    if worker_id is not None:
+        jobs = jobs.filter(locked_by=worker_id)
+    retry_locked(
+        jobs.update,
+        status=Job.STATUS_DONE,
+        result=result,
+        error="",
+        locked_until=None,
+        finished_at=timezone.now(),
+    )
+    return Job.STATUS_DONE
+
+
+def run_inline(job: Job) -> str:
+    """Run a just created job in this process (``JOBS_RUN_INLINE``)."""
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.STATUS_RUNNING,
+        attempts=F("attempts") + 1,
+        started_at=timezone.now(),
+    )
+    return run_job(job.pk, None)
+
+
+class Worker:
+    """
+    Main loop of ``runworker``.
+
+    The parent process only claims jobs and renews leases; jobs run in a
+    process pool of ``concurrency`` processes.
+    """
+
+    def __init__(self, concurrency: int, lease: int, poll: float, stdout=None):
+        self.concurrency = concurrency
+        self.lease = lease
+        self.poll = poll
+        self.stdout = stdout
+        self.worker_id = make_worker_id()
+        self.stopping = False
+        self.in_flight = {}
+
+    def stop(self, *args) -> None:
+        """Stop claiming new jobs; running ones are finished."""
+        self.stopping = True
+
+    def log(self, message: str) -> None:
+        if self.stdout is not None:
+            self.stdout.write(message)
+
+    def run(self, once: bool = False, max_jobs: int | None = None) -> int:
+        """
+        Process jobs until stopped.
+
+        :param once: exit when there is nothing left to run
+        :param max_jobs: exit after this many jobs
+        :return: number of processed jobs
+        """
+        processed = 0
+        last_renewal = timezone.now()
+        executor = self.make_executor()
+        try:
+            while True:
+                claimed = []
+                if not self.stopping and (max_jobs is None or processed + len(self.in_flight) < max_jobs):
+                    fail_expired()
+                    limit = self.concurrency - len(self.in_flight)
+                    if max_jobs is not None:
+                        limit = min(limit, max_jobs - processed - len(self.in_flight))
+                    claimed = claim_jobs(self.worker_id, limit, self.lease)
+                for job_id in claimed:
+                    future = executor.submit(run_job, job_id, self.worker_id)
+                    self.in_flight[future] = job_id
+                    self.log(f"Job {job_id} started")
+
+                if not self.in_flight:
+                    if self.stopping or (once and not claimed):
+                        break
+                    if max_jobs is not None and processed >= max_jobs:
+                        break
+                    # wait([]) returns at once: an idle worker would poll
+                    # the queue (and take the write lock) in a busy loop.
+                    time.sleep(self.poll)
+                    continue
+
+                done, _ = wait(
+                    list(self.in_flight),
+                    timeout=min(self.poll, self.lease / 3),
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    job_id = self.in_flight.pop(future)
+                    processed += 1
+                    try:
+                        self.log(f"Job {job_id} {future.result()}")
+                    except Exception as exc:
+                        # The pool process died (killed, out of memory, ...).
+                        retry_locked(record_failure, job_id, self.worker_id, repr(exc))
+                        self.log(f"Job {job_id} crashed: {exc!r}")
+                        if isinstance(exc, BrokenProcessPool):
+                            executor.shutdown(wait=False, cancel_futures=True)
+                            executor = self.make_executor()
+
+                now = timezone.now()
+                if self.in_flight and (now - last_renewal).total_seconds() >= self.lease / 3:
+                    renew_leases(self.worker_id, self.in_flight.values(), self.lease)
+                    last_renewal = now
+        finally:
+            executor.shutdown(wait=True)
+        return processed
+
+    def make_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.concurrency, initializer=init_worker)
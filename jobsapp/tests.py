@@ -0,0 +1,137 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import OperationalError
+from django.db.models import QuerySet
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone, translation
+
+from .models import Job
+from .registry import enqueue, task
+from .runner import Worker, claim_jobs, run_job
+
+
+@task("jobsapp.tests.echo")
+def echo(payload: dict) -> dict:
+    return {"echo": payload["value"]}
+
+
+@task("jobsapp.tests.single", concurrency=1)
+def single(payload: dict) -> None:
+    return None
+
+
+@task("jobsapp.tests.broken", max_attempts=2)
+def broken(payload: dict) -> None:
+    raise RuntimeError("boom")
+
+
+@task("jobsapp.tests.locked", max_attempts=1)
+def locked(payload: dict) -> None:
+    raise OperationalError("database is locked")
+
+
+class JobLeaseTestCase(TestCase):
+    def test_concurrency_limit_and_expired_lease(self):
+        jobs = [enqueue("jobsapp.tests.single") for _ in range(3)]
+        self.assertEqual(claim_jobs("w1", 5, lease=60), [jobs[0].pk])
+        self.assertEqual(claim_jobs("w2", 5, lease=60), [])
+
+        Job.objects.filter(pk=jobs[0].pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(claim_jobs("w2", 5, lease=60), [jobs[0].pk])
+        job = Job.objects.get(pk=jobs[0].pk)
+        self.assertEqual((job.locked_by, job.attempts), ("w2", 2))
+
+        # w1 lost the lease: its result must not overwrite w2's job
+        run_job(job.pk, "w1")
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.STATUS_RUNNING)
+        run_job(job.pk, "w2")
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.STATUS_DONE)
+
+    def test_failed_job_is_retried_with_delay(self):
+        job = enqueue("jobsapp.tests.broken")
+        claim_jobs("w1", 1, lease=60)
+        with self.assertLogs("jobsapp.runner", "ERROR"):
+            self.assertEqual(run_job(job.pk, "w1"), Job.STATUS_QUEUED)
+        job.refresh_from_db()
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIn("boom", job.error)
+        self.assertEqual(claim_jobs("w1", 1, lease=60), [])
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        claim_jobs("w1", 1, lease=60)
+        with self.assertLogs("jobsapp.runner", "ERROR"):
+            self.assertEqual(run_job(job.pk, "w1"), Job.STATUS_FAILED)
+
+    def test_locked_database_in_task_spends_an_attempt(self):
+        job = enqueue("jobsapp.tests.locked")
+        claim_jobs("w1", 1, lease=60)
+        with self.assertLogs("jobsapp.runner", "ERROR"):
+            self.assertEqual(run_job(job.pk, "w1"), Job.STATUS_FAILED)
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 1)
+        self.assertIn("database is locked", job.error)
+
+    def test_bookkeeping_is_retried_while_locked(self):
+        job = enqueue("jobsapp.tests.echo", {"value": 1})
+        claim_jobs("w1", 1, lease=60)
+        update = QuerySet.update
+        calls = []
+
+        def flaky_update(queryset, **kwargs):
+            calls.append(kwargs.get("status"))
+            if len(calls) == 1:
+                raise OperationalError("database is locked")
+            return update(queryset, **kwargs)
+
+        with patch.object(QuerySet, "update", flaky_update), patch("jobsapp.runner.time.sleep"):
+            self.assertEqual(run_job(job.pk, "w1"), Job.STATUS_DONE)
+        self.assertEqual(calls, [Job.STATUS_DONE, Job.STATUS_DONE])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_DONE, 1))
+
+
+class RunWorkerTestCase(TransactionTestCase):
+    def test_runworker_once_processes_queue(self):
+        jobs = [enqueue("jobsapp.tests.echo", {"value": i}) for i in range(5)]
+        with patch.object(Worker, "make_executor", lambda self: ThreadPoolExecutor(self.concurrency)):
+            call_command("runworker", "--once", "--concurrency", "1", stdout=StringIO())
+        for i, job in enumerate(jobs):
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.result, job.attempts), (Job.STATUS_DONE, {"echo": i}, 1))
+
+    def test_idle_worker_sleeps_between_polls(self):
+        worker = Worker(concurrency=1, lease=60, poll=0.5)
+
+        def sleep(seconds):
+            self.assertEqual(seconds, 0.5)
+            worker.stop()
+
+        with patch.object(Worker, "make_executor", lambda self: ThreadPoolExecutor(self.concurrency)), \
+                patch("jobsapp.runner.time.sleep", side_effect=sleep), \
+                patch("jobsapp.runner.claim_jobs", wraps=claim_jobs) as claims:
+            self.assertEqual(worker.run(), 0)
+        self.assertEqual(claims.call_count, 1)
+
+
+class JobApiTestCase(TestCase):
+    def test_users_see_only_their_jobs(self):
+        owner = User.objects.create_user(username="owner", password="qwerty")
+        other = User.objects.create_user(username="other", password="qwerty")
+        with self.settings(JOBS_RUN_INLINE=True):
+            job = enqueue("jobsapp.tests.echo", {"value": "hi"}, user=owner)
+        with translation.override("en"):
+            url = reverse("jobsapp:job-detail", kwargs={"pk": job.pk})
+
+        self.client.force_login(owner)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()["status"], response.json()["result"]), ("done", {"echo": "hi"}))
+
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(url).status_code, 404)
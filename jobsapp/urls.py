@@ -0,0 +1,13 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+
+from .views import JobViewSet
+
+app_name = "jobsapp"
+
+routers = DefaultRouter()
+routers.register(r"jobs", JobViewSet, basename="job")
+
+urlpatterns = [
+    path("api/", include(routers.urls)),
+]
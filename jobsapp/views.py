@@ -0,0 +1,25 @@
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.viewsets import ReadOnlyModelViewSet
+
+from .models import Job
+from .serializers import JobSerializer
+
+
+class JobViewSet(ReadOnlyModelViewSet):
+    """
+    Status of background jobs.
+
+    Users see the jobs they started, staff see all jobs.
+    """
+
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+    filterset_fields = ["name", "status"]
+
+    def get_queryset(self):
+        queryset = Job.objects.all()
+        if getattr(self, "swagger_fake_view", False):
+            return queryset.none()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(created_by=self.request.user)
+        return queryset
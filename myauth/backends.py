@@ -0,0 +1,87 @@
+"""
+Authentication backend that caches resolved permission sets.
+
+``ModelBackend`` caches permissions only on the user object, so every
+request pays for the user/group permission queries again. Here the
+resolved set is stored in the Django cache under a key that includes:
+
+* the global permissions version, bumped when group permissions,
+  groups or permissions themselves change;
+* the user's own version, bumped when their groups or direct
+  permissions change;
+* ``is_superuser``, since superusers resolve to every permission.
+
+Stale entries are never deleted: a bump just makes them unreachable.
+"""
+
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from mysite.caching import bump_version_on_commit, get_version
+
+PERMISSIONS_CACHE_NAMESPACE = "permissions"
+PERMISSIONS_CACHE_TIMEOUT = 60 * 60
+
+
+def user_namespace(user_id) -> str:
+    return f"{PERMISSIONS_CACHE_NAMESPACE}:user:{user_id}"
+
+
+def invalidate_user_permissions(*user_ids) -> None:
+    """Bumps happen on commit, so no request caches the old rows anew."""
+    for user_id in user_ids:
+        bump_version_on_commit(user_namespace(user_id))
+
+
+def invalidate_all_permissions() -> None:
+    bump_version_on_commit(PERMISSIONS_CACHE_NAMESPACE)
+
+
+def permissions_cache_key(user_obj, kind: str) -> str:
+    """Cache key of the ``kind`` ("user", "group", "all") permission set."""
+    prefix = getattr(user_obj, "_perm_cache_prefix", None)
+    if prefix is None:
+        # Versions are read once per user object, not once per set.
+        prefix = "perms:{version}:{user_version}:{pk}:{superuser:d}".format(
+            version=get_version(PERMISSIONS_CACHE_NAMESPACE),
+            user_version=get_version(user_namespace(user_obj.pk)),
+            pk=user_obj.pk,
+            superuser=user_obj.is_superuser,
+        )
+        user_obj._perm_cache_prefix = prefix
+    return f"{prefix}:{kind}"
+
+
+class CachedPermissionBackend(ModelBackend):
+    """
+    ``ModelBackend`` with permission sets shared across requests.
+
+    Authentication is unchanged. Object permissions and inactive or
+    anonymous users get the empty set, just as in ``ModelBackend``.
+    """
+
+    def _cached(self, user_obj, kind: str, attname: str, resolve) -> set[str]:
+        if not hasattr(user_obj, attname):
+            key = permissions_cache_key(user_obj, kind)
+            perms = cache.get(key)
+            if perms is None:
+                perms = resolve()
+                cache.set(key, perms, PERMISSIONS_CACHE_TIMEOUT)
+            setattr(user_obj, attname, perms)
+        return getattr(user_obj, attname)
+
+    def _get_permissions(self, user_obj, obj, from_name):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        return self._cached(
+            user_obj, from_name, f"_{from_name}_perm_cache",
+            lambda: super(CachedPermissionBackend, self)._get_permissions(user_obj, obj, from_name),
+        )
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        return self._cached(
+            user_obj, "all", "_perm_cache",
+            lambda: super(CachedPermissionBackend, self).get_all_permissions(user_obj),
+        )
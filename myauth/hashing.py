@@ -0,0 +1,61 @@
+"""
+Password hashing off the request path of async views.
+
+Under ASGI, Django runs sync code (``authenticate()``, ``form.save()``)
+with ``sync_to_async(thread_sensitive=True)``: on one shared thread.
+A PBKDF2 round there stalls every sync view and middleware of the
+process. These helpers run such calls in a separate bounded pool of
+``AUTH_HASHING_WORKERS`` threads instead. ``hashlib`` releases the GIL
+while hashing, so the threads really run in parallel and the event
+loop stays responsive.
+
+With ``AUTH_HASHING_WORKERS = 0`` the calls go to Django's sync
+thread as usual (tests: they share the test transaction).
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.db import close_old_connections
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.AUTH_HASHING_WORKERS,
+                thread_name_prefix="auth-hashing",
+            )
+    return _executor
+
+
+def _call(func, *args, **kwargs):
+    # Pool threads live between requests: drop their connections the way
+    # request_started/request_finished do for request threads.
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_hashing(func, *args, **kwargs):
+    """Run a sync call that hashes passwords, without blocking other requests."""
+    if not settings.AUTH_HASHING_WORKERS:
+        return await sync_to_async(func)(*args, **kwargs)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), partial(_call, func, *args, **kwargs))
+
+
+async def aauthenticate(request, **credentials):
+    """``authenticate()`` in the hashing pool."""
+    return await run_hashing(authenticate, request, **credentials)
@@ -0,0 +1,70 @@
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from timeit import default_timer
+
+from django.contrib.sessions.models import Session
+from django.core.management import BaseCommand
+from django.db import connection
+
+from mysite.benchmark import scratch_database
+
+ENGINES = [
+    "django.contrib.sessions.backends.db",
+    "django.contrib.sessions.backends.cache",
+    "django.contrib.sessions.backends.cached_db",
+    "myauth.sessions",
+]
+
+
+def client(engine: str, requests: int, change_every: int) -> int:
+    """One browser: a session read and saved on every request."""
+    store_class = import_module(engine).SessionStore
+    store = store_class()
+    store["foobar"] = "spameggs"
+    store.save()
+    key = store.session_key
+    try:
+        for i in range(requests):
+            store = store_class(key)
+            value = store.get("foobar")
+            # Most views assign the same value again (set_session_view).
+            store["foobar"] = f"spameggs {i}" if change_every and i % change_every == 0 else value
+            store.save()
+    finally:
+        connection.close()
+    return requests
+
+
+def run(engine: str, clients: int, requests: int, change_every: int) -> int:
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        futures = [
+            executor.submit(client, engine, requests, change_every)
+            for _ in range(clients)
+        ]
+        return sum(future.result() for future in futures)
+
+
+class Command(BaseCommand):
+    """
+        Benchmark session engines under concurrent load (requests/s)
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=8)
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--change-every", type=int, default=10,
+                            help="change the session data on every N-th request (0 = never)")
+
+    def handle(self, *args, **options):
+        with scratch_database(on_disk=True):
+            for engine in ENGINES:
+                # Without tracemalloc (measure()): it would dominate the timings.
+                start = default_timer()
+                count = run(engine, options["clients"], options["requests"], options["change_every"])
+                seconds = default_timer() - start
+                self.stdout.write(
+                    f"{engine:>44}: {count} requests in {seconds:.2f}s, "
+                    f"{count / seconds:,.0f} requests/s"
+                )
+                Session.objects.all().delete()
+        self.stdout.write(self.style.SUCCESS("Done..."))
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import User, Group, Permission
 from django.core.management import BaseCommand
 
+from myauth.backends import invalidate_all_permissions
+
 
 class Command(BaseCommand):
     def handle(self, *args, **options):
@@ -24,4 +26,7 @@ class Command(BaseCommand):
         user.user_permissions.add(permission_logentry)
 
         group.save()
-        user.save()
\ No newline at end of file
+        user.save()
+
+        # сбросить кэш прав (m2m_changed не видит изменений, сделанных в обход ORM)
+        invalidate_all_permissions()
@@ -0,0 +1,30 @@
+from pathlib import Path
+
+from django.core.management import BaseCommand
+
+from myauth.provisioning import PROVISION_BATCH_SIZE, bulk_create_users, read_records
+
+
+class Command(BaseCommand):
+    """
+        Provisions users with profiles and groups from a CSV or JSONL file
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", type=Path, help="accounts file (.csv or .jsonl)")
+        parser.add_argument("--batch-size", type=int, default=PROVISION_BATCH_SIZE)
+        parser.add_argument("--workers", type=int, default=None,
+                            help="password hashing threads (default: one per CPU)")
+
+    def handle(self, *args, **options):
+        summary = bulk_create_users(
+            read_records(options["path"]),
+            batch_size=options["batch_size"],
+            workers=options["workers"],
+        )
+        for error in summary.errors:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+        self.stdout.write(
+            f"{summary.created} created, {summary.skipped} skipped, {summary.rejected} rejected"
+        )
+        self.stdout.write(self.style.SUCCESS("Done..."))
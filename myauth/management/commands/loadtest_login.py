@@ -0,0 +1,96 @@
+import asyncio
+import statistics
+import sys
+from timeit import default_timer
+from types import ModuleType
+
+from django.contrib.auth import views as auth_views
+from django.contrib.auth.models import User
+from django.core.management import BaseCommand
+from django.test import AsyncClient, override_settings
+from django.urls import path
+
+from mysite.benchmark import scratch_database
+from myauth.views import FooBarView, LoginView
+
+PASSWORD = "load-test-password"
+
+
+def make_urlconf(name: str, login_view) -> str:
+    """A throwaway URLconf: the login view under test and a cheap sync view."""
+    module = ModuleType(name)
+    module.urlpatterns = [
+        path("login/", login_view, name="login"),
+        path("ping/", FooBarView.as_view(), name="ping"),
+    ]
+    sys.modules[name] = module
+    return name
+
+
+async def login(username: str) -> float:
+    start = default_timer()
+    response = await AsyncClient().post("/login/", {"username": username, "password": PASSWORD})
+    assert response.status_code == 302, response.status_code
+    return default_timer() - start
+
+
+async def ping(stop: asyncio.Event, interval: float) -> list[float]:
+    client = AsyncClient()
+    latencies = []
+    while not stop.is_set():
+        start = default_timer()
+        await client.get("/ping/")
+        latencies.append(default_timer() - start)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def burst(usernames: list[str], interval: float) -> dict:
+    stop = asyncio.Event()
+    pinger = asyncio.create_task(ping(stop, interval))
+    await asyncio.sleep(interval * 5)
+    start = default_timer()
+    try:
+        logins = await asyncio.gather(*(login(username) for username in usernames))
+        seconds = default_timer() - start
+    finally:
+        stop.set()
+    return {"seconds": seconds, "logins": logins, "pings": await pinger}
+
+
+class Command(BaseCommand):
+    """
+        Load test: a burst of concurrent logins over ASGI while a cheap sync
+        view is polled, with the sync LoginView and the async one
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--logins", type=int, default=16)
+        parser.add_argument("--interval", type=float, default=0.01,
+                            help="pause between ping requests, seconds")
+
+    def handle(self, *args, **options):
+        variants = [
+            ("sync LoginView", auth_views.LoginView.as_view(template_name="myauth/login.html")),
+            ("async LoginView", LoginView.as_view()),
+        ]
+        with scratch_database(on_disk=True):
+            usernames = [f"load{i}" for i in range(options["logins"])]
+            for username in usernames:
+                User.objects.create_user(username=username, password=PASSWORD)
+
+            for label, view in variants:
+                urlconf = make_urlconf(f"loadtest_login_urls_{len(label)}", view)
+                with override_settings(
+                    ROOT_URLCONF=urlconf,
+                    ALLOWED_HOSTS=["testserver"],
+                    LOGIN_REDIRECT_URL="/ping/",
+                ):
+                    run = asyncio.run(burst(usernames, options["interval"]))
+                pings = sorted(run["pings"])
+                self.stdout.write(
+                    f"{label:>16}: {len(run['logins'])} logins in {run['seconds']:.2f}s; "
+                    f"ping p50 {statistics.median(pings) * 1000:.0f} ms, "
+                    f"max {pings[-1] * 1000:.0f} ms over {len(pings)} requests"
+                )
+        self.stdout.write(self.style.SUCCESS("Done..."))
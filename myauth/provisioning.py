@@ -0,0 +1,249 @@
+"""
+Bulk provisioning of user accounts from CSV or JSONL.
+
+Every record is one account::
+
+    username,email,password,first_name,last_name,groups
+    alice,alice@example.com,s3cret,Alice,,managers;editors
+
+    {"username": "bob", "password_hash": "pbkdf2_sha256$...", "groups": ["managers"]}
+
+``password`` is hashed here. ``password_hash`` must already be a hash
+produced by a configured hasher and is stored as is. Without either,
+the account gets an unusable password (to be set through a reset).
+
+Records are written in batches, each batch in one transaction: the
+users in one ``bulk_create``, then their profiles and group memberships
+in one ``bulk_create`` each. Hashing is the expensive part (hundreds of
+milliseconds per PBKDF2 password), so a batch is hashed in a thread pool
+while the previous one is written; ``hashlib`` releases the GIL, so the
+threads use all cores.
+"""
+
+import csv
+import json
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.contrib.auth.models import Group, User
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+
+from .models import Profile
+
+PROVISION_BATCH_SIZE = 1000
+PROVISION_MAX_REPORTED_ERRORS = 100
+
+
+@dataclass
+class ProvisionSummary:
+    """Outcome of a provisioning run."""
+
+    created: int = 0
+    skipped: int = 0
+    rejected: int = 0
+    errors: list = field(default_factory=list)
+
+    def reject(self, line: int, error: str) -> None:
+        self.rejected += 1
+        if len(self.errors) < PROVISION_MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": error})
+
+
+@dataclass
+class Account:
+    line: int
+    username: str
+    email: str = ""
+    first_name: str = ""
+    last_name: str = ""
+    password: str | None = None
+    password_hash: str | None = None
+    groups: list[str] = field(default_factory=list)
+
+
+def read_records(path: Path) -> Iterator[tuple[int, dict]]:
+    """
+    ``(line, record)`` pairs of a ``.jsonl`` or CSV file, read lazily.
+
+    A JSONL line that is not valid JSON gives a ``ValidationError`` in
+    place of the record, so that it is rejected like any invalid record
+    instead of stopping the run.
+    """
+    with open(path, encoding="utf-8", newline="") as file:
+        if path.suffix == ".jsonl":
+            for line, text in enumerate(file, start=1):
+                if not text.strip():
+                    continue
+                try:
+                    record = json.loads(text)
+                except json.JSONDecodeError as exc:
+                    record = ValidationError(f"invalid JSON: {exc.msg} (column {exc.colno})")
+                yield line, record
+        else:
+            reader = csv.DictReader(file)
+            for record in reader:
+                yield reader.line_num, record
+
+
+def _text(record: dict, name: str, max_length: int | None = None) -> str:
+    value = record.get(name) or ""
+    if not isinstance(value, str):
+        raise ValidationError(f"{name} must be a string")
+    value = value.strip()
+    if max_length is not None and len(value) > max_length:
+        raise ValidationError(f"{name}: at most {max_length} characters")
+    return value
+
+
+def _user_text(record: dict, name: str) -> str:
+    """A ``User`` field, within the column's length."""
+    return _text(record, name, User._meta.get_field(name).max_length)
+
+
+def coerce_account(line: int, record: dict) -> Account:
+    """
+    Validate a record.
+
+    :raises ValidationError: on a record that is not an object, a missing
+        or invalid username, a malformed email, a field longer than its
+        ``User`` column or a ``password_hash`` no configured hasher
+        recognizes
+    """
+    if isinstance(record, ValidationError):
+        raise record
+    if not isinstance(record, dict):
+        raise ValidationError("record must be a JSON object")
+    username = _user_text(record, "username")
+    if not username:
+        raise ValidationError("username is required")
+    User.username_validator(username)
+    email = _user_text(record, "email")
+    if email:
+        validate_email(email)
+    groups = record.get("groups") or []
+    if isinstance(groups, str):
+        groups = [name.strip() for name in groups.split(";") if name.strip()]
+    if not isinstance(groups, list) or not all(isinstance(name, str) for name in groups):
+        raise ValidationError("groups must be a list of names")
+    password = record.get("password") or None
+    if password is not None and not isinstance(password, str):
+        raise ValidationError("password must be a string")
+    password_hash = _text(record, "password_hash") or None
+    if password_hash:
+        try:
+            identify_hasher(password_hash)
+        except ValueError:
+            raise ValidationError("password_hash: unknown hashing algorithm") from None
+    return Account(
+        line=line,
+        username=username,
+        email=email,
+        first_name=_user_text(record, "first_name"),
+        last_name=_user_text(record, "last_name"),
+        password=password,
+        password_hash=password_hash,
+        groups=groups,
+    )
+
+
+def hash_password(account: Account) -> str:
+    if account.password_hash:
+        return account.password_hash
+    # make_password(None) gives an unusable password.
+    return make_password(account.password)
+
+
+def bulk_create_users(
+    records: Iterable[tuple[int, dict]],
+    batch_size: int = PROVISION_BATCH_SIZE,
+    workers: int | None = None,
+) -> ProvisionSummary:
+    """
+    Create accounts with profiles and group memberships.
+
+    Usernames that already exist (or repeat within the input) are
+    skipped; invalid records are rejected with their line number.
+
+    :param records: ``(line, record)`` pairs, e.g. from ``read_records``
+    :param batch_size: accounts per transaction
+    :param workers: hashing threads (default: one per CPU)
+    """
+    summary = ProvisionSummary()
+    groups = {}
+    seen = set()
+
+    def accounts() -> Iterator[Account]:
+        for line, record in records:
+            try:
+                account = coerce_account(line, record)
+            except ValidationError as exc:
+                summary.reject(line, "; ".join(exc.messages))
+                continue
+            if account.username in seen:
+                summary.skipped += 1
+                continue
+            seen.add(account.username)
+            yield account
+
+    accounts_iter = accounts()
+    batches = iter(lambda: list(islice(accounts_iter, batch_size)), [])
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="provisioning") as executor:
+        pending = None
+        for batch in batches:
+            hashing = executor.map(hash_password, batch)
+            if pending is not None:
+                _write_batch(*pending, groups, summary)
+            # The next batch is hashed while this one is written.
+            pending = (batch, hashing)
+        if pending is not None:
+            _write_batch(*pending, groups, summary)
+    return summary
+
+
+def _write_batch(batch: list[Account], hashes, groups: dict, summary: ProvisionSummary) -> None:
+    hashes = list(hashes)
+    existing = set(
+        User.objects
+        .filter(username__in=[account.username for account in batch])
+        .values_list("username", flat=True)
+    )
+    summary.skipped += len(existing)
+    new = [
+        (account, password)
+        for account, password in zip(batch, hashes)
+        if account.username not in existing
+    ]
+    if not new:
+        return
+
+    missing = {name for account, _ in new for name in account.groups} - groups.keys()
+    if missing:
+        Group.objects.bulk_create([Group(name=name) for name in missing], ignore_conflicts=True)
+        groups.update(Group.objects.filter(name__in=missing).values_list("name", "pk"))
+
+    with transaction.atomic():
+        users = User.objects.bulk_create([
+            User(
+                username=account.username,
+                email=account.email,
+                first_name=account.first_name,
+                last_name=account.last_name,
+                password=password,
+            )
+            for account, password in new
+        ])
+        Profile.objects.bulk_create([Profile(user=user) for user in users])
+        # New users have no cached permissions, so skipping m2m_changed
+        # leaves nothing stale (see myauth.backends).
+        User.groups.through.objects.bulk_create([
+            User.groups.through(user_id=user.pk, group_id=groups[name])
+            for user, (account, _) in zip(users, new)
+            for name in account.groups
+        ])
+    summary.created += len(users)
@@ -0,0 +1,168 @@
+"""
+Session engine: reads from the cache, writes to the database lazily.
+
+``SESSION_ENGINE = "myauth.sessions"``. Like ``cached_db`` the database
+stays the source of truth, but a save only writes the row when it
+would change something:
+
+* the session data differs from what the database holds;
+* the stored expiry date lags the new one by more than
+  ``SESSION_DB_WRITE_INTERVAL`` seconds.
+
+Saves of unchanged sessions (``SESSION_SAVE_EVERY_REQUEST``, views that
+assign the same value again) only refresh the cache, so several workers
+sharing SQLite do not queue up behind each other's session writes. If
+the cache entry is lost, at most the expiry extension of the last
+interval is lost with it, never session data.
+
+Expired rows are deleted in small batches, at most once per
+``SESSION_EXPIRE_INTERVAL`` across all workers, instead of a full
+``clearsessions`` scan.
+"""
+
+import hashlib
+import logging
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.core.cache import caches
+from django.db import router
+from django.utils import timezone
+
+log = logging.getLogger(__name__)
+
+KEY_PREFIX = "myauth.sessions"
+EXPIRE_LOCK_KEY = f"{KEY_PREFIX}:expire-lock"
+
+
+class SessionStore(DBStore):
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        self._cache = caches[settings.SESSION_CACHE_ALIAS]
+        # Digest of the data and expiry date of the database row.
+        self._db_digest = None
+        self._db_expire = None
+        super().__init__(session_key)
+
+    @property
+    def cache_key(self):
+        return f"{self.cache_key_prefix}:{self._get_or_create_session_key()}"
+
+    def digest(self, data: dict) -> str:
+        return hashlib.sha1(self.serializer().dumps(data)).hexdigest()
+
+    def load(self):
+        try:
+            entry = self._cache.get(self.cache_key)
+        except Exception:
+            log.exception("Session cache read failed")
+            entry = None
+        if entry is not None:
+            data, self._db_digest, self._db_expire = entry
+            return data
+
+        session = self._get_session_from_db()
+        if session is None:
+            return {}
+        data = self.decode(session.session_data)
+        self._db_digest, self._db_expire = self.digest(data), session.expire_date
+        self._cache_set(data, self.get_expiry_age(expiry=session.expire_date))
+        return data
+
+    def exists(self, session_key):
+        return (
+            self._cache.has_key(f"{self.cache_key_prefix}:{session_key}")
+            or super().exists(session_key)
+        )
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        digest = self.digest(data)
+        expire_date = self.get_expiry_date()
+        if must_create or self.needs_db_write(digest, expire_date):
+            super().save(must_create=must_create)
+            self._db_digest, self._db_expire = digest, expire_date
+            self.expire_some()
+        self._cache_set(data, self.get_expiry_age())
+
+    def needs_db_write(self, digest: str, expire_date) -> bool:
+        if digest != self._db_digest or self._db_expire is None:
+            return True
+        interval = timedelta(seconds=settings.SESSION_DB_WRITE_INTERVAL)
+        return expire_date - self._db_expire > interval
+
+    def _cache_set(self, data: dict, timeout: int) -> None:
+        # The cached copy must not outlive the row, or it would be served
+        # after the row was expired and deleted.
+        if self._db_expire is not None:
+            timeout = min(timeout, self.get_expiry_age(expiry=self._db_expire))
+        try:
+            self._cache.set(self.cache_key, (data, self._db_digest, self._db_expire), timeout)
+        except Exception:
+            log.exception("Session cache write failed")
+
+    def delete(self, session_key=None):
+        super().delete(session_key)
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        self._cache.delete(f"{self.cache_key_prefix}:{session_key}")
+        self._db_digest = self._db_expire = None
+
+    def flush(self):
+        self.clear()
+        self.delete(self.session_key)
+        self._session_key = None
+
+    def expire_some(self) -> int:
+        """Delete one batch of expired rows, if no worker did recently."""
+        try:
+            if not self._cache.add(EXPIRE_LOCK_KEY, 1, settings.SESSION_EXPIRE_INTERVAL):
+                return 0
+        except Exception:
+            return 0
+        return self.delete_expired(settings.SESSION_EXPIRE_BATCH)
+
+    @classmethod
+    def delete_expired(cls, batch_size: int) -> int:
+        """Delete up to ``batch_size`` expired rows (index on expire_date)."""
+        model = cls.get_model_class()
+        expired = list(
+            model.objects
+            .filter(expire_date__lt=timezone.now())
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not expired:
+            return 0
+        using = router.db_for_write(model)
+        return model.objects.using(using).filter(pk__in=expired).delete()[0]
+
+    @classmethod
+    def clear_expired(cls):
+        """``clearsessions``: the same batches until nothing is left."""
+        while cls.delete_expired(settings.SESSION_EXPIRE_BATCH):
+            pass
+
+    # Async API (alogin, alogout): the same logic on a worker thread,
+    # rather than the database-only versions inherited from the db store.
+
+    async def aload(self):
+        return await sync_to_async(self.load)()
+
+    async def aexists(self, session_key):
+        return await sync_to_async(self.exists)(session_key)
+
+    async def asave(self, must_create=False):
+        return await sync_to_async(self.save)(must_create)
+
+    async def adelete(self, session_key=None):
+        return await sync_to_async(self.delete)(session_key)
+
+    async def aflush(self):
+        return await sync_to_async(self.flush)()
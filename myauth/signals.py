@@ -0,0 +1,48 @@
+"""
+Invalidation of cached permission sets (see ``myauth.backends``).
+"""
+
+from django.contrib.auth.models import Group, Permission, User
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from .backends import invalidate_all_permissions, invalidate_user_permissions
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_user_permission_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    A user's groups or direct permissions changed.
+
+    From the user side only that user is affected. From the group or
+    permission side (``group.user_set.add(...)``) the affected users are
+    ``pk_set``; on clear they are unknown, so everything is invalidated.
+    """
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        invalidate_user_permissions(instance.pk)
+    elif action == "post_clear":
+        invalidate_all_permissions()
+    elif pk_set:
+        invalidate_user_permissions(*pk_set)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_group_permission_cache(sender, action, **kwargs):
+    """Group permissions affect every member of the group."""
+    if action.startswith("post_"):
+        invalidate_all_permissions()
+
+
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+@receiver(post_delete, sender=Group)
+@receiver(post_migrate)
+def invalidate_permission_cache(sender, **kwargs):
+    """
+    Superusers hold every permission (migrate creates them in bulk,
+    without post_save); deletes cascade without m2m_changed.
+    """
+    invalidate_all_permissions()
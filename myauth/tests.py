@@ -1,18 +1,271 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, Permission, User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone, translation
+
+from myauth.models import Profile
+from myauth.sessions import SessionStore
 
 class GetCookieViewTestCase(TestCase):
     def test_get_cookie_view(self):
-        response = self.client.get(reverse("myauth:cookie-get"))
+        with translation.override("en"):
+            response = self.client.get(reverse("myauth:cookie-get"))
         self.assertContains(response, "Cookie value")
 
 
 class FooBarViewTestCase(TestCase):
     def test_foo_bar_view(self):
-        response = self.client.get(reverse("myauth:foo-bar"))
+        with translation.override("en"):
+            response = self.client.get(reverse("myauth:foo-bar"))
         self.assertEqual(response.status_code, 200)
         self.assertEqual(
             response.headers['content-type'], 'application/json',
         )
         expected_data = {"foo": "bar", "spam": "eggs"}
-        self.assertJSONEqual(response.content, expected_data)
\ No newline at end of file
+        self.assertJSONEqual(response.content, expected_data)
+
+
+class CachedPermissionBackendTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="manager", password="qwerty")
+        self.group = Group.objects.create(name="managers")
+        self.group.permissions.add(Permission.objects.get(codename="view_profile"))
+        self.user.groups.add(self.group)
+
+    def fresh_user(self):
+        return User.objects.get(pk=self.user.pk)
+
+    def test_warm_cache_needs_no_queries(self):
+        self.assertTrue(self.fresh_user().has_perm("myauth.view_profile"))
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(user.has_perm("myauth.view_profile"))
+            self.assertFalse(user.has_perm("myauth.change_profile"))
+            self.assertEqual(user.get_group_permissions(), {"myauth.view_profile"})
+
+    def test_permission_changes_invalidate(self):
+        self.assertFalse(self.fresh_user().has_perm("myauth.change_profile"))
+        # Versions are bumped when the change commits.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.permissions.add(Permission.objects.get(codename="change_profile"))
+        self.assertTrue(self.fresh_user().has_perm("myauth.change_profile"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.user_permissions.add(Permission.objects.get(codename="view_logentry"))
+        self.assertTrue(self.fresh_user().has_perm("admin.view_logentry"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.user_set.remove(self.user)
+        self.assertFalse(self.fresh_user().has_perm("myauth.change_profile"))
+
+
+class CachedSessionStoreTestCase(TestCase):
+    def test_unchanged_session_is_not_written(self):
+        store = SessionStore()
+        store["foobar"] = "spameggs"
+        store.save()
+        key = store.session_key
+
+        with self.assertNumQueries(0):
+            store = SessionStore(key)
+            self.assertEqual(store["foobar"], "spameggs")
+            store["foobar"] = "spameggs"
+            store.save()
+
+        with CaptureQueriesContext(connection) as queries:
+            store["foobar"] = "changed"
+            store.save()
+        self.assertEqual([q["sql"].split()[0] for q in queries if "django_session" in q["sql"]], ["UPDATE"])
+        cache.delete(store.cache_key)
+        self.assertEqual(SessionStore(key)["foobar"], "changed")
+
+    def test_expired_rows_deleted_in_batches(self):
+        Session.objects.bulk_create(
+            Session(
+                session_key=f"expired{i}",
+                session_data="",
+                expire_date=timezone.now() - timedelta(days=1),
+            )
+            for i in range(5)
+        )
+        self.assertEqual(SessionStore.delete_expired(2), 2)
+        SessionStore.clear_expired()
+        self.assertFalse(Session.objects.filter(session_key__startswith="expired").exists())
+
+    def test_session_views(self):
+        with translation.override("en"):
+            self.client.get(reverse("myauth:session-set"))
+            response = self.client.get(reverse("myauth:session-get"))
+        self.assertContains(response, "spameggs")
+
+
+class AsyncLoginRegisterTestCase(TestCase):
+    def setUp(self):
+        override = self.settings(AUTH_HASHING_WORKERS=0)
+        override.enable()
+        self.addCleanup(override.disable)
+        translation.activate("en")
+        self.addCleanup(translation.deactivate)
+
+    def test_register_hashes_once_and_logs_in(self):
+        with patch("django.contrib.auth.base_user.make_password", wraps=make_password) as hashing, \
+                patch("myauth.hashing.authenticate") as authenticate:
+            response = self.client.post(reverse("myauth:register"), {
+                "username": "newbie",
+                "email": "newbie@example.com",
+                "password1": "Sup3r-secret-pass",
+                "password2": "Sup3r-secret-pass",
+            })
+        self.assertRedirects(response, reverse("myauth:about-me"), fetch_redirect_response=False)
+        self.assertEqual(hashing.call_count, 1)
+        authenticate.assert_not_called()
+        user = User.objects.get(username="newbie")
+        self.assertEqual(user.email, "newbie@example.com")
+        self.assertTrue(Profile.objects.filter(user=user).exists())
+        self.assertEqual(self.client.session["_auth_user_id"], str(user.pk))
+
+    def test_register_is_atomic(self):
+        with patch("myauth.views.Profile.objects.create", side_effect=DatabaseError), \
+                self.assertRaises(DatabaseError):
+            self.client.post(reverse("myauth:register"), {
+                "username": "newbie",
+                "email": "newbie@example.com",
+                "password1": "Sup3r-secret-pass",
+                "password2": "Sup3r-secret-pass",
+            })
+        self.assertFalse(User.objects.filter(username="newbie").exists())
+
+    def test_login(self):
+        User.objects.create_user(username="alice", password="qwerty")
+        response = self.client.post(reverse("myauth:login"), {"username": "alice", "password": "wrong"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["form"].errors)
+
+        response = self.client.post(reverse("myauth:login"), {"username": "alice", "password": "qwerty"})
+        self.assertRedirects(response, reverse("myauth:about-me"), fetch_redirect_response=False)
+        response = self.client.get(reverse("myauth:login"))
+        self.assertRedirects(response, reverse("myauth:about-me"), fetch_redirect_response=False)
+
+
+@override_settings(AUTH_HASHING_WORKERS=2)
+class HashingPoolLoginTestCase(TransactionTestCase):
+    def setUp(self):
+        translation.activate("en")
+        self.addCleanup(translation.deactivate)
+
+    def test_login_in_pool_hides_password_and_is_not_cached(self):
+        User.objects.create_user(username="alice", password="qwerty")
+        response = self.client.post(reverse("myauth:login"), {"username": "alice", "password": "wrong"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["form"].errors)
+        self.assertEqual(response.wsgi_request.sensitive_post_parameters, "__ALL__")
+        self.assertIn("no-cache", response["Cache-Control"])
+
+        response = self.client.post(reverse("myauth:login"), {"username": "alice", "password": "qwerty"})
+        self.assertRedirects(response, reverse("myauth:about-me"), fetch_redirect_response=False)
+        self.assertIn("no-cache", response["Cache-Control"])
+
+    def test_register_in_pool_hides_passwords(self):
+        response = self.client.post(reverse("myauth:register"), {
+            "username": "newbie",
+            "email": "newbie@example.com",
+            "password1": "Sup3r-secret-pass",
+            "password2": "Sup3r-secret-pass",
+        })
+        self.assertRedirects(response, reverse("myauth:about-me"), fetch_redirect_response=False)
+        self.assertEqual(response.wsgi_request.sensitive_post_parameters, "__ALL__")
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertTrue(User.objects.filter(username="newbie").exists())
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class BulkCreateUsersTestCase(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        User.objects.create_user(username="taken", password="qwerty")
+
+    def write(self, name: str, text: str) -> str:
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(text)
+        return path
+
+    def test_csv(self):
+        path = self.write("users.csv", (
+            "username,email,password,groups\n"
+            "alice,alice@example.com,s3cret,managers;editors\n"
+            "taken,,x,\n"
+            ",nobody@example.com,x,\n"
+            "bob,not-an-email,x,\n"
+            "carol,,,editors\n"
+        ))
+        stdout, stderr = StringIO(), StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command("bulk_create_users", path, batch_size=2, stdout=stdout, stderr=stderr)
+        self.assertIn("2 created, 1 skipped, 2 rejected", stdout.getvalue())
+        self.assertIn("line 4", stderr.getvalue())
+
+        alice = User.objects.get(username="alice")
+        self.assertTrue(alice.check_password("s3cret"))
+        self.assertEqual(sorted(alice.groups.values_list("name", flat=True)), ["editors", "managers"])
+        self.assertTrue(Profile.objects.filter(user=alice).exists())
+        carol = User.objects.get(username="carol")
+        self.assertFalse(carol.has_usable_password())
+        user_inserts = [q for q in queries if q["sql"].startswith('INSERT INTO "auth_user"')]
+        self.assertEqual(len(user_inserts), 2)  # one per batch
+
+    def test_jsonl_with_prehashed_passwords(self):
+        path = self.write("users.jsonl", "\n".join([
+            json.dumps({"username": "dave", "password_hash": make_password("pw"), "groups": ["ops"]}),
+            json.dumps({"username": "eve", "password_hash": "plain-text"}),
+        ]))
+        stdout = StringIO()
+        call_command("bulk_create_users", path, stdout=stdout, stderr=StringIO())
+        self.assertIn("1 created, 0 skipped, 1 rejected", stdout.getvalue())
+        self.assertTrue(User.objects.get(username="dave").check_password("pw"))
+
+    def test_malformed_lines_are_rejected_with_their_line(self):
+        path = self.write("users.jsonl", "\n".join([
+            '{"username": "frank"',
+            json.dumps(["grace"]),
+            json.dumps({"username": "judy"}),
+        ]))
+        stdout, stderr = StringIO(), StringIO()
+        call_command("bulk_create_users", path, stdout=stdout, stderr=stderr)
+        self.assertIn("1 created, 0 skipped, 2 rejected", stdout.getvalue())
+        self.assertIn("line 1: invalid JSON", stderr.getvalue())
+        self.assertIn("line 2: record must be a JSON object", stderr.getvalue())
+        self.assertTrue(User.objects.filter(username="judy").exists())
+
+    def test_fields_are_validated_like_the_user_model(self):
+        path = self.write("users.jsonl", "\n".join([
+            json.dumps({"username": "bad name!"}),
+            json.dumps({"username": "x" * 151}),
+            json.dumps({"username": "heidi", "first_name": "H" * 151}),
+            json.dumps({"username": "ivan", "email": 42}),
+            json.dumps({"username": "judy"}),
+        ]))
+        stdout, stderr = StringIO(), StringIO()
+        call_command("bulk_create_users", path, stdout=stdout, stderr=stderr)
+        self.assertIn("1 created, 0 skipped, 4 rejected", stdout.getvalue())
+        errors = stderr.getvalue()
+        self.assertIn("line 1: Enter a valid username", errors)
+        self.assertIn("line 2: username: at most 150 characters", errors)
+        self.assertIn("line 3: first_name: at most 150 characters", errors)
+        self.assertIn("line 4: email must be a string", errors)
+        self.assertFalse(User.objects.filter(username="heidi").exists())
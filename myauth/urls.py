@@ -1,5 +1,4 @@
-from django.contrib.auth.views import LoginView, LogoutView
-from django.urls import path, reverse_lazy
+from django.urls import path
 from myauth.views import (
     set_cookie_view,
     get_cookie_view,
@@ -8,6 +7,7 @@ from myauth.views import (
     MyLogoutView,
     AboutMeView,
     RegisterView,
+    LoginView,
     FooBarView, HelloView,
 )
 
@@ -15,13 +15,7 @@ app_name = "myauth"
 
 urlpatterns = [
 
-    path("login/",
-         LoginView.as_view(
-             template_name= "myauth/login.html",
-             redirect_authenticated_user = True,
-         ),
-         name="login"
-    ),
+    path("login/", LoginView.as_view(), name="login"),
     # path("logout/", logout_view, name="logout"),
     path("logout/",
          MyLogoutView.as_view(),
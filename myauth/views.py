@@ -1,14 +1,22 @@
-from django.contrib.auth.forms import UserCreationForm
+from django.conf import settings
+from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
 from django.http import HttpRequest, HttpResponse, JsonResponse
-from django.shortcuts import render, redirect
-from django.contrib.auth import authenticate, login, logout
+from django.shortcuts import redirect, resolve_url
+from django.contrib.auth import alogin, logout
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.template.response import TemplateResponse
 from django.urls import reverse, reverse_lazy
+from django.utils.decorators import method_decorator
+from django.utils.http import url_has_allowed_host_and_scheme
 from django.views import View
-from django.views.generic import TemplateView, CreateView
+from django.views.decorators.cache import never_cache
+from django.views.decorators.debug import sensitive_post_parameters
+from django.views.generic import TemplateView
 from django import forms
 from django.utils.translation import gettext_lazy as _
 
+from .hashing import aauthenticate, run_hashing
 from .models import Profile
 
 
@@ -32,43 +40,106 @@ class MyUserCreationForm(UserCreationForm):
         fields = ('username', 'email', 'password1', 'password2')
 
 
-class RegisterView(CreateView):
-    form_class = MyUserCreationForm
-    template_name = "myauth/register.html"
-    success_url = reverse_lazy("myauth:about-me")
-
-    def form_valid(self, form)->HttpResponse:
-        response = super().form_valid(form)
+def register_user(form: MyUserCreationForm) -> User | None:
+    """
+    Validates the form and creates the user with a profile.
 
-        self.object.email = form.cleaned_data.get('email')
-        self.object.save(update_fields=['email'])
+    The password is hashed once, before the transaction opens; the
+    user (email included) and the profile are then inserted together.
+    The new user is logged in directly, without ``authenticate()``
+    hashing the password again.
+    """
+    if not form.is_valid():
+        return None
+    # Hashes the password, does not write yet.
+    user = form.save(commit=False)
+    with transaction.atomic():
+        user.save()
+        Profile.objects.create(user=user)
+    return user
 
-        Profile.objects.create(user=self.object)
 
-        password = form.cleaned_data.get('password1')
+class RegisterView(View):
+    """Async registration: hashing runs in the pool of myauth.hashing."""
 
-        user = authenticate(self.request,
-                            username=self.object.username,
-                            password=password)
-        if user is not None:
-            login(self.request, user=user)
-        return response
+    form_class = MyUserCreationForm
+    template_name = "myauth/register.html"
+    success_url = reverse_lazy("myauth:about-me")
 
-def login_view(request: HttpRequest) -> HttpResponse:
+    @method_decorator(never_cache)
+    async def get(self, request: HttpRequest) -> HttpResponse:
+        return TemplateResponse(request, self.template_name, {"form": self.form_class()})
+
+    @method_decorator([sensitive_post_parameters(), never_cache])
+    async def post(self, request: HttpRequest) -> HttpResponse:
+        form = self.form_class(request.POST)
+        user = await run_hashing(register_user, form)
+        if user is None:
+            return TemplateResponse(request, self.template_name, {"form": form})
+        await alogin(request, user, backend=settings.AUTHENTICATION_BACKENDS[0])
+        return redirect(self.success_url)
+
+
+class LoginView(View):
+    """
+    Async counterpart of ``django.contrib.auth.views.LoginView``.
+
+    The whole form validation (``authenticate()`` included) runs in the
+    hashing pool. As in Django's view, the password is hidden from error
+    reports and the responses are never cached; the decorators go on the
+    async handlers, ``dispatch()`` itself is sync.
+    """
+
+    form_class = AuthenticationForm
+    template_name = "myauth/login.html"
+    redirect_authenticated_user = True
+
+    def get_success_url(self, request: HttpRequest) -> str:
+        redirect_to = request.POST.get("next", request.GET.get("next", ""))
+        if url_has_allowed_host_and_scheme(
+            redirect_to,
+            allowed_hosts={request.get_host()},
+            require_https=request.is_secure(),
+        ):
+            return redirect_to
+        return resolve_url(settings.LOGIN_REDIRECT_URL)
+
+    def render_form(self, request: HttpRequest, form) -> HttpResponse:
+        return TemplateResponse(request, self.template_name, {
+            "form": form,
+            "next": request.POST.get("next", request.GET.get("next", "")),
+        })
+
+    @method_decorator(never_cache)
+    async def get(self, request: HttpRequest) -> HttpResponse:
+        if self.redirect_authenticated_user and (await request.auser()).is_authenticated:
+            return redirect(self.get_success_url(request))
+        return self.render_form(request, self.form_class(request))
+
+    @method_decorator([sensitive_post_parameters(), never_cache])
+    async def post(self, request: HttpRequest) -> HttpResponse:
+        form = self.form_class(request, data=request.POST)
+        if not await run_hashing(form.is_valid):
+            return self.render_form(request, form)
+        await alogin(request, form.get_user())
+        return redirect(self.get_success_url(request))
+
+
+async def login_view(request: HttpRequest) -> HttpResponse:
     if request.method == 'GET':
-        if request.user.is_authenticated:
+        if (await request.auser()).is_authenticated:
             return redirect('/admin/')
-        return render(request, 'myauth/login.html')
+        return TemplateResponse(request, 'myauth/login.html')
     username = request.POST['username']
     password = request.POST['password']
-    user = authenticate(request, username=username, password=password)
+    user = await aauthenticate(request, username=username, password=password)
     if user is not None:
-        login(request, user)
+        await alogin(request, user)
         return redirect('/admin/')
-    return render(request,
-                  'myauth/login.html',
-                  {'error': 'Invalid username or password'},
-                  status=403)
+    return TemplateResponse(request,
+                            'myauth/login.html',
+                            {'error': 'Invalid username or password'},
+                            status=403)
 
 class MyLogoutView(View):
     def get(self, request: HttpRequest) -> HttpResponse:
@@ -0,0 +1,54 @@
+"""
+Helpers shared by the ``bench_*`` management commands.
+
+Benchmarks never touch the project database: every run works inside a
+throwaway test database that is created and destroyed around it.
+"""
+
+import tempfile
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from timeit import default_timer
+
+from django.db import connection
+from django.test.utils import setup_databases, teardown_databases
+
+
+@contextmanager
+def scratch_database(on_disk: bool = False, verbosity: int = 0):
+    """
+    Create a throwaway database for the duration of a benchmark.
+
+    SQLite test databases live in memory by default. Pass ``on_disk=True``
+    when the benchmark forks worker processes or opens extra connections,
+    they need a real file to share.
+    """
+    test_settings = connection.settings_dict.setdefault("TEST", {})
+    old_name = test_settings.get("NAME")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if on_disk:
+            test_settings["NAME"] = str(Path(tmp_dir) / "bench.sqlite3")
+        old_config = setup_databases(verbosity, interactive=False, aliases={"default"})
+        try:
+            yield
+        finally:
+            teardown_databases(old_config, verbosity)
+            test_settings["NAME"] = old_name
+
+
+def measure(func, *args, **kwargs) -> dict:
+    """
+    Run ``func`` once and report wall time and peak traced memory.
+
+    :return: dict with ``seconds``, ``peak_kib`` and the function ``result``
+    """
+    tracemalloc.start()
+    start = default_timer()
+    try:
+        result = func(*args, **kwargs)
+        seconds = default_timer() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": seconds, "peak_kib": peak / 1024, "result": result}
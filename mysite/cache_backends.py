@@ -0,0 +1,304 @@
+"""
+Tiered cache backend: a per-process LRU in front of a shared SQLite file.
+
+::
+
+    CACHES = {
+        "default": {
+            "BACKEND": "mysite.cache_backends.TieredCache",
+            "LOCATION": "/app/database/cache.sqlite3",
+            "OPTIONS": {"MAX_ENTRIES": 10000, "L1_MAX_BYTES": 32 * 1024 * 1024},
+        },
+    }
+
+L1 is an LRU of pickled values in process memory, bounded by
+``L1_MAX_ENTRIES`` and ``L1_MAX_BYTES``; an entry lives at most
+``L1_TIMEOUT`` seconds and never past its cache timeout.
+
+L2 is a SQLite table in WAL mode (readers never wait for the writer)
+shared by every process that can see ``LOCATION``, including containers
+mounting the same volume. Expired rows are not deleted on read: every
+``EVICT_EVERY`` writes of a process, one batch of expired rows goes,
+found through the index on the expiry time, and then the entries
+closest to expiring if the table is over ``MAX_ENTRIES``.
+
+Other workers' L1 copies are invalidated through version stamps: a
+memory-mapped file next to the database holds 65536 stamps, and a key
+maps to one of them by CRC32. Every write stores a fresh random stamp
+after writing L2; an L1 entry is served only while its stamp is
+unchanged, so a read costs two memory loads instead of a file open. A
+stamp shared by two keys only costs the other key an L2 read.
+
+``cache.stats()`` gives the hit ratios and mean latencies of the process.
+"""
+
+import mmap
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from time import perf_counter
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+STAMP_SLOTS = 1 << 16
+# Writes of a process between two eviction passes, rows deleted per pass.
+EVICT_EVERY = 100
+EVICT_BATCH = 500
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)",
+)
+
+
+class _Location:
+    """L1, stamps and statistics of one LOCATION, shared by the threads of a process."""
+
+    def __init__(self, path: str):
+        self.lock = threading.Lock()
+        # key -> (pickled value, expires, stamp, epoch)
+        self.entries = OrderedDict()
+        self.size = 0
+        self.writes = 0
+        self.counts = dict.fromkeys(("l1_hits", "l2_hits", "misses", "sets", "evicted"), 0)
+        self.seconds = {"get": 0.0, "set": 0.0}
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(f"{path}-stamps", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            # Slot 0 is the epoch, bumped by clear().
+            size = (STAMP_SLOTS + 1) * 8
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self.stamps = memoryview(mmap.mmap(fd, size)).cast("Q")
+        finally:
+            os.close(fd)
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # The lock may have been held by a thread that does not exist in the child.
+        self.lock = threading.Lock()
+
+    def drop(self, key: str) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[0])
+
+    def add_time(self, operation: str, started: float) -> None:
+        self.seconds[operation] += perf_counter() - started
+
+
+_locations = {}
+_locations_lock = threading.Lock()
+
+
+def _location(path: str) -> _Location:
+    with _locations_lock:
+        if path not in _locations:
+            _locations[path] = _Location(path)
+        return _locations[path]
+
+
+def _slot(key: str) -> int:
+    return zlib.crc32(key.encode()) % STAMP_SLOTS + 1
+
+
+def _new_stamp() -> int:
+    return random.getrandbits(64)
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._path = location
+        self._l1_max_entries = int(options.get("L1_MAX_ENTRIES", 1000))
+        self._l1_max_bytes = int(options.get("L1_MAX_BYTES", 32 * 1024 * 1024))
+        self._l1_timeout = float(options.get("L1_TIMEOUT", 60))
+        self._shared = _location(location)
+        # Django may hand one cache object to several threads under ASGI;
+        # sqlite3 connections must stay in their thread (and process).
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            local.connection = sqlite3.connect(self._path, timeout=10, isolation_level=None)
+            local.connection.execute("PRAGMA journal_mode=WAL")
+            local.connection.execute("PRAGMA synchronous=NORMAL")
+            for statement in SCHEMA:
+                local.connection.execute(statement)
+            local.pid = os.getpid()
+        return local.connection
+
+    def _fill(self, key: str, pickled: bytes, expires, stamp: int, epoch: int) -> None:
+        if len(pickled) > self._l1_max_bytes // 8:
+            return
+        local_expires = time.time() + self._l1_timeout
+        if expires is not None:
+            local_expires = min(local_expires, expires)
+        shared = self._shared
+        with shared.lock:
+            shared.drop(key)
+            shared.entries[key] = (pickled, local_expires, stamp, epoch)
+            shared.size += len(pickled)
+            while len(shared.entries) > self._l1_max_entries or shared.size > self._l1_max_bytes:
+                _, (evicted, *_) = shared.entries.popitem(last=False)
+                shared.size -= len(evicted)
+
+    def _stamp_write(self, key: str) -> None:
+        """Invalidate ``key`` in the L1 of every process."""
+        self._shared.stamps[_slot(key)] = _new_stamp()
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        started = perf_counter()
+        shared = self._shared
+        stamps = shared.stamps
+        slot = _slot(key)
+        now = time.time()
+        with shared.lock:
+            entry = shared.entries.get(key)
+            if entry is not None:
+                pickled, expires, stamp, epoch = entry
+                if expires > now and stamps[slot] == stamp and stamps[0] == epoch:
+                    shared.entries.move_to_end(key)
+                    shared.counts["l1_hits"] += 1
+                else:
+                    shared.drop(key)
+                    entry = None
+        if entry is not None:
+            value = pickle.loads(pickled)
+            with shared.lock:
+                shared.add_time("get", started)
+            return value
+
+        # Stamps are read before L2: a write in between leaves L1 with a
+        # stamp that is already outdated, never the other way round.
+        stamp, epoch = stamps[slot], stamps[0]
+        row = self._connection().execute(
+            "SELECT value, expires FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= now):
+            with shared.lock:
+                shared.counts["misses"] += 1
+                shared.add_time("get", started)
+            return default
+        self._fill(key, row[0], row[1], stamp, epoch)
+        value = pickle.loads(row[0])
+        with shared.lock:
+            shared.counts["l2_hits"] += 1
+            shared.add_time("get", started)
+        return value
+
+    def _write(self, sql: str, key: str, value, timeout, *params) -> bool:
+        started = perf_counter()
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires = self.get_backend_timeout(timeout)
+        connection = self._connection()
+        written = connection.execute(sql, (key, pickled, expires, *params)).rowcount > 0
+        shared = self._shared
+        if written:
+            self._stamp_write(key)
+        with shared.lock:
+            # Not refilled with the new value: a concurrent write from
+            # another process may land in L2 before this one's stamp.
+            shared.drop(key)
+            shared.counts["sets"] += 1
+            shared.writes += 1
+            evict = shared.writes % EVICT_EVERY == 0
+            shared.add_time("set", started)
+        if evict:
+            self.evict(connection)
+        return written
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._write(
+            "INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires",
+            key, value, timeout,
+        )
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        # Atomic across processes: only an absent or expired row is replaced.
+        return self._write(
+            "INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires "
+            "WHERE cache.expires IS NOT NULL AND cache.expires <= ?",
+            key, value, timeout, time.time(),
+        )
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        touched = self._connection().execute(
+            "UPDATE cache SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (self.get_backend_timeout(timeout), key, time.time()),
+        ).rowcount > 0
+        if touched:
+            self._stamp_write(key)
+        return touched
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        deleted = self._connection().execute("DELETE FROM cache WHERE key = ?", (key,)).rowcount > 0
+        self._stamp_write(key)
+        with self._shared.lock:
+            self._shared.drop(key)
+        return deleted
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache")
+        shared = self._shared
+        shared.stamps[0] = _new_stamp()
+        with shared.lock:
+            shared.entries.clear()
+            shared.size = 0
+
+    def evict(self, connection: sqlite3.Connection | None = None) -> int:
+        """One batch of expired rows, then the rows over ``MAX_ENTRIES``."""
+        connection = connection or self._connection()
+        deleted = connection.execute(
+            "DELETE FROM cache WHERE key IN "
+            "(SELECT key FROM cache WHERE expires <= ? ORDER BY expires LIMIT ?)",
+            (time.time(), EVICT_BATCH),
+        ).rowcount
+        excess = connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self._max_entries
+        if excess > 0:
+            # The entries closest to expiring go first, the ones without a timeout last.
+            deleted += connection.execute(
+                "DELETE FROM cache WHERE key IN "
+                "(SELECT key FROM cache ORDER BY expires IS NULL, expires LIMIT ?)",
+                (min(excess, EVICT_BATCH),),
+            ).rowcount
+        with self._shared.lock:
+            self._shared.counts["evicted"] += deleted
+        return deleted
+
+    def stats(self) -> dict:
+        """Counters of this process since it started (or since ``reset_stats``)."""
+        shared = self._shared
+        with shared.lock:
+            counts = dict(shared.counts)
+            seconds = dict(shared.seconds)
+            counts["l1_entries"], counts["l1_bytes"] = len(shared.entries), shared.size
+        gets = counts["l1_hits"] + counts["l2_hits"] + counts["misses"]
+        return {
+            **counts,
+            "hit_ratio": (counts["l1_hits"] + counts["l2_hits"]) / gets if gets else 0.0,
+            "l1_hit_ratio": counts["l1_hits"] / gets if gets else 0.0,
+            "get_us": seconds["get"] / gets * 1e6 if gets else 0.0,
+            "set_us": seconds["set"] / counts["sets"] * 1e6 if counts["sets"] else 0.0,
+        }
+
+    def reset_stats(self) -> None:
+        shared = self._shared
+        with shared.lock:
+            shared.counts = dict.fromkeys(shared.counts, 0)
+            shared.seconds = dict.fromkeys(shared.seconds, 0.0)
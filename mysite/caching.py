@@ -0,0 +1,164 @@
+"""
+Versioned, stampede-safe caching of whole datasets.
+
+A dataset is a value that is expensive to build (e.g. an export of every
+product). Its cache key includes a namespace *version*: bumping the version
+invalidates every dataset in the namespace without deleting anything.
+
+On a miss only one worker rebuilds (single-flight lock through
+``cache.add``); the others keep serving the previous payload
+(stale-while-revalidate) until the new one is stored.
+"""
+
+import logging
+import time
+from collections import Counter
+from collections.abc import Callable
+from functools import partial
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+log = logging.getLogger(__name__)
+
+
+def _version_key(namespace: str) -> str:
+    return f"version:{namespace}"
+
+
+def get_version(namespace: str) -> str:
+    """Return the current version token of a cache namespace."""
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(namespace: str) -> None:
+    """
+    Invalidate everything cached under ``namespace``.
+
+    Versions are random tokens rather than counters, so a version can never
+    be reused after a cache restart and pick up an old entry.
+    """
+    cache.set(_version_key(namespace), uuid4().hex, None)
+
+
+def bump_version_on_commit(namespace: str, using: str | None = None) -> None:
+    """
+    ``bump_version`` that also covers the writer's transaction.
+
+    A bump inside the transaction alone would let a concurrent rebuild
+    read the not yet committed rows and cache them under the new version,
+    where they would stay until the next change. So the version is bumped
+    again once the transaction commits; the immediate bump still drops
+    what was cached before (and is all that happens on rollback).
+    """
+    bump_version(namespace)
+    if transaction.get_connection(using).in_atomic_block:
+        transaction.on_commit(partial(bump_version, namespace), using=using)
+
+
+class CachedDataset:
+    """
+    A dataset cached under a versioned key with single-flight rebuilds.
+
+    :param name: unique dataset name, part of every cache key
+    :param builder: callable returning the (picklable) payload
+    :param namespace: version namespace that invalidates the dataset
+    :param fresh_timeout: seconds a payload is served without a rebuild
+    :param stale_timeout: seconds an outdated payload may still be served
+        while another worker rebuilds it
+    :param lock_timeout: upper bound for one rebuild
+    """
+
+    def __init__(
+        self,
+        name: str,
+        builder: Callable,
+        namespace: str,
+        fresh_timeout: int = 300,
+        stale_timeout: int = 3600,
+        lock_timeout: int = 30,
+    ):
+        self.name = name
+        self.builder = builder
+        self.namespace = namespace
+        self.fresh_timeout = fresh_timeout
+        self.stale_timeout = stale_timeout
+        self.lock_timeout = lock_timeout
+        self.counters = Counter()
+
+    @property
+    def lock_key(self) -> str:
+        return f"dataset:{self.name}:lock"
+
+    @property
+    def latest_key(self) -> str:
+        return f"dataset:{self.name}:latest"
+
+    def get(self):
+        """Return the payload, rebuilding it at most once across workers."""
+        return self.get_versioned()[1]
+
+    def get_versioned(self) -> tuple[str, object]:
+        """
+        Return ``(version, payload)``: the namespace version the payload
+        was built under.
+
+        While a stale payload is served that is the previous version, not
+        the current one, so it is the right validator (ETag) for it.
+        """
+        version = get_version(self.namespace)
+        key = f"dataset:{self.name}:{version}"
+        entry = cache.get(key)
+        if entry is not None and entry[0] > time.time():
+            self.counters["hits"] += 1
+            return entry[2], entry[1]
+
+        stale = entry or cache.get(self.latest_key)
+        if cache.add(self.lock_key, True, self.lock_timeout):
+            try:
+                return version, self._rebuild(key, version)
+            finally:
+                cache.delete(self.lock_key)
+
+        if stale is not None:
+            self.counters["stale_hits"] += 1
+            return stale[2], stale[1]
+
+        # Nothing to fall back on: wait for the worker holding the lock.
+        deadline = time.time() + self.lock_timeout
+        while time.time() < deadline:
+            time.sleep(0.05)
+            entry = cache.get(key)
+            if entry is not None:
+                self.counters["hits"] += 1
+                return entry[2], entry[1]
+        log.warning("Rebuild of dataset %s timed out, building inline", self.name)
+        return version, self._rebuild(key, version)
+
+    def _rebuild(self, key: str, version: str):
+        self.counters["misses"] += 1
+        start = time.perf_counter()
+        payload = self.builder()
+        elapsed = time.perf_counter() - start
+        self.counters["rebuilds"] += 1
+        self.counters["rebuild_ms_total"] += round(elapsed * 1000)
+
+        # (fresh until, payload, version it was built under)
+        entry = (time.time() + self.fresh_timeout, payload, version)
+        cache.set(key, entry, self.fresh_timeout + self.stale_timeout)
+        cache.set(self.latest_key, entry, self.stale_timeout)
+        log.info("Rebuilt dataset %s in %.3fs", self.name, elapsed)
+        return payload
+
+    def stats(self) -> dict:
+        """Counters of this worker process."""
+        stats = dict(self.counters)
+        for counter in ("hits", "stale_hits", "misses", "rebuilds", "rebuild_ms_total"):
+            stats.setdefault(counter, 0)
+        return stats
@@ -0,0 +1,78 @@
+"""
+Conditional GET (ETag / Last-Modified) without rendering the body.
+
+Validators are computed with a single small query. When the client's
+``If-None-Match`` / ``If-Modified-Since`` match, a ``304 Not Modified`` is
+returned before serialization or template rendering happens.
+"""
+
+from collections.abc import Callable
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max, QuerySet
+from django.http import HttpRequest, HttpResponseBase
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+Validators = tuple[str | None, datetime | None]
+
+
+def collection_validators(queryset: QuerySet, field: str = "updated_at") -> Validators:
+    """
+    Validators of a (filtered) collection: row count and newest ``field``.
+
+    The count catches deletions, the maximum timestamp catches inserts and
+    updates.
+    """
+    stats = queryset.order_by().aggregate(count=Count("pk"), last=Max(field))
+    last = stats["last"]
+    stamp = int(last.timestamp() * 1_000_000) if last else 0
+    return f"{stats['count']}-{stamp}", last
+
+
+def object_validators(queryset: QuerySet, pk, field: str = "updated_at") -> Validators:
+    """
+    Validators of one object: its pk and ``field``, without loading the row.
+
+    A malformed ``pk`` gives no validators, like a missing object, so the
+    view's own lookup answers 404.
+    """
+    try:
+        last = queryset.filter(pk=pk).values_list(field, flat=True).first()
+    except (TypeError, ValueError, ValidationError):
+        return None, None
+    if last is None:
+        return None, None
+    return f"{pk}-{int(last.timestamp() * 1_000_000)}", last
+
+
+def conditional_response(
+    request: HttpRequest,
+    validators: Validators,
+    render: Callable[[], HttpResponseBase],
+) -> HttpResponseBase:
+    """
+    Return 304 if the client copy is current, otherwise ``render()``.
+
+    The validators are attached to the rendered response so the next
+    request can be conditional.
+    """
+    etag, last_modified = validators
+    if etag is not None:
+        etag = quote_etag(etag)
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    if request.method in ("GET", "HEAD"):
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp,
+        )
+        if response is not None:
+            return response
+
+    response = render()
+    if response.status_code == 200:
+        if etag is not None and not response.has_header("ETag"):
+            response.headers["ETag"] = etag
+        if timestamp is not None and not response.has_header("Last-Modified"):
+            response.headers["Last-Modified"] = http_date(timestamp)
+    return response
@@ -69,11 +69,13 @@ INSTALLED_APPS = [
     "requestdataapp.apps.RequestdataappConfig",
     "myapiapp.apps.MyapiappConfig",
     "blogapp.apps.BlogappConfig",
+    "jobsapp.apps.JobsappConfig",
 ]
 
 MIDDLEWARE = [
+    "requestdataapp.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "mysite.middleware.AsyncWhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.locale.LocaleMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -83,8 +85,7 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.contrib.admindocs.middleware.XViewMiddleware",
     "debug_toolbar.middleware.DebugToolbarMiddleware",
-    "requestdataapp.middlewares.set_useragent_request_middleware",
-    "requestdataapp.middlewares.CoontRequestMiddleware",
+    "requestdataapp.middlewares.UserAgentMiddleware",
 ]
 
 ROOT_URLCONF = "mysite.urls"
@@ -107,6 +108,8 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "mysite.wsgi.application"
 
+TEST_RUNNER = "mysite.test_runner.TestRunner"
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -118,15 +121,38 @@ DATABASES = {
     },
 }
 
+# Per-process LRU in front of a SQLite file shared by all workers and
+# containers mounting DATABASES_DIR (see mysite.cache_backends)
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
-        "LOCATION": "/var/tmp/django_cache",
+        "BACKEND": "mysite.cache_backends.TieredCache",
+        "LOCATION": getenv("CACHE_LOCATION", str(DATABASES_DIR / "cache.sqlite3")),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(getenv("CACHE_MAX_ENTRIES", "20000")),
+            "L1_MAX_ENTRIES": 1000,
+            "L1_MAX_BYTES": 32 * 1024 * 1024,
+            "L1_TIMEOUT": 60,
+        },
     },
 }
 
 CACHE_MIDDLEWARE_SECONDS = 200
 
+# Permission sets are cached across requests (see myauth.backends).
+AUTHENTICATION_BACKENDS = [
+    "myauth.backends.CachedPermissionBackend",
+]
+
+# Sessions are read from the cache and written to the database only when
+# they change (see myauth.sessions).
+SESSION_ENGINE = "myauth.sessions"
+# An unchanged session row is rewritten only to move its expiry further
+# than this many seconds.
+SESSION_DB_WRITE_INTERVAL = 300
+# Expired rows: one batch of this size at most once per interval.
+SESSION_EXPIRE_BATCH = 500
+SESSION_EXPIRE_INTERVAL = 60
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -175,6 +201,37 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "uploads"
+# Content-addressed upload store (requestdataapp.uploads), relative to MEDIA_ROOT
+UPLOAD_STORE_DIR = "cas"
+UPLOAD_MAX_SIZE = int(getenv("UPLOAD_MAX_SIZE", str(5 * 1024 ** 3)))
+# Unfinished resumable uploads idle for longer are deleted by ``clean_uploads``
+UPLOAD_SESSION_MAX_AGE = int(getenv("UPLOAD_SESSION_MAX_AGE", str(24 * 3600)))
+
+# Image jobs (thumbnails/WebP, file cleanup) running at once (0 = run inline)
+SHOPAPP_IMAGE_WORKERS = int(getenv("SHOPAPP_IMAGE_WORKERS", "2"))
+# Processes writing admin CSV exports in parallel (0 = export inline)
+SHOPAPP_EXPORT_WORKERS = int(getenv("SHOPAPP_EXPORT_WORKERS", "2"))
+
+# Background jobs (jobsapp, ``manage.py runworker``)
+JOBS_CONCURRENCY = int(getenv("JOBS_CONCURRENCY", "2"))
+JOBS_LEASE_SECONDS = int(getenv("JOBS_LEASE_SECONDS", "60"))
+# Delay before the first retry; doubles with every failed attempt
+JOBS_RETRY_DELAY = int(getenv("JOBS_RETRY_DELAY", "10"))
+# Run jobs right away in the enqueuing process instead of a worker
+JOBS_RUN_INLINE = getenv("JOBS_RUN_INLINE", "0") == "1"
+
+# Bearer token for scraping /metrics without a staff session (empty = staff only)
+METRICS_TOKEN = getenv("METRICS_TOKEN", "")
+# Memory-mapped file the worker processes of this deployment share
+# metrics through (empty = every process reports only its own requests)
+METRICS_FILE = getenv("METRICS_FILE", str(DATABASES_DIR / "metrics.mmap"))
+# One region per request-serving thread over all workers, and its size in bytes
+METRICS_REGIONS = int(getenv("METRICS_REGIONS", "64"))
+METRICS_REGION_SIZE = int(getenv("METRICS_REGION_SIZE", str(256 * 1024)))
+
+# Threads hashing passwords for the async login/register views
+# (0 = hash on Django's shared sync thread)
+AUTH_HASHING_WORKERS = int(getenv("AUTH_HASHING_WORKERS", "4"))
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
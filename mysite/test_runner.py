@@ -0,0 +1,35 @@
+"""
+Test runner that keeps test runs away from the files a deployment shares
+between its worker processes.
+"""
+
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._directory = tempfile.mkdtemp(prefix="mysite-tests-")
+        # A fresh cache file of its own, instead of the deployment's one.
+        caches = {
+            alias: (
+                {**params, "LOCATION": str(Path(self._directory) / f"{alias}.sqlite3")}
+                if params["BACKEND"] == "mysite.cache_backends.TieredCache"
+                else params
+            )
+            for alias, params in settings.CACHES.items()
+        }
+        # In-memory metrics; tests of the shared file bring their own.
+        self._settings = override_settings(CACHES=caches, METRICS_FILE="")
+        self._settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._settings.disable()
+        shutil.rmtree(self._directory, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -23,10 +23,13 @@ from django.conf.urls.i18n import i18n_patterns
 from django.contrib.sitemaps.views import sitemap
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
 
+from requestdataapp.metrics import metrics_view
+
 from .sitemaps import sitemaps
 
 urlpatterns = [
     path("i18n/", include("django.conf.urls.i18n")),
+    path("metrics", metrics_view, name="metrics"),
     ]
 
 urlpatterns += i18n_patterns(
@@ -36,6 +39,7 @@ urlpatterns += i18n_patterns(
     path("req/", include("requestdataapp.urls")),
     path("auth/", include("myauth.urls")),
     path("blog/", include("blogapp.urls")),
+    path("jobs/", include("jobsapp.urls")),
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
     path("api/schema/swagger", SpectacularSwaggerView.as_view(url_name='schema'), name="svagger"),
     path("api/schema/redoc", SpectacularRedocView.as_view(url_name='schema'), name="redoc"),
@@ -1,3 +1,27 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Blob, Upload, UploadSession
+
+
+@admin.register(Blob)
+class BlobAdmin(admin.ModelAdmin):
+    """Stored file contents; read-only, they are shared by uploads."""
+
+    list_display = "sha256", "size", "created_at"
+    search_fields = "sha256",
+    readonly_fields = "sha256", "size", "file", "created_at"
+
+
+@admin.register(Upload)
+class UploadAdmin(admin.ModelAdmin):
+    list_display = "name", "blob", "created_at"
+    list_select_related = "blob",
+    search_fields = "name", "blob__sha256"
+    raw_id_fields = "blob",
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = "name", "offset", "size", "upload", "updated_at"
+    list_select_related = "upload",
+    readonly_fields = "offset", "size", "upload"
@@ -0,0 +1,47 @@
+from timeit import timeit
+
+from django.core.management import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import resolve
+
+from requestdataapp.metrics import MetricsMiddleware, registry, render
+
+
+class Command(BaseCommand):
+    """
+        Microbenchmark: per-request overhead of MetricsMiddleware (microseconds)
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200_000)
+        parser.add_argument("--views", type=int, default=50,
+                            help="distinct view labels the requests are spread over")
+
+    def handle(self, *args, **options):
+        count = options["requests"]
+        response = HttpResponse()
+        requests = []
+        for i in range(options["views"]):
+            request = RequestFactory().get(f"/bench/{i}/")
+            request.resolver_match = resolve("/i18n/setlang/")
+            request.resolver_match.view_name = f"bench:view-{i}"
+            requests.append(request)
+
+        def view(request):
+            return response
+
+        middleware = MetricsMiddleware(view)
+        batch = [requests[i % len(requests)] for i in range(count)]
+
+        bare = timeit(lambda: [view(request) for request in batch], number=1)
+        registry.reset()
+        measured = timeit(lambda: [middleware(request) for request in batch], number=1)
+        overhead = (measured - bare) / count * 1e6
+        self.stdout.write(f"view only:       {bare / count * 1e6:.2f} us/request")
+        self.stdout.write(f"with middleware: {measured / count * 1e6:.2f} us/request")
+        self.stdout.write(f"overhead:        {overhead:.2f} us/request")
+
+        scrape = timeit(lambda: render(registry.snapshot()), number=100) / 100
+        self.stdout.write(f"scrape of {options['views']} views: {scrape * 1000:.2f} ms")
+        self.stdout.write(self.style.SUCCESS("Done..."))
@@ -0,0 +1,69 @@
+import random
+from timeit import timeit
+
+from django.core.management import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from requestdataapp.middlewares import UserAgentMiddleware
+from requestdataapp.useragent import parse_user_agent
+
+TEMPLATES = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{}.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.{} Safari/605.1.15",
+    "Mozilla/5.0 (X11; Linux x86_64; rv:{}.0) Gecko/20100101 Firefox/{}.0",
+    "Mozilla/5.0 (Linux; Android 14; SM-S9{}) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Mobile Safari/537.36",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_{} like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148",
+]
+
+
+class Command(BaseCommand):
+    """
+        Microbenchmark: cost of UserAgentMiddleware with and without request.user_agent reads
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=100_000)
+        parser.add_argument("--agents", type=int, default=300,
+                            help="distinct user agents, drawn with a skewed (Zipf-like) distribution")
+
+    def handle(self, *args, **options):
+        count = options["requests"]
+        agents = [
+            TEMPLATES[i % len(TEMPLATES)].format(*[100 + i // len(TEMPLATES)] * 2)
+            for i in range(options["agents"])
+        ]
+        weights = [1 / (rank + 1) for rank in range(len(agents))]
+        random.seed(0)
+        factory = RequestFactory()
+        batch = [
+            factory.get("/", headers={"User-Agent": agent})
+            for agent in random.choices(agents, weights, k=count)
+        ]
+        response = HttpResponse()
+
+        def view(request):
+            return response
+
+        def reading_view(request):
+            request.user_agent.device
+            return response
+
+        bare = timeit(lambda: [view(request) for request in batch], number=1)
+        untouched = UserAgentMiddleware(view)
+        lazy = timeit(lambda: [untouched(request) for request in batch], number=1)
+        parse_user_agent.cache_clear()
+        reading = UserAgentMiddleware(reading_view)
+        parsed = timeit(lambda: [reading(request) for request in batch], number=1)
+        info = parse_user_agent.cache_info()
+
+        self.stdout.write(f"UA never read:  {(lazy - bare) / count * 1e6:.2f} us/request")
+        self.stdout.write(f"UA read:        {(parsed - bare) / count * 1e6:.2f} us/request")
+        self.stdout.write(
+            f"cache: {info.hits} hits, {info.misses} misses "
+            f"({info.hits / (info.hits + info.misses):.1%} hit rate), {info.currsize} entries"
+        )
+        parse_user_agent.cache_clear()
+        cold = timeit(lambda: [parse_user_agent.__wrapped__(agent) for agent in agents], number=1)
+        self.stdout.write(f"uncached parse: {cold / len(agents) * 1e6:.2f} us")
+        self.stdout.write(self.style.SUCCESS("Done..."))
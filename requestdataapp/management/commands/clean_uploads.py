@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from requestdataapp.uploads import delete_stale_sessions
+
+
+class Command(BaseCommand):
+    """
+        Deletes unfinished resumable uploads idle for longer than UPLOAD_SESSION_MAX_AGE
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-age", type=int, default=settings.UPLOAD_SESSION_MAX_AGE,
+                            help="seconds since the last chunk")
+
+    def handle(self, *args, **options):
+        count = delete_stale_sessions(options["max_age"])
+        self.stdout.write(f"Deleted {count} stale upload sessions")
+        self.stdout.write(self.style.SUCCESS("Done..."))
@@ -0,0 +1,327 @@
+"""
+Request metrics in Prometheus text format.
+
+``MetricsMiddleware`` records, per view (URL name) and method:
+
+* ``http_requests_total{method, view, status}`` — counter;
+* ``http_request_duration_seconds{method, view}`` — histogram;
+* ``http_exceptions_total{method, view}`` — counter of unhandled view
+  exceptions;
+* ``http_requests_in_flight`` — gauge.
+
+The hot path takes no locks: every thread writes to its own shard (a
+``threading.local``) and only the exporter sums the shards. With
+``METRICS_FILE`` set, shards are regions of a memory-mapped file shared
+by all worker processes (see ``requestdataapp.metrics_store``), so any
+worker's ``/metrics`` reports the whole server; without it, counters
+are per process. ``metrics_view`` exposes them at ``/metrics`` for
+staff users or a scraper holding ``METRICS_TOKEN``.
+"""
+
+import logging
+import os
+import threading
+import weakref
+from bisect import bisect_left
+from functools import cached_property
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django.utils.crypto import constant_time_compare
+
+from .metrics_store import MmapStore, Region, RegionFull
+
+log = logging.getLogger(__name__)
+
+# Upper bounds of the latency buckets, seconds (Prometheus client defaults).
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+UNMATCHED_VIEW = "<unmatched>"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Series keys in the shared file: kind and labels joined by SEPARATOR.
+DURATION, STATUS, EXCEPTION = "d", "s", "e"
+SEPARATOR = "\x1f"
+
+
+class Shard:
+    """Metrics written by one thread, kept in process memory."""
+
+    def __init__(self):
+        # (method, view) -> bucket counts (last one is +Inf) followed by the sum
+        self.durations = {}
+        # (method, view, status) -> count
+        self.statuses = {}
+        # (method, view) -> count
+        self.exceptions = {}
+        self.in_flight = 0
+
+    def observe(self, method: str, view: str, status: int, seconds: float) -> None:
+        key = (method, view)
+        durations = self.durations.get(key)
+        if durations is None:
+            durations = self.durations[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+        durations[bisect_left(BUCKETS, seconds)] += 1
+        durations[-1] += seconds
+        key = (method, view, status)
+        self.statuses[key] = self.statuses.get(key, 0) + 1
+
+    def count_exception(self, method: str, view: str) -> None:
+        key = (method, view)
+        self.exceptions[key] = self.exceptions.get(key, 0) + 1
+
+
+class SharedShard:
+    """Metrics written by one thread into its region of the shared file."""
+
+    def __init__(self, region: Region):
+        self.region = region
+        self.values = region.values
+        self.in_flight_index = region.in_flight_index
+        # label tuple -> index of the first value in the region (None: no room)
+        self.slots = {}
+
+    def _slot(self, labels: tuple, count: int) -> int | None:
+        try:
+            slot = self.region.slot(SEPARATOR.join(map(str, labels)), count)
+        except RegionFull:
+            log.warning("Metrics region is full, %s is not recorded (raise METRICS_REGION_SIZE)", labels)
+            slot = None
+        self.slots[labels] = slot
+        return slot
+
+    @property
+    def in_flight(self) -> int:
+        return int(self.values[self.in_flight_index])
+
+    @in_flight.setter
+    def in_flight(self, value: int) -> None:
+        self.values[self.in_flight_index] = value
+
+    def observe(self, method: str, view: str, status: int, seconds: float) -> None:
+        values, slots = self.values, self.slots
+        key = (DURATION, method, view)
+        slot = slots[key] if key in slots else self._slot(key, len(BUCKETS) + 2)
+        if slot is not None:
+            values[slot + bisect_left(BUCKETS, seconds)] += 1
+            values[slot + len(BUCKETS) + 1] += seconds
+        key = (STATUS, method, view, status)
+        slot = slots[key] if key in slots else self._slot(key, 1)
+        if slot is not None:
+            values[slot] += 1
+
+    def count_exception(self, method: str, view: str) -> None:
+        key = (EXCEPTION, method, view)
+        slot = self.slots[key] if key in self.slots else self._slot(key, 1)
+        if slot is not None:
+            self.values[slot] += 1
+
+
+def store_from_settings() -> MmapStore | None:
+    if not settings.METRICS_FILE:
+        return None
+    return MmapStore(settings.METRICS_FILE, settings.METRICS_REGIONS, settings.METRICS_REGION_SIZE)
+
+
+class Registry:
+    """
+    All shards of the process.
+
+    :param store: shared file for the shards; by default the one of
+        ``METRICS_FILE``, if set
+    """
+
+    def __init__(self, store: MmapStore | None = None):
+        self._store = store
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        # A forked child must not keep writing to the regions of its parent.
+        os.register_at_fork(after_in_child=self._forget_local)
+
+    def _forget_local(self) -> None:
+        self._local = threading.local()
+
+    @cached_property
+    def store(self) -> MmapStore | None:
+        return self._store if self._store is not None else store_from_settings()
+
+    def shard(self) -> Shard | SharedShard:
+        try:
+            return self._local.shard
+        except AttributeError:
+            pass
+        region = self.store.claim() if self.store is not None else None
+        if region is not None:
+            shard = self._local.shard = SharedShard(region)
+            # The thread-local shard dies with its thread; the region is reused.
+            weakref.finalize(shard, self.store.release, region, os.getpid())
+            return shard
+        shard = self._local.shard = Shard()
+        # Once per thread; shards outlive their threads so that
+        # counters never go backwards.
+        with self._shards_lock:
+            self._shards.append(shard)
+        return shard
+
+    def count_exception(self, method: str, view: str) -> None:
+        self.shard().count_exception(method, view)
+
+    def snapshot(self) -> dict:
+        """Sum of the shared file and of the in-memory shards."""
+        durations, statuses, exceptions = {}, {}, {}
+        in_flight = 0
+        if self.store is not None:
+            shared = self.store.read()
+            for key, values in shared["series"].items():
+                kind, *labels = key.split(SEPARATOR)
+                if kind == DURATION:
+                    durations[tuple(labels)] = [int(value) for value in values[:-1]] + values[-1:]
+                elif kind == STATUS:
+                    method, view, status = labels
+                    statuses[(method, view, int(status))] = int(values[0])
+                elif kind == EXCEPTION:
+                    exceptions[tuple(labels)] = int(values[0])
+            in_flight += int(shared["in_flight"])
+        with self._shards_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for key, values in list(shard.durations.items()):
+                total = durations.setdefault(key, [0] * len(values))
+                for index, value in enumerate(values):
+                    total[index] += value
+            for source, target in ((shard.statuses, statuses), (shard.exceptions, exceptions)):
+                for key, value in list(source.items()):
+                    target[key] = target.get(key, 0) + value
+            in_flight += shard.in_flight
+        return {
+            "durations": durations,
+            "statuses": statuses,
+            "exceptions": exceptions,
+            "in_flight": in_flight,
+        }
+
+    def reset(self) -> None:
+        if self.store is not None:
+            self.store.reset()
+        with self._shards_lock:
+            for shard in self._shards:
+                in_flight = shard.in_flight
+                shard.__init__()
+                shard.in_flight = in_flight
+
+
+registry = Registry()
+
+
+def _labels(**labels) -> str:
+    escaped = (
+        '{}="{}"'.format(name, str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n"))
+        for name, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def render(snapshot: dict) -> str:
+    """Prometheus text exposition format (version 0.0.4)."""
+    lines = [
+        "# HELP http_requests_total Responses by view, method and status code.",
+        "# TYPE http_requests_total counter",
+    ]
+    for (method, view, status), value in sorted(snapshot["statuses"].items()):
+        lines.append(f"http_requests_total{_labels(method=method, view=view, status=status)} {value}")
+
+    lines += [
+        "# HELP http_request_duration_seconds Time spent in the middleware chain and the view.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (method, view), values in sorted(snapshot["durations"].items()):
+        cumulative = 0
+        for bound, count in zip((*BUCKETS, "+Inf"), values[:-1]):
+            cumulative += count
+            labels = _labels(method=method, view=view, le=bound)
+            lines.append(f"http_request_duration_seconds_bucket{labels} {cumulative}")
+        labels = _labels(method=method, view=view)
+        lines.append(f"http_request_duration_seconds_sum{labels} {values[-1]:.6f}")
+        lines.append(f"http_request_duration_seconds_count{labels} {cumulative}")
+
+    lines += [
+        "# HELP http_exceptions_total Unhandled exceptions raised by views.",
+        "# TYPE http_exceptions_total counter",
+    ]
+    for (method, view), value in sorted(snapshot["exceptions"].items()):
+        lines.append(f"http_exceptions_total{_labels(method=method, view=view)} {value}")
+
+    lines += [
+        "# HELP http_requests_in_flight Requests being processed.",
+        "# TYPE http_requests_in_flight gauge",
+        f"http_requests_in_flight {snapshot['in_flight']}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def view_label(request: HttpRequest) -> str:
+    """URL name of the resolved view: bounded cardinality, unlike paths."""
+    match = request.resolver_match
+    return match.view_name if match is not None else UNMATCHED_VIEW
+
+
+class MetricsMiddleware:
+    """
+    Records every request in ``registry``; sync and async capable.
+
+    Goes first in ``MIDDLEWARE`` so that the duration covers the whole
+    middleware chain.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if self.is_async:
+            return self.__acall__(request)
+        shard = registry.shard()
+        shard.in_flight += 1
+        start = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            shard.in_flight -= 1
+        shard.observe(request.method, view_label(request), response.status_code, perf_counter() - start)
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        shard = registry.shard()
+        shard.in_flight += 1
+        start = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            shard.in_flight -= 1
+        shard.observe(request.method, view_label(request), response.status_code, perf_counter() - start)
+        return response
+
+    def process_exception(self, request: HttpRequest, exception: Exception) -> None:
+        # Django still turns the exception into a 500 response (counted above).
+        registry.count_exception(request.method, view_label(request))
+
+
+def scrape_allowed(request: HttpRequest) -> bool:
+    token = settings.METRICS_TOKEN
+    if token:
+        header = request.headers.get("Authorization", "")
+        if header.startswith("Bearer ") and constant_time_compare(header[7:], token):
+            return True
+    return request.user.is_active and request.user.is_staff
+
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    if not scrape_allowed(request):
+        return HttpResponse("Forbidden", status=403, content_type="text/plain")
+    return HttpResponse(render(registry.snapshot()), content_type=CONTENT_TYPE)
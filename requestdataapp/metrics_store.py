@@ -0,0 +1,234 @@
+"""
+Metrics shared by all worker processes through a memory-mapped file.
+
+The file (``METRICS_FILE``) is split into ``METRICS_REGIONS`` regions of
+``METRICS_REGION_SIZE`` bytes. Every writing thread of every worker
+claims a region of its own, so increments are plain stores into the
+mapping, with no locks and no system calls. A scrape reads all the
+regions and sums them.
+
+Region layout (native byte order, 8-byte aligned)::
+
+    header   magic u32 | pad u32 | used u64 | in_flight f64 | pid u64
+    entries  key_len u32 | count u32 | key (padded to 8) | count * f64
+
+An entry is written first and published by bumping ``used``, so a
+reader never sees a half-written entry. Values are float64 counters,
+as in Prometheus.
+
+A region belongs to a process while the process holds an ``fcntl``
+lock on it. The kernel drops the lock when the process exits, however
+it exits, and a recycled worker then takes the region over with its
+counters intact, so totals never go backwards. Only the in-flight
+gauge of the dead worker is dropped.
+
+Within a process, the region of a thread that exits goes back to the
+store and the next new thread reuses it, so servers that recycle their
+threads do not run out of regions.
+"""
+
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import threading
+from collections.abc import Iterator
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+MAGIC = 0x4D545231  # "MTR1"
+HEADER = struct.Struct("=IIQdQ")
+ENTRY = struct.Struct("=II")
+USED_OFFSET = 8
+IN_FLIGHT_OFFSET = 16
+
+
+def _padded(size: int) -> int:
+    return (size + 7) & ~7
+
+
+class RegionFull(Exception):
+    pass
+
+
+class Region:
+    """A claimed region: the writing side, used by one thread only."""
+
+    in_flight_index = IN_FLIGHT_OFFSET // 8
+
+    def __init__(self, buffer: memoryview, size: int):
+        self.buffer = buffer
+        self.size = size
+        # float64 view of the whole region; values are addressed by index.
+        self.values = buffer.cast("d")
+        self.index = {}
+        magic, _, used, _, _ = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            HEADER.pack_into(buffer, 0, MAGIC, 0, 0, 0.0, os.getpid())
+        else:
+            # Taken over from an exited worker: keep its series.
+            for key, start, _ in iter_entries(buffer):
+                self.index[key] = start // 8
+            struct.pack_into("=dQ", buffer, IN_FLIGHT_OFFSET, 0.0, os.getpid())
+
+    @property
+    def used(self) -> int:
+        return struct.unpack_from("=Q", self.buffer, USED_OFFSET)[0]
+
+    def slot(self, key: str, count: int) -> int:
+        """Index of the first value of series ``key``, creating it if needed."""
+        try:
+            return self.index[key]
+        except KeyError:
+            pass
+        encoded = key.encode()
+        offset = HEADER.size + self.used
+        start = offset + ENTRY.size + _padded(len(encoded))
+        end = start + count * 8
+        if end > self.size:
+            raise RegionFull(key)
+        ENTRY.pack_into(self.buffer, offset, len(encoded), count)
+        self.buffer[offset + ENTRY.size:offset + ENTRY.size + len(encoded)] = encoded
+        # Values of a fresh region are zero already (sparse file).
+        struct.pack_into("=Q", self.buffer, USED_OFFSET, end - HEADER.size)
+        self.index[key] = start // 8
+        return start // 8
+
+
+def iter_entries(buffer) -> Iterator[tuple[str, int, int]]:
+    """``(key, start byte, value count)`` of the published entries."""
+    used = struct.unpack_from("=Q", buffer, USED_OFFSET)[0]
+    offset, end = HEADER.size, HEADER.size + used
+    while offset < end:
+        key_len, count = ENTRY.unpack_from(buffer, offset)
+        key_start = offset + ENTRY.size
+        key = bytes(buffer[key_start:key_start + key_len]).decode()
+        start = key_start + _padded(key_len)
+        yield key, start, count
+        offset = start + count * 8
+
+
+class MmapStore:
+    """
+    The shared metrics file of one deployment.
+
+    :param path: file path, created on first use
+    :param regions: number of regions (writing threads over all workers)
+    :param region_size: bytes per region
+    """
+
+    def __init__(self, path, regions: int, region_size: int):
+        self.path = Path(path)
+        self.regions = regions
+        self.region_size = _padded(region_size)
+        self._lock = threading.Lock()
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        # After fork the mapping is inherited but the fcntl locks are not:
+        # the child must claim regions of its own.
+        self._fd = None
+        self._mmap = None
+        self._claimed = set()
+        # Regions released by exited threads, still locked by this process.
+        self._free = []
+
+    def _open(self) -> None:
+        if self._mmap is not None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        size = self.regions * self.region_size
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+        self._fd = fd
+        self._mmap = mmap.mmap(fd, size)
+
+    def claim(self) -> Region | None:
+        """Claim a free region for the calling thread; None if all are taken."""
+        with self._lock:
+            if self._free:
+                return self._free.pop()
+            self._open()
+            for number in range(self.regions):
+                if number in self._claimed:
+                    continue
+                start = number * self.region_size
+                try:
+                    fcntl.lockf(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB, self.region_size, start)
+                except OSError:
+                    continue
+                self._claimed.add(number)
+                view = memoryview(self._mmap)[start:start + self.region_size]
+                return Region(view, self.region_size)
+        log.warning("All %s metrics regions of %s are taken", self.regions, self.path)
+        return None
+
+    def release(self, region: Region, pid: int) -> None:
+        """
+        Give back the region of an exited thread, claimed in process ``pid``.
+
+        The region stays locked, with its counters, for the next thread
+        of the process. A region claimed before a fork is not the
+        child's to give back.
+        """
+        if pid != os.getpid():
+            return
+        with self._lock:
+            self._free.append(region)
+
+    def _alive(self, number: int) -> bool:
+        """Whether a running process holds region ``number``."""
+        if number in self._claimed:
+            return True
+        start = number * self.region_size
+        try:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB, self.region_size, start)
+        except OSError:
+            return True
+        fcntl.lockf(self._fd, fcntl.LOCK_UN, self.region_size, start)
+        return False
+
+    def read(self) -> dict:
+        """
+        Sum of every series over all regions, plus ``in_flight``.
+
+        The in-flight gauge of a region nobody holds is left out: its
+        worker died in the middle of requests that will never finish.
+        """
+        totals = {}
+        in_flight = 0.0
+        # Under the lock: probing a region must not release the lock a
+        # thread of this process is taking on it at the same time.
+        with self._lock:
+            self._open()
+            for number in range(self.regions):
+                start = number * self.region_size
+                region = memoryview(self._mmap)[start:start + self.region_size]
+                magic, _, _, region_in_flight, _ = HEADER.unpack_from(region, 0)
+                if magic != MAGIC:
+                    continue
+                if self._alive(number):
+                    in_flight += region_in_flight
+                for key, value_start, count in iter_entries(region):
+                    values = struct.unpack_from(f"={count}d", region, value_start)
+                    total = totals.setdefault(key, [0.0] * count)
+                    for index, value in enumerate(values):
+                        total[index] += value
+        return {"series": totals, "in_flight": in_flight}
+
+    def reset(self) -> None:
+        """Zero every series in place (tests, benchmarks); keeps the layout."""
+        with self._lock:
+            self._open()
+            data = self._mmap
+        for number in range(self.regions):
+            start = number * self.region_size
+            region = memoryview(data)[start:start + self.region_size]
+            if HEADER.unpack_from(region, 0)[0] != MAGIC:
+                continue
+            for _, value_start, count in iter_entries(region):
+                region[value_start:value_start + count * 8] = bytes(count * 8)
@@ -1,33 +1,26 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.http import HttpRequest, HttpResponse
 
+from .useragent import LazyUserAgent
 
-def set_useragent_request_middleware(get_response):
 
-    print("Initial call")
+class UserAgentMiddleware:
+    """
+    Sets ``request.user_agent``, parsed on first use (see
+    ``requestdataapp.useragent``); sync and async capable.
+    """
 
-    def middleware(request: HttpRequest) -> HttpResponse:
-        print("Before get_response")
-        request.user_agent = request.META.get('HTTP_USER_AGENT')
-        response = get_response(request)
-        print("After get_response")
-        return response
-    return middleware
+    sync_capable = True
+    async_capable = True
 
-class CoontRequestMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
-        self.requests_count = 0
-        self.responses_count = 0
-        self.exceptions_count = 0
+        if iscoroutinefunction(get_response):
+            # Under ASGI: a sync-only middleware would pin async views
+            # (myauth login/register) to Django's shared sync thread.
+            markcoroutinefunction(self)
 
     def __call__(self, request: HttpRequest) -> HttpResponse:
-        self.requests_count += 1
-        print("requests count", self.requests_count)
-        response = self.get_response(request)
-        self.responses_count += 1
-        print("responses count", self.responses_count)
-        return response
-
-    def process_exception(self, request: HttpRequest, exception):
-        self.exceptions_count += 1
-        print("exceptions count:", self.exceptions_count)
\ No newline at end of file
+        # Returns the coroutine of get_response as is under ASGI.
+        request.user_agent = LazyUserAgent(request.META.get("HTTP_USER_AGENT", ""))
+        return self.get_response(request)
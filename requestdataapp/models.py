@@ -1,3 +1,41 @@
+import uuid
+
 from django.db import models
 
-# Create your models here.
+
+class Blob(models.Model):
+    """File content, stored once under its SHA-256 (see requestdataapp.uploads)."""
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    size = models.BigIntegerField()
+    file = models.FileField(max_length=200)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.sha256
+
+
+class Upload(models.Model):
+    """A file as a client uploaded it: its name and its content."""
+
+    name = models.CharField(max_length=255)
+    blob = models.ForeignKey(Blob, on_delete=models.PROTECT, related_name="uploads")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+class UploadSession(models.Model):
+    """A resumable upload; ``offset`` bytes of ``size`` have been received."""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    name = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    upload = models.OneToOneField(Upload, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.offset}/{self.size})"
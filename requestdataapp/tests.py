@@ -1,3 +1,247 @@
-from django.test import TestCase
+import copy
+import hashlib
+import multiprocessing
+import os
+import tempfile
+import threading
+from pathlib import Path
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import translation
+
+from .metrics import Registry, SharedShard
+from .middlewares import UserAgentMiddleware
+from .models import Blob, Upload, UploadSession
+from .metrics_store import HEADER, MAGIC, MmapStore
+from . import uploads
+from .useragent import LazyUserAgent, parse_user_agent
+
+
+class MetricsTestCase(TestCase):
+    def setUp(self):
+        # A registry of its own: the deployment's metrics file is left alone.
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        store = MmapStore(Path(directory.name) / "metrics.mmap", regions=8, region_size=16 * 1024)
+        patcher = patch("requestdataapp.metrics.registry", Registry(store))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        translation.activate("en")
+        self.addCleanup(translation.deactivate)
+
+    def test_requests_are_recorded(self):
+        self.client.get(reverse("myauth:foo-bar"))
+        self.client.get(reverse("myauth:foo-bar"))
+        self.client.get("/en/no-such-page/")
+        self.client.force_login(User.objects.create_user(username="ops", password="x", is_staff=True))
+
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        body = response.content.decode()
+        self.assertIn('http_requests_total{method="GET",view="myauth:foo-bar",status="200"} 2', body)
+        self.assertIn('http_requests_total{method="GET",view="<unmatched>",status="404"} 1', body)
+        self.assertIn(
+            'http_request_duration_seconds_bucket{method="GET",view="myauth:foo-bar",le="+Inf"} 2',
+            body,
+        )
+        self.assertIn('http_request_duration_seconds_count{method="GET",view="myauth:foo-bar"} 2', body)
+        # The scrape itself is still in flight.
+        self.assertIn("http_requests_in_flight 1", body)
+
+    def test_scrape_requires_staff_or_token(self):
+        self.client.force_login(User.objects.create_user(username="user", password="x"))
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        with self.settings(METRICS_TOKEN="s3cret"):
+            response = self.client.get(reverse("metrics"), headers={"Authorization": "Bearer s3cret"})
+            self.assertEqual(response.status_code, 200)
+            response = self.client.get(reverse("metrics"), headers={"Authorization": "Bearer wrong"})
+            self.assertEqual(response.status_code, 403)
+
+
+def _worker(path, requests, barrier=None, crash=False):
+    worker_registry = Registry(MmapStore(path, regions=8, region_size=16 * 1024))
+    shard = worker_registry.shard()
+    if barrier is not None:
+        # Every worker holds its region at the same time.
+        barrier.wait()
+    for _ in range(requests):
+        shard.observe("GET", "shopapp:products_list", 200, 0.02)
+    worker_registry.count_exception("GET", "shopapp:products_list")
+    if crash:
+        shard.in_flight += 1
+        os._exit(1)
+
+
+class SharedMetricsTestCase(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / "metrics.mmap"
+        self.context = multiprocessing.get_context("fork")
+
+    def run_workers(self, count, requests, **kwargs):
+        processes = [
+            self.context.Process(target=_worker, args=(self.path, requests), kwargs=kwargs)
+            for _ in range(count)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(timeout=60)
+
+    def scrape(self):
+        return Registry(MmapStore(self.path, regions=8, region_size=16 * 1024)).snapshot()
+
+    def test_workers_are_merged(self):
+        self.run_workers(4, 500, barrier=self.context.Barrier(4))
+        snapshot = self.scrape()
+        self.assertEqual(snapshot["statuses"], {("GET", "shopapp:products_list", 200): 2000})
+        self.assertEqual(snapshot["exceptions"], {("GET", "shopapp:products_list"): 4})
+        durations = snapshot["durations"][("GET", "shopapp:products_list")]
+        self.assertEqual(durations[2], 2000)  # le=0.025
+        self.assertAlmostEqual(durations[-1], 40.0)
+
+    def test_recycled_workers_keep_counters(self):
+        self.run_workers(2, 100, barrier=self.context.Barrier(2))
+        # Replacements (one of them dies mid-request) take the regions over.
+        self.run_workers(1, 50)
+        self.run_workers(1, 50, crash=True)
+        snapshot = self.scrape()
+        self.assertEqual(snapshot["statuses"], {("GET", "shopapp:products_list", 200): 300})
+        self.assertEqual(snapshot["in_flight"], 0)
+        data = self.path.read_bytes()
+        used = [number for number in range(8) if HEADER.unpack_from(data, number * 16 * 1024)[0] == MAGIC]
+        self.assertEqual(used, [0, 1])
+
+    def test_exited_threads_give_their_regions_back(self):
+        worker_registry = Registry(MmapStore(self.path, regions=2, region_size=16 * 1024))
+        shards = []
+
+        def serve():
+            shard = worker_registry.shard()
+            shards.append(type(shard))
+            shard.observe("GET", "shopapp:products_list", 200, 0.02)
+
+        for _ in range(6):
+            thread = threading.Thread(target=serve)
+            thread.start()
+            thread.join()
+        self.assertEqual(shards, [SharedShard] * 6)
+        snapshot = self.scrape()
+        self.assertEqual(snapshot["statuses"], {("GET", "shopapp:products_list", 200): 6})
+
+
+class UserAgentTestCase(SimpleTestCase):
+    CHROME_WINDOWS = (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36"
+    )
+    SAFARI_IPHONE = (
+        "Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 "
+        "(KHTML, like Gecko) Version/17.5 Mobile/15E148 Safari/604.1"
+    )
+
+    def setUp(self):
+        parse_user_agent.cache_clear()
+
+    def test_parse(self):
+        user_agent = parse_user_agent(self.CHROME_WINDOWS)
+        self.assertEqual(
+            (user_agent.browser, user_agent.browser_version, user_agent.os, user_agent.device),
+            ("Chrome", "126.0.0.0", "Windows", "desktop"),
+        )
+        user_agent = parse_user_agent(self.SAFARI_IPHONE)
+        self.assertEqual(
+            (user_agent.browser, user_agent.os, user_agent.os_version, user_agent.device),
+            ("Safari", "iOS", "17.5", "mobile"),
+        )
+        self.assertTrue(user_agent.is_mobile)
+        self.assertTrue(parse_user_agent("Googlebot/2.1 (+http://www.google.com/bot.html)").is_bot)
+        self.assertEqual(parse_user_agent("").browser, "Other")
+
+    def test_parsed_lazily_and_cached(self):
+        middleware = UserAgentMiddleware(lambda request: request)
+        request = middleware(RequestFactory().get("/", headers={"User-Agent": self.CHROME_WINDOWS}))
+        self.assertEqual(parse_user_agent.cache_info().currsize, 0)
+
+        self.assertEqual(request.user_agent.browser, "Chrome")
+        self.assertEqual(str(request.user_agent), self.CHROME_WINDOWS)
+        request = middleware(RequestFactory().get("/", headers={"User-Agent": self.CHROME_WINDOWS}))
+        self.assertEqual(request.user_agent.os, "Windows")
+        info = parse_user_agent.cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 1))
+
+    def test_special_names_are_not_parsed(self):
+        user_agent = LazyUserAgent(self.CHROME_WINDOWS)
+        self.assertFalse(hasattr(user_agent, "__html__"))
+        self.assertEqual(copy.copy(user_agent).string, self.CHROME_WINDOWS)
+        self.assertEqual(parse_user_agent.cache_info().currsize, 0)
+
+
+class UploadTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.media_root = Path(directory.name)
+        settings = override_settings(MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        translation.activate("en")
+        self.addCleanup(translation.deactivate)
+
+    def stored_files(self):
+        return [path for path in (self.media_root / "cas").rglob("*") if path.is_file()]
+
+    def test_form_uploads_are_deduplicated(self):
+        content = b"id,name\n1,Laptop\n" * 1000
+        digest = hashlib.sha256(content).hexdigest()
+        for name in ("products.csv", "products (1).csv"):
+            response = self.client.post(
+                reverse("req:file_upload"),
+                {"myfile": SimpleUploadedFile(name, content)},
+            )
+            self.assertContains(response, digest)
+
+        self.assertEqual(Upload.objects.count(), 2)
+        blob = Blob.objects.get()
+        self.assertEqual((blob.sha256, blob.size), (digest, len(content)))
+        self.assertEqual(self.stored_files(), [self.media_root / "cas" / digest[:2] / digest[2:4] / digest])
+
+    def patch(self, location, offset, chunk):
+        return self.client.patch(
+            location,
+            chunk,
+            content_type="application/offset+octet-stream",
+            headers={"Upload-Offset": str(offset)},
+        )
+
+    def test_resumable_upload(self):
+        content = os.urandom(300_000)
+        response = self.client.post(
+            reverse("req:upload_sessions"),
+            headers={"Upload-Length": str(len(content)), "Upload-Name": "backup.bin"},
+        )
+        self.assertEqual(response.status_code, 201)
+        location = response["Location"]
+
+        self.assertEqual(self.patch(location, 0, content[:100_000])["Upload-Offset"], "100000")
+        # A retried chunk at a stale offset is refused with the offset to resume from.
+        response = self.patch(location, 0, content[:100_000])
+        self.assertEqual((response.status_code, response["Upload-Offset"]), (409, "100000"))
+        self.assertEqual(self.client.head(location)["Upload-Offset"], "100000")
+        # Another worker has no running hash and rebuilds it from the partial file.
+        uploads._session_hashers.clear()
+
+        response = self.patch(location, 100_000, content[100_000:])
+        self.assertEqual(response.status_code, 204)
+        digest = hashlib.sha256(content).hexdigest()
+        self.assertEqual(response["Upload-SHA256"], digest)
+        session = UploadSession.objects.get()
+        self.assertEqual((session.upload.name, session.upload.blob.sha256), ("backup.bin", digest))
+        self.assertEqual(self.stored_files()[0].read_bytes(), content)
+        self.assertEqual(self.patch(location, len(content), b"").status_code, 409)
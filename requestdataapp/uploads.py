@@ -0,0 +1,228 @@
+"""
+Content-addressed upload storage.
+
+Every file is stored once, under its SHA-256, in a sharded layout below
+``UPLOAD_STORE_DIR`` (a directory of the default storage)::
+
+    cas/9f/86/9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08
+
+Uploading a file that is already stored only adds an ``Upload`` row
+pointing at the existing ``Blob``.
+
+Files arrive two ways, both streamed to a temporary file in the same
+directory while being hashed, so they never sit in worker memory:
+
+* a multipart form (``handle_file_upload``), through
+  ``HashingUploadHandler``;
+* a resumable upload session: ``POST`` creates it with the total size,
+  every ``PATCH`` appends the bytes at ``Upload-Offset``, ``HEAD`` tells
+  the client where to resume after a broken connection. The upload is
+  committed when the offset reaches the size.
+"""
+
+import fcntl
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Blob, Upload, UploadSession
+
+# Bytes read from the request body at a time.
+UPLOAD_READ_SIZE = 256 * 1024
+# Running hashes of sessions this worker received the last chunk of;
+# any other worker rebuilds the hash from the partial file.
+SESSION_HASHERS_LIMIT = 64
+
+_session_hashers = OrderedDict()
+_session_hashers_lock = threading.Lock()
+
+
+class UploadConflict(Exception):
+    """The session is at another offset, complete, or busy with another request."""
+
+
+def store_root() -> Path:
+    return Path(default_storage.path(settings.UPLOAD_STORE_DIR))
+
+
+def blob_name(digest: str) -> str:
+    """Storage name of the file with SHA-256 ``digest``."""
+    return f"{settings.UPLOAD_STORE_DIR}/{digest[:2]}/{digest[2:4]}/{digest}"
+
+
+def temp_dir() -> Path:
+    # Next to the blobs, so that committing is a rename.
+    path = store_root() / "tmp"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def commit_blob(temp_path: Path, digest: str, size: int) -> Blob:
+    """Move a fully written temporary file into the store, unless stored already."""
+    name = blob_name(digest)
+    target = Path(default_storage.path(name))
+    if target.exists():
+        temp_path.unlink()
+    else:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.chmod(temp_path, 0o644)
+        # Atomic: a concurrent upload of the same content replaces it
+        # with identical bytes.
+        os.replace(temp_path, target)
+    blob, _ = Blob.objects.get_or_create(sha256=digest, defaults={"size": size, "file": name})
+    return blob
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """
+    Streams multipart files into the store, hashing them on the way.
+
+    ``request.FILES`` gets ``UploadedFile`` objects with a ``blob``
+    attribute. Must be the only upload handler of the request.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        if self.content_length and self.content_length > settings.UPLOAD_MAX_SIZE:
+            raise StopUpload(connection_reset=True)
+        self.file = tempfile.NamedTemporaryFile(dir=temp_dir(), suffix=".upload", delete=False)
+        self.hasher = hashlib.sha256()
+        self.size = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.size > settings.UPLOAD_MAX_SIZE:
+            self.upload_interrupted()
+            raise StopUpload(connection_reset=True)
+        self.file.write(raw_data)
+        self.hasher.update(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        self.file.close()
+        blob = commit_blob(Path(self.file.name), self.hasher.hexdigest(), file_size)
+        uploaded = UploadedFile(
+            file=default_storage.open(blob.file.name, "rb"),
+            name=self.file_name,
+            content_type=self.content_type,
+            size=file_size,
+        )
+        uploaded.blob = blob
+        return uploaded
+
+    def upload_interrupted(self):
+        file = getattr(self, "file", None)
+        if file is not None:
+            file.close()
+            Path(file.name).unlink(missing_ok=True)
+
+
+def part_path(session: UploadSession) -> Path:
+    return temp_dir() / f"{session.pk}.part"
+
+
+def create_session(name: str, size: int) -> UploadSession:
+    session = UploadSession.objects.create(name=name, size=size)
+    part_path(session).touch()
+    return session
+
+
+def _session_hasher(session: UploadSession, part):
+    with _session_hashers_lock:
+        cached = _session_hashers.pop(session.pk, None)
+    if cached is not None and cached[0] == session.offset:
+        return cached[1]
+    hasher = hashlib.sha256()
+    part.seek(0)
+    remaining = session.offset
+    while remaining:
+        data = part.read(min(UPLOAD_READ_SIZE, remaining))
+        hasher.update(data)
+        remaining -= len(data)
+    return hasher
+
+
+def append_chunk(session: UploadSession, offset: int, stream, length: int) -> UploadSession:
+    """
+    Write ``length`` bytes of ``stream`` at ``offset`` of the session.
+
+    The bytes received before a broken connection are kept: the
+    session's offset tells the client where to resume. The last chunk
+    commits the file into the store.
+
+    :raises UploadConflict: if the session is not at ``offset``, is
+        complete, or another request is writing to it
+    """
+    if session.upload_id is not None or offset != session.offset:
+        raise UploadConflict(session.offset)
+    if offset + length > session.size:
+        raise ValueError("Chunk goes past the upload size")
+
+    with open(part_path(session), "r+b") as part:
+        try:
+            fcntl.flock(part, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            raise UploadConflict(session.offset) from None
+        session.refresh_from_db(fields=["offset", "upload"])
+        if session.upload_id is not None or offset != session.offset:
+            raise UploadConflict(session.offset)
+
+        hasher = _session_hasher(session, part)
+        # Drops bytes past the recorded offset left by an interrupted request.
+        part.truncate(offset)
+        part.seek(offset)
+        written = 0
+        try:
+            while written < length:
+                data = stream.read(min(UPLOAD_READ_SIZE, length - written))
+                if not data:
+                    break
+                part.write(data)
+                hasher.update(data)
+                written += len(data)
+        finally:
+            part.flush()
+            os.fsync(part.fileno())
+            session.offset = offset + written
+            UploadSession.objects.filter(pk=session.pk).update(
+                offset=session.offset,
+                updated_at=timezone.now(),
+            )
+            if session.offset < session.size:
+                with _session_hashers_lock:
+                    _session_hashers[session.pk] = (session.offset, hasher)
+                    while len(_session_hashers) > SESSION_HASHERS_LIMIT:
+                        _session_hashers.popitem(last=False)
+
+        if session.offset == session.size:
+            # Still under the lock: the part file is committed only once.
+            with transaction.atomic():
+                blob = commit_blob(part_path(session), hasher.hexdigest(), session.size)
+                session.upload = Upload.objects.create(name=session.name, blob=blob)
+                session.save(update_fields=["upload", "updated_at"])
+    return session
+
+
+def delete_stale_sessions(max_age_seconds: int) -> int:
+    """Delete unfinished sessions idle for longer than ``max_age_seconds``, with their parts."""
+    stale = UploadSession.objects.filter(
+        upload__isnull=True,
+        updated_at__lt=timezone.now() - timedelta(seconds=max_age_seconds),
+    )
+    count = 0
+    for session in stale:
+        part_path(session).unlink(missing_ok=True)
+        session.delete()
+        count += 1
+    return count
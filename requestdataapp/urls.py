@@ -1,7 +1,13 @@
 
 from django.urls import path
 
-from requestdataapp.views import process_get_view, user_bio, handle_file_upload
+from requestdataapp.views import (
+    handle_file_upload,
+    process_get_view,
+    upload_session_view,
+    upload_sessions_view,
+    user_bio,
+)
 
 app_name = "req"
 
@@ -9,4 +15,6 @@ urlpatterns = [
     path("get/", process_get_view, name="get_view"),
     path("bio/", user_bio, name="user_bio"),
     path("upload/", handle_file_upload, name="file_upload"),
+    path("uploads/", upload_sessions_view, name="upload_sessions"),
+    path("uploads/<uuid:pk>/", upload_session_view, name="upload_session"),
 ]
\ No newline at end of file
@@ -0,0 +1,129 @@
+"""
+User-Agent parsing for ``request.user_agent``.
+
+``requestdataapp.middlewares.UserAgentMiddleware`` sets
+``request.user_agent`` to a ``LazyUserAgent``: the header is parsed only
+when a view or template reads one of its attributes. Parsing goes
+through an LRU cache keyed by the raw header (real traffic has a few
+hundred distinct user agents), so a cache hit costs a dict lookup;
+``parse_user_agent.cache_info()`` gives the hit rate.
+
+The parser covers the common browsers, operating systems and crawlers
+with a handful of regular expressions; anything else is reported as
+``"Other"``.
+"""
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+USER_AGENT_CACHE_SIZE = 1024
+# Longer headers are cut before parsing, which bounds the cache memory.
+USER_AGENT_MAX_LENGTH = 512
+OTHER = "Other"
+
+# Device classes
+DESKTOP, MOBILE, TABLET, BOT = "desktop", "mobile", "tablet", "bot"
+
+BOT_RE = re.compile(r"bot\b|crawl|spider|slurp|curl/|wget/|python-requests|httpx|go-http-client", re.I)
+# (name, pattern); the first match wins, so derived browsers go first.
+BROWSERS = [
+    ("Edge", re.compile(r"Edg(?:e|A|iOS)?/([\d.]+)")),
+    ("Opera", re.compile(r"(?:OPR|Opera)/([\d.]+)")),
+    ("Samsung Internet", re.compile(r"SamsungBrowser/([\d.]+)")),
+    ("Yandex Browser", re.compile(r"YaBrowser/([\d.]+)")),
+    ("Firefox", re.compile(r"(?:Firefox|FxiOS)/([\d.]+)")),
+    ("Chrome", re.compile(r"(?:Chrome|CriOS)/([\d.]+)")),
+    ("Safari", re.compile(r"Version/([\d.]+).*Safari/")),
+    ("Internet Explorer", re.compile(r"(?:MSIE |Trident/.*rv:)([\d.]+)")),
+]
+OPERATING_SYSTEMS = [
+    ("Windows", re.compile(r"Windows NT ([\d.]+)")),
+    ("iOS", re.compile(r"(?:iPhone|CPU) OS ([\d_]+)")),
+    ("Android", re.compile(r"Android ([\d.]+)")),
+    ("Chrome OS", re.compile(r"CrOS \S+ ([\d.]+)")),
+    ("macOS", re.compile(r"Mac OS X ([\d_.]+)")),
+    ("Linux", re.compile(r"Linux()")),
+]
+DESKTOP_SYSTEMS = {"Windows", "macOS", "Linux", "Chrome OS"}
+
+
+@dataclass(frozen=True)
+class UserAgent:
+    string: str
+    browser: str = OTHER
+    browser_version: str = ""
+    os: str = OTHER
+    os_version: str = ""
+    device: str = OTHER
+
+    def __str__(self):
+        return self.string
+
+    @property
+    def is_bot(self) -> bool:
+        return self.device == BOT
+
+    @property
+    def is_mobile(self) -> bool:
+        return self.device in (MOBILE, TABLET)
+
+
+def _match(rules, string: str) -> tuple[str, str]:
+    for name, pattern in rules:
+        match = pattern.search(string)
+        if match:
+            return name, match.group(1).replace("_", ".")
+    return OTHER, ""
+
+
+def _device(string: str, os: str) -> str:
+    if BOT_RE.search(string):
+        return BOT
+    if "iPad" in string or "Tablet" in string or (os == "Android" and "Mobile" not in string):
+        return TABLET
+    if "Mobi" in string or "iPhone" in string or os in ("Android", "iOS"):
+        return MOBILE
+    if os in DESKTOP_SYSTEMS:
+        return DESKTOP
+    return OTHER
+
+
+@lru_cache(maxsize=USER_AGENT_CACHE_SIZE)
+def parse_user_agent(string: str) -> UserAgent:
+    browser, browser_version = _match(BROWSERS, string)
+    os, os_version = _match(OPERATING_SYSTEMS, string)
+    return UserAgent(
+        string=string,
+        browser=browser,
+        browser_version=browser_version,
+        os=os,
+        os_version=os_version,
+        device=_device(string, os),
+    )
+
+
+class LazyUserAgent:
+    """
+    ``request.user_agent``: the raw header, parsed when an attribute is read.
+
+    Cheaper to create than ``SimpleLazyObject``; every attribute read is
+    an LRU cache hit once the header was parsed.
+    """
+
+    __slots__ = ("string",)
+
+    def __init__(self, string: str):
+        self.string = string[:USER_AGENT_MAX_LENGTH]
+
+    def __getattr__(self, name):
+        # copy, pickle and friends probe for special methods: no need to parse.
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(parse_user_agent(self.string), name)
+
+    def __str__(self):
+        return self.string
+
+    def __repr__(self):
+        return f"<LazyUserAgent {self.string!r}>"
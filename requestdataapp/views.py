@@ -1,6 +1,21 @@
-from django.core.files.storage import FileSystemStorage
+from django.conf import settings
 from django.http import HttpRequest, HttpResponse
-from django.shortcuts import render
+from django.shortcuts import get_object_or_404, render
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.views.decorators.http import require_http_methods, require_POST
+
+from .models import Upload, UploadSession
+from .uploads import (
+    HashingUploadHandler,
+    UploadConflict,
+    append_chunk,
+    create_session,
+    part_path,
+)
+
+# Content type of PATCH bodies; anything else could be parsed as a form.
+CHUNK_CONTENT_TYPE = "application/offset+octet-stream"
 
 # Create your views here.
 def process_get_view(request: HttpRequest) -> HttpResponse:
@@ -24,13 +39,86 @@ def user_bio(request: HttpRequest) -> HttpResponse:
         "requestdataapp/user-bio-form.html"
     )
 
+
+@csrf_exempt
 def handle_file_upload(request: HttpRequest) -> HttpResponse:
+    # Upload handlers can only be replaced before the CSRF check reads
+    # request.POST, hence the exempt/protect pair.
+    request.upload_handlers = [HashingUploadHandler(request)]
+    return _handle_file_upload(request)
+
+
+@csrf_protect
+def _handle_file_upload(request: HttpRequest) -> HttpResponse:
+    upload = None
     if request.method == "POST" and request.FILES.get("myfile"):
         myfile = request.FILES["myfile"]
-        fs = FileSystemStorage()
-        filename = fs.save(myfile.name, myfile)
-        print("Saved file:",filename)
+        upload = Upload.objects.create(name=myfile.name, blob=myfile.blob)
     return render(
         request,
-        "requestdataapp/file-upload.html"
+        "requestdataapp/file-upload.html",
+        context={"upload": upload},
     )
+
+
+def _session_headers(response: HttpResponse, session: UploadSession) -> HttpResponse:
+    response["Upload-Offset"] = session.offset
+    response["Upload-Length"] = session.size
+    response["Cache-Control"] = "no-store"
+    if session.upload_id is not None:
+        response["Upload-SHA256"] = session.upload.blob.sha256
+    return response
+
+
+def _int_header(request: HttpRequest, name: str) -> int | None:
+    try:
+        value = int(request.headers.get(name, ""))
+    except ValueError:
+        return None
+    return value if value >= 0 else None
+
+
+@require_POST
+def upload_sessions_view(request: HttpRequest) -> HttpResponse:
+    """Start a resumable upload: ``Upload-Length`` and ``Upload-Name`` headers."""
+    size = _int_header(request, "Upload-Length")
+    name = request.headers.get("Upload-Name", "").strip()
+    if size is None or not name:
+        return HttpResponse("Upload-Length and Upload-Name are required", status=400)
+    if size > settings.UPLOAD_MAX_SIZE:
+        return HttpResponse("Upload too large", status=413)
+    session = create_session(name[:255], size)
+    response = _session_headers(HttpResponse(status=201), session)
+    response["Location"] = reverse("req:upload_session", kwargs={"pk": session.pk})
+    return response
+
+
+@require_http_methods(["HEAD", "GET", "PATCH", "DELETE"])
+def upload_session_view(request: HttpRequest, pk) -> HttpResponse:
+    """Offset of a resumable upload (HEAD), the next chunk (PATCH), or cancel it."""
+    session = get_object_or_404(UploadSession.objects.select_related("upload__blob"), pk=pk)
+    if request.method == "DELETE":
+        if session.upload_id is None:
+            part_path(session).unlink(missing_ok=True)
+        session.delete()
+        return HttpResponse(status=204)
+    if request.method != "PATCH":
+        return _session_headers(HttpResponse(), session)
+
+    offset = _int_header(request, "Upload-Offset")
+    # No Content-Length means an empty body (the last PATCH of an empty file).
+    length = _int_header(request, "Content-Length") if "Content-Length" in request.headers else 0
+    if offset is None or length is None or (length and request.content_type != CHUNK_CONTENT_TYPE):
+        return HttpResponse(
+            f"Send the chunk as {CHUNK_CONTENT_TYPE} with Upload-Offset and Content-Length",
+            status=400,
+        )
+    try:
+        # The body is read from the connection piece by piece, not through request.body.
+        session = append_chunk(session, offset, request, length)
+    except UploadConflict:
+        session.refresh_from_db()
+        return _session_headers(HttpResponse("Upload offset mismatch", status=409), session)
+    except ValueError as exc:
+        return HttpResponse(str(exc), status=413)
+    return _session_headers(HttpResponse(status=204), session)
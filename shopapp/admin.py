@@ -5,16 +5,24 @@
 кастомные действия и inline-конфигурации.
 """
 
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.db.models import QuerySet
+from django.db.models.functions import Left
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import render, redirect
-from django.urls import path
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html
 
-from shopapp.models import Order, Product, ProductImage
-from shopapp.admin_mixins import ExportAsCSVmixin
-from .common import save_csv_products
+from jobsapp.models import Job
+from jobsapp.registry import enqueue
+from shopapp.models import ExportJob, Order, Product, ProductImage
+from shopapp.admin_mixins import ExportAsCSVmixin, LeanChangeListMixin
+from .tasks import store_import_file
 from .forms import CSVImportForm
+from .pagination import OrdersAdminPaginator, ProductsAdminPaginator
+from .search import fts_available, search_products
+from .signals import products_changed
 
 
 @admin.action(description="Archive products")
@@ -22,7 +30,8 @@ def mark_archived(modeladmin: admin.ModelAdmin,
                   request: HttpRequest,
                   queryset: QuerySet):
     """Admin action: archive selected products (soft delete)."""
-    queryset.update(archived=True)
+    queryset.update(archived=True, updated_at=timezone.now())
+    products_changed.send(sender=Product)
 
 
 @admin.action(description="Unarchive products")
@@ -30,7 +39,8 @@ def mark_unarchived(modeladmin: admin.ModelAdmin,
                     request: HttpRequest,
                     queryset: QuerySet):
     """Admin action: unarchive selected products."""
-    queryset.update(archived=False)
+    queryset.update(archived=False, updated_at=timezone.now())
+    products_changed.send(sender=Product)
 
 
 class ProductImageInline(admin.StackedInline):
@@ -53,9 +63,10 @@ class OrderInline(admin.TabularInline):
 
 # Register your models here.
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin, ExportAsCSVmixin):
+class ProductAdmin(LeanChangeListMixin, admin.ModelAdmin, ExportAsCSVmixin):
     """Admin configuration for Product model."""
     change_list_template = "shopapp/products-change-list.html"
+    paginator = ProductsAdminPaginator
 
     actions = [
         mark_archived,
@@ -75,11 +86,12 @@ class ProductAdmin(admin.ModelAdmin, ExportAsCSVmixin):
         "archived"
     )
     list_display_links = "pk", "name"
+    list_only = "pk", "name", "price", "discount", "archived"
     ordering = ("pk",)
     search_fields = "name", "description"
     fieldsets = [
         (None, {
-            "fields": ("name", "description"),
+            "fields": ("sku", "name", "description"),
         }),
         ("Price options", {
             "fields": ("price", "discount"),
@@ -96,6 +108,28 @@ class ProductAdmin(admin.ModelAdmin, ExportAsCSVmixin):
         }),
     ]
 
+    def trim_changelist_queryset(self, queryset: QuerySet) -> QuerySet:
+        """Load only the start of descriptions for ``description_short``."""
+        return super().trim_changelist_queryset(queryset).annotate(
+            description_head=Left("description", 41),
+        )
+
+    @admin.display(description="description short")
+    def description_short(self, obj: Product) -> str:
+        """Same as Product.description_short, from the annotated prefix."""
+        description = getattr(obj, "description_head", None)
+        if description is None:
+            return obj.description_short()
+        if len(description) > 40:
+            return description[:40] + "..."
+        return description
+
+    def get_search_results(self, request, queryset, search_term):
+        """Search products through the FTS5 index when it is available."""
+        if not fts_available():
+            return super().get_search_results(request, queryset, search_term)
+        return search_products(queryset, search_term), False
+
     def import_csv(self, request: HttpRequest) -> HttpResponse:
         if request.method == "GET":
             form = CSVImportForm()
@@ -109,21 +143,37 @@ class ProductAdmin(admin.ModelAdmin, ExportAsCSVmixin):
                 "form": form,
             }
             return render(request, "admin/csv_form.html", context, status=400)
-        # csv_file = TextIOWrapper(
-        #     form.files["csv_file"].file,
-        #     encoding=request.encoding,
-        # )
-        # reader = DictReader(csv_file)
-        # products = [
-        #     Product(**row)
-        #     for row in reader
-        # ]
-        # Product.objects.bulk_create(products)
-        save_csv_products(
-                file=form.files["csv_file"].file,
-                encoding=request.encoding,
+        job = enqueue(
+            "shopapp.import_products_csv",
+            {
+                "name": store_import_file(form.files["csv_file"]),
+                "encoding": request.encoding,
+            },
+            user=request.user,
+        )
+        if job.status == Job.STATUS_DONE:
+            summary = job.result
+            self.message_user(
+                request,
+                "Data from CSV-files was imported: "
+                f"{summary['inserted']} inserted, {summary['updated']} updated, "
+                f"{summary['rejected']} rejected",
+            )
+            for error in summary["errors"][:10]:
+                self.message_user(
+                    request,
+                    f"Line {error['line']}: {error['errors']}",
+                    level=messages.WARNING,
+                )
+        else:
+            url = reverse("admin:jobsapp_job_change", args=[job.pk])
+            self.message_user(
+                request,
+                format_html(
+                    'CSV import {}: <a href="{}">job #{}</a>',
+                    job.get_status_display().lower(), url, job.pk,
+                ),
             )
-        self.message_user(request, "Data from CSV-files was imported")
         return redirect("..")
 
     def get_urls(self):
@@ -137,9 +187,12 @@ class ProductAdmin(admin.ModelAdmin, ExportAsCSVmixin):
         return new_urls + urls
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(LeanChangeListMixin, admin.ModelAdmin, ExportAsCSVmixin):
     """Admin configuration for Order model."""
 
+    actions = [
+        ExportAsCSVmixin.export_as_csv,
+    ]
     inlines = [
         ProductInline,
     ]
@@ -148,15 +201,29 @@ class OrderAdmin(admin.ModelAdmin):
         "delivery_address",
         "promocode",
         "created_at",
+        "total",
+        "item_count",
         "user_verbose"
     )
     list_display_links = "pk", "delivery_address"
+    readonly_fields = "total", "item_count"
+    list_only = (
+        "pk",
+        "delivery_address",
+        "promocode",
+        "created_at",
+        "total",
+        "item_count",
+        "user__username",
+        "user__first_name",
+        "user__last_name",
+    )
     ordering = ("-created_at",)
+    paginator = OrdersAdminPaginator
 
     def get_queryset(self, request):
-        """Return optimized queryset for Order admin list view."""
-        return (Order.objects.select_related("user").
-                prefetch_related('products'))
+        """Return queryset for Order admin; products are not listed, so not prefetched."""
+        return Order.objects.select_related("user")
 
     def user_verbose(self, obj: Order) -> str:
         """Return user display name for list_display column."""
@@ -164,3 +231,48 @@ class OrderAdmin(admin.ModelAdmin):
                 or obj.user.username).upper()
 
 
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    """Read-only progress and downloads of background CSV exports."""
+
+    list_display = (
+        "pk",
+        "model_label",
+        "status",
+        "progress_verbose",
+        "download",
+        "created_by",
+        "created_at",
+    )
+    list_filter = ("status",)
+    list_select_related = ("created_by",)
+    fields = (
+        "model_label",
+        "fields",
+        "status",
+        "progress_verbose",
+        "download",
+        "error",
+        "created_by",
+        "created_at",
+        "finished_at",
+    )
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description="progress")
+    def progress_verbose(self, obj: ExportJob) -> str:
+        """Return processed/total rows with percentage."""
+        return f"{obj.processed} / {obj.total} ({obj.progress}%)"
+
+    @admin.display(description="file")
+    def download(self, obj: ExportJob) -> str:
+        """Return a download link once the export is done."""
+        if not obj.file:
+            return "-"
+        return format_html('<a href="{}">{}</a>', obj.file.url, obj.file.name)
@@ -1,24 +1,66 @@
-import csv
-
+from django.contrib.admin.views.main import ERROR_FLAG, IGNORED_PARAMS, PAGE_VAR, SEARCH_VAR, ChangeList
 from django.db.models import QuerySet
-from django.db.models.options import Options
-from django.http import HttpRequest, HttpResponse
+from django.http import HttpRequest
+from django.urls import reverse
+from django.utils.html import format_html
+
+from .exports import create_export_job
 
 
 class ExportAsCSVmixin:
+    """
+    Admin action exporting the selection to a gzip CSV in the background.
+
+    The export runs as an ``ExportJob`` (see ``shopapp.exports``);
+    its progress and download link are shown in the "Export jobs" admin.
+    The job stores the selected pks, or, with "select all", the
+    changelist's filters and search term, and rebuilds the queryset.
+    """
+
     def export_as_csv(self, request: HttpRequest, queryset: QuerySet):
-        meta: Options = self.model._meta
-        field_names =[field.name for field in meta.fields]
+        if request.POST.get("select_across") == "1":
+            lookups = dict(request.GET.lists())
+            for name in (PAGE_VAR, ERROR_FLAG, *IGNORED_PARAMS):
+                lookups.pop(name, None)
+            selection = {"lookups": lookups, "search": request.GET.get(SEARCH_VAR, "")}
+        else:
+            # No more than a page of rows.
+            selection = {"pks": list(queryset.values_list("pk", flat=True))}
+        job = create_export_job(queryset.model, selection, user=request.user)
+        url = reverse("admin:shopapp_exportjob_change", args=[job.pk])
+        self.message_user(
+            request,
+            format_html('Export started: <a href="{}">job #{}</a>', url, job.pk),
+        )
+
+    export_as_csv.short_description = 'Export to CSV'
+
+
+class LeanChangeList(ChangeList):
+    """ChangeList that loads only the columns listed in ``list_only``."""
+
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        return self.model_admin.trim_changelist_queryset(queryset)
+
 
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename={meta} - export.csv'
+class LeanChangeListMixin:
+    """
+    Changelist for large tables.
 
-        csv_writer = csv.writer(response)
-        csv_writer.writerow(field_names)
+    - ``paginator`` should estimate or cache counts
+      (see ``shopapp.pagination.EstimatedCountPaginator``);
+    - the second, unfiltered ``COUNT(*)`` is disabled;
+    - the page queryset is limited to ``list_only`` fields.
+    """
 
-        for obj in queryset:
-            csv_writer.writerow([getattr(obj, field) for field in field_names])
+    show_full_result_count = False
+    list_only = ()
 
-        return response
+    def get_changelist(self, request, **kwargs):
+        return LeanChangeList
 
-    export_as_csv.short_description = 'Export to CSV'
\ No newline at end of file
+    def trim_changelist_queryset(self, queryset: QuerySet) -> QuerySet:
+        if self.list_only:
+            queryset = queryset.only(*self.list_only)
+        return queryset
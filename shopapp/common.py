@@ -1,18 +1,206 @@
-from csv import DictReader
+import zlib
+from csv import DictReader, writer
+from dataclasses import dataclass, field
 from io import TextIOWrapper
+from collections.abc import Iterable, Iterator, Sequence
 
-from shopapp.models import Product
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import QuerySet
 
+from shopapp.models import Order, Product
+from shopapp.orders import recompute_order_totals
+from shopapp.signals import products_changed
 
-def save_csv_products(file, encoding):
+# Сколько строк забирать с курсора БД за один раз при экспорте.
+EXPORT_CHUNK_SIZE = 2000
+# Размер (в символах) одного куска CSV, отдаваемого клиенту.
+EXPORT_BUFFER_SIZE = 64 * 1024
+
+# Колонки CSV, которые понимает импорт, и поля, обновляемые по sku.
+IMPORT_FIELDS = ("sku", "name", "description", "price", "discount", "archived")
+IMPORT_UPDATE_FIELDS = ("name", "description", "price", "discount", "archived", "updated_at")
+# Сколько строк валидировать и записывать за одну пачку.
+IMPORT_BATCH_SIZE = 1000
+# Сколько ошибок по строкам возвращать в отчёте (остальные только считаются).
+IMPORT_MAX_REPORTED_ERRORS = 100
+
+
+class Echo:
+    """
+    Псевдо-буфер для csv.writer.
+
+    Вместо записи в файл ``write`` просто возвращает строку,
+    чтобы её можно было сразу отдать в поток ответа.
+    """
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def iter_csv(
+    queryset: QuerySet,
+    fields: Sequence[str],
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+    buffer_size: int = EXPORT_BUFFER_SIZE,
+) -> Iterator[bytes]:
+    """
+    Построчно формирует CSV по queryset, не держа его целиком в памяти.
+
+    Заголовок отдаётся сразу, чтобы клиент получил первые байты
+    до выполнения основного запроса. Строки читаются через серверный
+    курсор (``iterator``) и склеиваются в куски по ``buffer_size``.
+
+    :param queryset: отфильтрованный queryset
+    :param fields: экспортируемые поля (они же заголовок CSV)
+    :param chunk_size: сколько строк забирать из БД за раз
+    :param buffer_size: минимальный размер отдаваемого куска
+    :return: итератор кусков CSV в UTF-8
+    """
+    csv_writer = writer(Echo())
+    yield csv_writer.writerow(fields).encode()
+
+    buffer = []
+    buffered = 0
+    rows = queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+    for row in rows:
+        line = csv_writer.writerow(row)
+        buffer.append(line)
+        buffered += len(line)
+        if buffered >= buffer_size:
+            yield "".join(buffer).encode()
+            buffer.clear()
+            buffered = 0
+    if buffer:
+        yield "".join(buffer).encode()
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """
+    Сжимает поток кусков в gzip на лету.
+
+    После каждого куска выполняется sync flush, поэтому клиент получает
+    данные по мере их готовности, а не только в конце.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+@dataclass
+class ImportSummary:
+    """Итог импорта CSV: сколько строк добавлено, обновлено и отклонено."""
+
+    inserted: int = 0
+    updated: int = 0
+    rejected: int = 0
+    errors: list = field(default_factory=list)
+
+    def reject(self, line: int, errors: dict) -> None:
+        self.rejected += 1
+        if len(self.errors) < IMPORT_MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "errors": errors})
+
+
+def coerce_product_row(row: dict) -> Product:
+    """
+    Приводит строку CSV к типам полей Product и валидирует её.
+
+    Пустые значения у полей со значением по умолчанию заменяются
+    на default, неизвестные колонки игнорируются.
+
+    :raises ValidationError: со словарём ошибок по полям
+    """
+    values = {}
+    errors = {}
+    for name in IMPORT_FIELDS:
+        model_field = Product._meta.get_field(name)
+        raw = row.get(name)
+        if raw is None or raw == "":
+            if model_field.has_default():
+                continue
+            raw = None if model_field.null else ""
+        try:
+            values[name] = model_field.clean(raw, None)
+        except ValidationError as exc:
+            errors[name] = exc.messages
+    if errors:
+        raise ValidationError(errors)
+    return Product(**values)
+
+
+def _flush_products(batch: list, summary: ImportSummary, batch_size: int) -> None:
+    """
+    Записывает пачку товаров: строки с sku — upsert, без sku — вставка.
+    """
+    keyed = {}
+    plain = []
+    for product in batch:
+        if product.sku:
+            if product.sku in keyed:
+                summary.updated += 1
+            keyed[product.sku] = product
+        else:
+            plain.append(product)
+
+    with transaction.atomic():
+        # В той же транзакции, что и upsert: иначе параллельная вставка
+        # между запросами исказит счётчики inserted/updated.
+        existing = set(
+            Product.objects
+            .filter(sku__in=keyed)
+            .values_list("sku", flat=True)
+        )
+        if keyed:
+            Product.objects.bulk_create(
+                keyed.values(),
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=["sku"],
+                update_fields=IMPORT_UPDATE_FIELDS,
+            )
+        if plain:
+            Product.objects.bulk_create(plain, batch_size=batch_size)
+        if existing:
+            # Цены могли измениться, а upsert не вызывает post_save.
+            recompute_order_totals(Order.objects.filter(products__sku__in=existing))
+    summary.updated += len(existing)
+    summary.inserted += len(keyed) - len(existing) + len(plain)
+    products_changed.send(sender=Product)
+
+
+def save_csv_products(file, encoding, batch_size: int = IMPORT_BATCH_SIZE) -> ImportSummary:
+    """
+    Потоково импортирует товары из CSV.
+
+    Файл читается построчно, строки валидируются и пишутся пачками
+    по ``batch_size``, поэтому память не зависит от размера файла.
+    Строки с уже существующим sku обновляют товар.
+
+    :param file: бинарный файловый объект с CSV
+    :param encoding: кодировка файла
+    :param batch_size: размер пачки для bulk_create
+    :return: итог импорта с номерами отклонённых строк
+    """
     csv_file = TextIOWrapper(
         file,
         encoding=encoding,
     )
     reader = DictReader(csv_file)
-    products = [
-        Product(**row)
-        for row in reader
-    ]
-    Product.objects.bulk_create(products)
-    return products
+    summary = ImportSummary()
+    batch = []
+    for row in reader:
+        try:
+            batch.append(coerce_product_row(row))
+        except ValidationError as exc:
+            summary.reject(reader.line_num, exc.message_dict)
+            continue
+        if len(batch) >= batch_size:
+            _flush_products(batch, summary, batch_size)
+            batch = []
+    if batch:
+        _flush_products(batch, summary, batch_size)
+    return summary
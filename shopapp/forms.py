@@ -1,5 +1,5 @@
 from django.contrib.auth.models import Group
-from django.forms import ModelForm, Form, FileField
+from django.forms import ModelForm, Form, FileField, IntegerField, DateField
 
 from .models import Product
 
@@ -16,4 +16,10 @@ class ProductForm(ModelForm):
 
 
 class CSVImportForm(Form):
-    csv_file = FileField()
\ No newline at end of file
+    csv_file = FileField()
+
+
+class OrderFilterForm(Form):
+    user = IntegerField(required=False, min_value=1)
+    created_after = DateField(required=False)
+    created_before = DateField(required=False)
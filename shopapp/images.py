@@ -0,0 +1,239 @@
+"""
+Производные изображения товаров: миниатюры фиксированной ширины и WebP.
+
+Производные лежат рядом с оригиналом в подкаталоге ``derivatives``::
+
+    products/product_5/preview/desktop-1.jpg
+    products/product_5/preview/derivatives/desktop-1_320w.jpg
+    products/product_5/preview/derivatives/desktop-1_320w.webp
+
+Генерация и удаление файлов выполняются фоновыми задачами (jobsapp),
+которые видны воркеру только после коммита транзакции, поэтому запрос
+не ждёт Pillow и файловую систему.
+"""
+
+from pathlib import Path, PurePosixPath
+
+from django.conf import settings
+from django.core.files.images import get_image_dimensions
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from jobsapp.registry import enqueue
+from mysite.caching import bump_version_on_commit
+
+# Ширины миниатюр (px); больше оригинала не увеличиваем.
+THUMBNAIL_WIDTHS = (160, 320, 640)
+DERIVATIVES_DIR = "derivatives"
+WEBP_QUALITY = 80
+
+
+def derivative_name(name: str, width: int, fmt: str | None = None) -> str:
+    """
+    Имя производного файла в хранилище.
+
+    :param name: имя оригинала в хранилище
+    :param width: ширина миниатюры
+    :param fmt: расширение (``"webp"``); по умолчанию как у оригинала
+    """
+    path = PurePosixPath(name)
+    suffix = f".{fmt}" if fmt else path.suffix
+    return str(path.parent / DERIVATIVES_DIR / f"{path.stem}_{width}w{suffix}")
+
+
+def derivative_widths(width: int | None) -> list[int]:
+    """Ширины миниатюр, которые имеет смысл строить для оригинала."""
+    if not width:
+        return []
+    return [w for w in THUMBNAIL_WIDTHS if w < width]
+
+
+def generate_derivatives(media_root: str, name: str) -> list[str]:
+    """
+    Строит миниатюры и WebP-варианты одного изображения.
+
+    Функция не зависит от Django и выполняется в дочернем процессе.
+    Уже построенные производные (новее оригинала) пропускаются; если
+    построены все, оригинал не декодируется вовсе.
+
+    :return: имена созданных файлов относительно ``media_root``
+    """
+    source = Path(media_root) / name
+    source_mtime = source.stat().st_mtime
+    created = []
+    # Image.open читает только заголовок.
+    with Image.open(source) as original:
+        # Ширины считаются по размерам файла, как и width_field у ImageField.
+        stale = {}
+        for width in derivative_widths(original.width):
+            for fmt in (None, "webp"):
+                target_name = derivative_name(name, width, fmt)
+                target = Path(media_root) / target_name
+                if not target.exists() or target.stat().st_mtime < source_mtime:
+                    stale.setdefault(width, []).append((fmt, target_name, target))
+        if not stale:
+            return created
+        image = ImageOps.exif_transpose(original)
+        for width, targets in stale.items():
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.Resampling.LANCZOS)
+            for fmt, target_name, target in targets:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                if fmt == "webp":
+                    webp = resized if resized.mode in ("RGB", "RGBA") else resized.convert("RGBA")
+                    webp.save(target, "WEBP", quality=WEBP_QUALITY)
+                else:
+                    resized.save(target, format=original.format)
+                created.append(target_name)
+    return created
+
+
+def image_dimensions(field_file) -> tuple[int | None, int | None]:
+    """
+    Размеры только что загруженного файла (заголовок, без декодирования).
+
+    Для уже сохранённых файлов возвращает ``(None, None)``: их размеры
+    заполняет команда ``build_image_derivatives``. Поля width_field/
+    height_field у ImageField не используются — они открывают файл
+    при каждой загрузке модели, пока размеры не заполнены.
+    """
+    if not field_file or field_file._committed:
+        return None, None
+    return get_image_dimensions(field_file.file)
+
+
+def schedule_derivatives(*names: str) -> None:
+    """
+    Ставит построение производных в очередь фоновых задач.
+
+    При ``SHOPAPP_IMAGE_WORKERS = 0`` производные строятся сразу после
+    коммита (удобно для тестов и отладки).
+    """
+    names = [name for name in names if name]
+    if not names:
+        return
+    if settings.SHOPAPP_IMAGE_WORKERS:
+        enqueue("shopapp.build_derivatives", {"names": names})
+        return
+    media_root = str(settings.MEDIA_ROOT)
+    transaction.on_commit(lambda: build_derivatives(media_root, names))
+
+
+def build_derivatives(media_root: str, names: list[str]) -> int:
+    """
+    Строит производные изображений и сбрасывает кеши их товаров.
+
+    :return: сколько файлов создано
+    """
+    created = []
+    for name in names:
+        created += generate_derivatives(media_root, name)
+    if created:
+        touch_products(names)
+    return len(created)
+
+
+def touch_products(names: list[str]) -> None:
+    """
+    Обновляет updated_at товаров с этими изображениями (для ETag)
+    и версию кеша каталога: в разметке появились новые миниатюры.
+    """
+    from .models import Product
+    from .signals import PRODUCTS_CACHE_NAMESPACE
+
+    Product.objects.filter(
+        Q(preview__in=names) | Q(images__image__in=names)
+    ).update(updated_at=timezone.now())
+    bump_version_on_commit(PRODUCTS_CACHE_NAMESPACE)
+
+
+def delete_files(media_root: str, names: list[str]) -> int:
+    """
+    Удаляет оригиналы и их производные.
+
+    :return: сколько файлов удалено
+    """
+    deleted = 0
+    for name in names:
+        candidates = [name]
+        for width in THUMBNAIL_WIDTHS:
+            candidates += [derivative_name(name, width), derivative_name(name, width, "webp")]
+        for candidate in candidates:
+            try:
+                (Path(media_root) / candidate).unlink()
+            except FileNotFoundError:
+                continue
+            deleted += 1
+    return deleted
+
+
+def schedule_file_cleanup(names: list[str]) -> None:
+    """Удаление файлов фоновой задачей (строки удаляются в той же транзакции)."""
+    names = [name for name in names if name]
+    if not names:
+        return
+    if settings.SHOPAPP_IMAGE_WORKERS:
+        enqueue("shopapp.delete_files", {"names": names})
+        return
+    media_root = str(settings.MEDIA_ROOT)
+    transaction.on_commit(lambda: delete_files(media_root, names))
+
+
+def replace_product_images(product, files) -> list:
+    """
+    Заменяет все дополнительные изображения товара на ``files``.
+
+    Сначала новые файлы записываются в хранилище, затем в одной
+    транзакции удаляются старые строки (один DELETE) и создаются
+    новые (один bulk_create). Старые файлы удаляются в фоне после
+    коммита; при ошибке удаляются уже записанные новые файлы.
+
+    :param product: товар
+    :param files: загруженные файлы (UploadedFile)
+    :return: созданные объекты ProductImage
+    """
+    from .models import Product, ProductImage
+
+    field = ProductImage._meta.get_field("image")
+    images = []
+    try:
+        for file in files:
+            image = ProductImage(product=product)
+            image.width, image.height = get_image_dimensions(file)
+            name = field.generate_filename(image, file.name)
+            image.image = field.storage.save(name, file, max_length=field.max_length)
+            images.append(image)
+
+        with transaction.atomic():
+            old_images = ProductImage.objects.filter(product=product)
+            old_names = list(old_images.values_list("image", flat=True))
+            old_images.delete()
+            ProductImage.objects.bulk_create(images)
+            Product.objects.filter(pk=product.pk).update(updated_at=timezone.now())
+            schedule_file_cleanup(old_names)
+            schedule_derivatives(*(image.image.name for image in images))
+    except Exception:
+        for image in images:
+            field.storage.delete(image.image.name)
+        raise
+    return images
+
+
+def srcset(name: str, width: int | None, fmt: str | None = None) -> str:
+    """
+    Значение атрибута ``srcset`` для оригинала и его миниатюр.
+
+    Набор миниатюр выводится из сохранённой ширины оригинала, без
+    обращений к хранилищу: их строит фоновая задача сразу после
+    загрузки (см. :func:`schedule_derivatives`).
+    """
+    parts = [
+        f"{default_storage.url(derivative_name(name, w, fmt))} {w}w"
+        for w in derivative_widths(width)
+    ]
+    if fmt is None and width:
+        parts.append(f"{default_storage.url(name)} {width}w")
+    return ", ".join(parts)
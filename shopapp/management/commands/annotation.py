@@ -1,5 +1,4 @@
 from django.core.management import BaseCommand
-from django.db.models import Sum, Count
 
 from shopapp.models import Order
 
@@ -11,13 +10,11 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         self.stdout.write("Start demo annotations")
-        orders  = Order.objects.annotate(
-            total = Sum('products__price', default=0),
-            product_count = Count("products")
-        )
+        # Итоги хранятся в заказе, агрегировать товары не нужно.
+        orders = Order.objects.only("pk", "total", "item_count")
         for order in orders:
             print(f"Order: {order.id} "
-                  f"with {order.product_count} products "
+                  f"with {order.item_count} products "
                   f"product worth: {order.total} ")
 
         self.stdout.write(self.style.SUCCESS("Done..." ))
@@ -0,0 +1,72 @@
+from random import Random
+
+from django.contrib.auth.models import User
+from django.core.management import BaseCommand
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from mysite.benchmark import scratch_database, measure
+from shopapp.models import Order, Product
+from shopapp.views import OrderViewSet
+
+
+def create_one_by_one(user, payload):
+    """Old path: one order, then one INSERT per product link."""
+    for item in payload:
+        order = Order.objects.create(
+            user=user,
+            delivery_address=item["delivery_address"],
+            promocode=item["promocode"],
+        )
+        for product_id in item["products"]:
+            order.products.add(product_id)
+    return len(payload)
+
+
+def create_bulk(user, payload, key):
+    view = OrderViewSet.as_view({"post": "bulk"})
+    request = APIRequestFactory().post(
+        "/", {"orders": payload}, format="json", HTTP_IDEMPOTENCY_KEY=key,
+    )
+    force_authenticate(request, user=user)
+    response = view(request)
+    assert response.status_code == 201, response.data
+    return len(response.data["ids"])
+
+
+class Command(BaseCommand):
+    """
+        Benchmark per-order creation vs the bulk orders endpoint (orders/s)
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=5000)
+        parser.add_argument("--products-per-order", type=int, default=5)
+
+    def handle(self, *args, **options):
+        count = options["orders"]
+        rnd = Random(42)
+        with scratch_database(on_disk=True):
+            user = User.objects.create_user(username="bench", password="bench", is_staff=True)
+            Product.objects.bulk_create(
+                (Product(name=f"Product {i}", price=rnd.randrange(1, 1000)) for i in range(1000)),
+                batch_size=1000,
+            )
+            product_ids = list(Product.objects.values_list("pk", flat=True))
+            payload = [
+                {
+                    "delivery_address": f"Street {i}",
+                    "promocode": "",
+                    "products": rnd.sample(product_ids, options["products_per_order"]),
+                }
+                for i in range(count)
+            ]
+
+            self.report("one by one", measure(create_one_by_one, user, payload))
+            self.report("bulk endpoint", measure(create_bulk, user, payload, "bench-1"))
+        self.stdout.write(self.style.SUCCESS("Done..."))
+
+    def report(self, label: str, run: dict):
+        self.stdout.write(
+            f"{label:>14}: {run['result']} orders in {run['seconds']:.2f}s, "
+            f"{run['result'] / run['seconds']:,.0f} orders/s, peak {run['peak_kib']:,.0f} KiB"
+        )
@@ -0,0 +1,64 @@
+import random
+import tempfile
+from pathlib import Path
+from timeit import default_timer
+
+from django.conf import settings
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.management import BaseCommand
+
+from mysite.cache_backends import TieredCache
+
+
+class Command(BaseCommand):
+    """
+        Benchmark: FileBasedCache (the previous default) against TieredCache, microseconds per operation
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--keys", type=int, default=2000)
+        parser.add_argument("--operations", type=int, default=50_000)
+        parser.add_argument("--write-ratio", type=float, default=0.05)
+
+    def handle(self, *args, **options):
+        random.seed(0)
+        keys = [f"product:{i}" for i in range(options["keys"])]
+        weights = [1 / (rank + 1) for rank in range(len(keys))]
+        workload = [
+            (random.random() < options["write_ratio"], key)
+            for key in random.choices(keys, weights, k=options["operations"])
+        ]
+        value = {"name": "Laptop", "description": "x" * 800, "price": "999.00", "tags": list(range(20))}
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tiered_options = settings.CACHES["default"].get("OPTIONS", {})
+            backends = {
+                # As previously configured: default MAX_ENTRIES (300) and culling.
+                "FileBasedCache": FileBasedCache(str(Path(tmp_dir) / "files"), {}),
+                "TieredCache": TieredCache(str(Path(tmp_dir) / "cache.sqlite3"), {"OPTIONS": tiered_options}),
+            }
+            for name, cache in backends.items():
+                started = default_timer()
+                for key in keys:
+                    cache.set(key, value)
+                fill = (default_timer() - started) / len(keys)
+
+                hits = 0
+                started = default_timer()
+                for write, key in workload:
+                    if write:
+                        cache.set(key, value)
+                    elif cache.get(key) is not None:
+                        hits += 1
+                mixed = (default_timer() - started) / len(workload)
+                self.stdout.write(
+                    f"{name:15} set {fill * 1e6:8.1f} us   mixed {mixed * 1e6:8.1f} us/op   "
+                    f"hit ratio {hits / sum(not write for write, _ in workload):.1%}"
+                )
+                if isinstance(cache, TieredCache):
+                    stats = cache.stats()
+                    self.stdout.write(
+                        f"{'':15} L1 hit ratio {stats['l1_hit_ratio']:.1%}, get {stats['get_us']:.1f} us, "
+                        f"set {stats['set_us']:.1f} us, {stats['l1_entries']} entries in L1"
+                    )
+        self.stdout.write(self.style.SUCCESS("Done..."))
@@ -0,0 +1,77 @@
+from csv import DictWriter
+from timeit import default_timer
+
+from django.core.management import BaseCommand
+from django.http import HttpResponse
+from rest_framework.test import APIRequestFactory
+
+from mysite.benchmark import scratch_database, measure
+from shopapp.models import Product
+from shopapp.views import ProductViewSet
+
+
+def buffered_export(queryset, fields):
+    """Old download_csv: the whole body is built in memory first."""
+    response = HttpResponse(content_type="text/csv")
+    csv_writer = DictWriter(response, fieldnames=fields)
+    csv_writer.writeheader()
+    for product in queryset.only(*fields):
+        csv_writer.writerow({field: getattr(product, field) for field in fields})
+    return len(response.content)
+
+
+class Command(BaseCommand):
+    """
+        Benchmark buffered vs streaming CSV export of products
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=200_000)
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        with scratch_database():
+            self.stdout.write(f"Seeding {rows} products...")
+            Product.objects.bulk_create(
+                (
+                    Product(
+                        name=f"Product {i}",
+                        description="Lorem ipsum dolor sit amet " * 4,
+                        price=i % 10_000,
+                        discount=i % 50,
+                    )
+                    for i in range(rows)
+                ),
+                batch_size=5000,
+            )
+            fields = ["name", "description", "price", "discount"]
+
+            buffered = measure(buffered_export, Product.objects.order_by("pk"), fields)
+            self.report("buffered", buffered, buffered["seconds"])
+
+            for compress in ("", "gzip"):
+                run = measure(self.stream, compress)
+                label = "streaming+gzip" if compress else "streaming"
+                self.report(label, run, run["result"]["ttfb"])
+
+        self.stdout.write(self.style.SUCCESS("Done..."))
+
+    def stream(self, compress: str) -> dict:
+        view = ProductViewSet.as_view({"get": "download_csv"})
+        request = APIRequestFactory().get("/", {"compress": compress})
+        start = default_timer()
+        response = view(request)
+        size = 0
+        ttfb = None
+        for chunk in response.streaming_content:
+            if ttfb is None:
+                ttfb = default_timer() - start
+            size += len(chunk)
+        return {"ttfb": ttfb, "size": size}
+
+    def report(self, label: str, run: dict, ttfb: float):
+        self.stdout.write(
+            f"{label:>15}: total {run['seconds']:.3f}s, "
+            f"first byte {ttfb * 1000:.1f}ms, "
+            f"peak memory {run['peak_kib']:.0f} KiB"
+        )
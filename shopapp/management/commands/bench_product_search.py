@@ -0,0 +1,66 @@
+from random import Random
+from timeit import default_timer
+
+from django.core.management import BaseCommand
+from rest_framework.filters import SearchFilter
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from mysite.benchmark import scratch_database
+from shopapp.models import Product
+from shopapp.search import ProductFullTextSearchFilter
+from shopapp.views import ProductViewSet
+
+WORDS = (
+    "laptop desktop smartphone tablet monitor keyboard mouse camera "
+    "speaker headphones router printer charger cable adapter battery "
+    "black white silver gaming office compact wireless portable pro"
+).split()
+
+
+class Command(BaseCommand):
+    """
+        Benchmark icontains SearchFilter vs FTS5 product search
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        rnd = Random(42)
+        with scratch_database():
+            self.stdout.write(f"Seeding {rows} products...")
+            Product.objects.bulk_create(
+                (
+                    Product(
+                        name=" ".join([*rnd.choices(WORDS, k=2), f"model{rnd.randrange(rows)}"]),
+                        description=" ".join(rnd.choices(WORDS, k=20)),
+                    )
+                    for _ in range(rows)
+                ),
+                batch_size=5000,
+            )
+            view = ProductViewSet()
+            view.search_fields = ProductViewSet.search_fields
+            for query in ("wireless", "gaming lapt", "model4242", "model12345 printer"):
+                request = Request(APIRequestFactory().get("/", {"search": query}))
+                for backend in (SearchFilter(), ProductFullTextSearchFilter()):
+                    seconds, found = self.run_query(backend, request, view, options["repeat"])
+                    self.stdout.write(
+                        f"{type(backend).__name__:>28} {query!r:>26}: "
+                        f"{seconds * 1000:8.1f}ms, {found} matches"
+                    )
+        self.stdout.write(self.style.SUCCESS("Done..."))
+
+    def run_query(self, backend, request, view, repeat: int):
+        best = None
+        for _ in range(repeat):
+            start = default_timer()
+            queryset = backend.filter_queryset(request, Product.objects.all(), view)
+            found = queryset.count()
+            list(queryset.order_by("pk")[:10])
+            elapsed = default_timer() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, found
@@ -0,0 +1,90 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from PIL import Image
+
+from shopapp.images import generate_derivatives, touch_products
+from shopapp.models import Product, ProductImage
+
+
+class Command(BaseCommand):
+    """
+        Backfills thumbnails/WebP variants and image sizes for the catalog
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count())
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        media_root = str(settings.MEDIA_ROOT)
+        names = []
+        for model, field, width_field, height_field in (
+            (Product, "preview", "preview_width", "preview_height"),
+            (ProductImage, "image", "width", "height"),
+        ):
+            self.stdout.write(f"Collecting {model.__name__}.{field}...")
+            names.extend(self.fill_dimensions(
+                model, field, width_field, height_field, media_root, options["batch_size"],
+            ))
+
+        self.stdout.write(f"Building derivatives for {len(names)} images "
+                          f"in {options['workers']} processes...")
+        created = 0
+        failed = 0
+        touched = []
+        with ProcessPoolExecutor(max_workers=options["workers"]) as executor:
+            build = partial(self.build_one, media_root)
+            for name, result in zip(names, executor.map(build, names, chunksize=8)):
+                if isinstance(result, str):
+                    failed += 1
+                    self.stderr.write(f"{name}: {result}")
+                elif result:
+                    created += len(result)
+                    touched.append(name)
+        for start in range(0, len(touched), options["batch_size"]):
+            touch_products(touched[start:start + options["batch_size"]])
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {created} files, {failed} images failed"
+        ))
+
+    @staticmethod
+    def build_one(media_root: str, name: str):
+        try:
+            return generate_derivatives(media_root, name)
+        except Exception as exc:
+            return repr(exc)
+
+    def fill_dimensions(self, model, field, width_field, height_field, media_root, batch_size):
+        """Stores missing original sizes; returns names of existing images."""
+        names = []
+        pending = []
+        rows = (
+            model.objects
+            .exclude(**{field: ""})
+            .exclude(**{f"{field}__isnull": True})
+            .values_list("pk", field, width_field)
+            .iterator(chunk_size=batch_size)
+        )
+        for pk, name, width in rows:
+            path = Path(media_root) / name
+            if not path.exists():
+                self.stderr.write(f"Missing file: {name}")
+                continue
+            names.append(name)
+            if width is None:
+                with Image.open(path) as image:
+                    pending.append(model(pk=pk, **{
+                        width_field: image.width,
+                        height_field: image.height,
+                    }))
+            if len(pending) >= batch_size:
+                model.objects.bulk_update(pending, [width_field, height_field])
+                pending = []
+        if pending:
+            model.objects.bulk_update(pending, [width_field, height_field])
+        return names
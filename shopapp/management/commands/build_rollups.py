@@ -0,0 +1,22 @@
+from django.core.management import BaseCommand
+
+from shopapp.rollups import ROLLUP_CHUNK_SIZE, build_catalog_stats, build_sales_rollup
+
+
+class Command(BaseCommand):
+    """
+        Brings sales and catalog rollups up to date from their high-water marks
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=ROLLUP_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        sales = build_sales_rollup(options["chunk_size"])
+        self.stdout.write(
+            f"Sales: {sales['rows']} rows merged, {sales['dirty_days']} days rebuilt, "
+            f"high-water mark {sales['high_water']}"
+        )
+        catalog = build_catalog_stats()
+        self.stdout.write(f"Catalog: {'rebuilt' if catalog['rebuilt'] else 'unchanged'}")
+        self.stdout.write(self.style.SUCCESS("Done..."))
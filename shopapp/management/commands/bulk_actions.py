@@ -1,7 +1,9 @@
 from django.contrib.auth.models import User
 from django.core.management import BaseCommand
+from django.utils import timezone
 
 from shopapp.models import Product
+from shopapp.signals import products_changed
 
 
 class Command(BaseCommand):
@@ -26,7 +28,8 @@ class Command(BaseCommand):
 
         result = Product.objects.filter(
             name__contains ='Smartphone',
-        ).update(discount=15)
+        ).update(discount=15, updated_at=timezone.now())
+        products_changed.send(sender=Product)
 
         print(result)
 
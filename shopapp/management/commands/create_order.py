@@ -21,8 +21,7 @@ class Command(BaseCommand):
             promocode = "SALE5936",
             user = user,
         )
-        for product in product:
-            order.products.add(product)
+        order.products.add(*product)
         if created:
             self.stdout.write(self.style.SUCCESS(f"Created order {order.pk}" ))
         else:
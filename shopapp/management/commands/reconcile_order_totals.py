@@ -0,0 +1,16 @@
+from django.core.management import BaseCommand
+
+from shopapp.orders import reconcile_order_totals
+
+
+class Command(BaseCommand):
+    """
+        Recomputes denormalized order totals in pk-range batches
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        updated = reconcile_order_totals(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Done... {updated} orders reconciled"))
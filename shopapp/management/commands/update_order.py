@@ -14,8 +14,7 @@ class Command(BaseCommand):
             return
 
         products = Product.objects.all()
-        for product in products:
-            order.products.add(product)
+        order.products.add(*products)
 
         order.save()
         self.stdout.write(
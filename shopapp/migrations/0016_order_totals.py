@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-17 22:47
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_order_totals(apps, schema_editor):
+    Order = apps.get_model("shopapp", "Order")
+    links = (
+        Order.products.through.objects
+        .filter(order_id=OuterRef("pk"))
+        .order_by()
+        .values("order_id")
+    )
+    Order.objects.update(
+        total=Coalesce(
+            Subquery(links.annotate(total=Sum("product__price")).values("total")),
+            Value(Decimal("0.00")),
+        ),
+        item_count=Coalesce(
+            Subquery(links.annotate(count=Count("pk")).values("count")),
+            Value(0),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopapp', '0015_image_dimensions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.RunPython(fill_order_totals, migrations.RunPython.noop),
+    ]
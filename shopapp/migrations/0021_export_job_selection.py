@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-18 00:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopapp', '0020_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='exportjob',
+            name='query',
+        ),
+        migrations.AddField(
+            model_name='exportjob',
+            name='selection',
+            field=models.JSONField(default=dict, editable=False),
+        ),
+    ]
@@ -24,11 +24,12 @@ class Product(models.Model):
     Модель товара (Product).
 
     Хранит основную информацию о товаре:
+    - артикул (sku) — естественный ключ для импорта,
     - название и описание,
     - цену и скидку,
-    - превью-изображение,
+    - превью-изображение и его размеры (для width/height и srcset),
     - признак архивности (мягкое удаление),
-    - дату создания.
+    - дату создания и последнего изменения (валидатор для условных GET).
 
     Заказы тут: :model:`shopapp.Order`
     """
@@ -38,20 +39,42 @@ class Product(models.Model):
         Метаданные модели Product.
 
         По умолчанию товары сортируются по имени и цене.
+        Индексы (поле, id) обслуживают keyset-пагинацию API.
         """
         ordering = ["name", "price"]
+        indexes = [
+            models.Index(fields=["price", "id"], name="product_price_keyset_idx"),
+            models.Index(fields=["created_at", "id"], name="product_created_keyset_idx"),
+        ]
 
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     name = models.CharField(max_length=100, db_index=True)
-    description = models.TextField(null=False, blank=True, db_index=True)
+    description = models.TextField(null=False, blank=True)
     price = models.DecimalField(default=0, max_digits=8, decimal_places=2)
     discount = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     archived = models.BooleanField(default=False)
     preview = models.ImageField(
         null=True,
         blank=True,
         upload_to=product_preview_directory_path,
     )
+    preview_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    preview_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Запоминает загруженную из БД цену.
+
+        По ней при сохранении считается разница для итогов заказов
+        (см. :model:`shopapp.Order`).
+        """
+        instance = super().from_db(db, field_names, values)
+        if "price" in field_names:
+            instance._loaded_price = values[field_names.index("price")]
+        return instance
 
     def description_short(self) -> str:
         """
@@ -98,6 +121,7 @@ class ProductImage(models.Model):
     Модель дополнительного изображения товара (ProductImage).
 
     Каждое изображение связано с конкретным товаром.
+    Размеры оригинала сохраняются для width/height и srcset.
     """
 
     product = models.ForeignKey(
@@ -106,9 +130,32 @@ class ProductImage(models.Model):
         related_name="images",
     )
     image = models.ImageField(upload_to=product_images_directory_path)
+    width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    height = models.PositiveIntegerField(null=True, blank=True, editable=False)
     description = models.CharField(max_length=200, null=False, blank=True)
 
 
+class OrderBatch(models.Model):
+    """
+    Пакет заказов, созданный одним запросом массового API.
+
+    Ключ идемпотентности уникален в пределах пользователя: повтор
+    запроса с тем же ключом возвращает уже созданные заказы.
+    """
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "key"], name="order_batch_user_key_uniq"),
+        ]
+
+    key = models.CharField(max_length=100)
+    user = ForeignKey(User, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"OrderBatch(pk={self.pk}, key={self.key!r})"
+
+
 class Order(models.Model):
     """
     Модель заказа (Order).
@@ -119,12 +166,143 @@ class Order(models.Model):
     - дату создания,
     - пользователя (кто сделал заказ),
     - товары в заказе (Many-to-Many),
-    - файл(ы) подтверждения/чека (receipt), если есть.
+    - файл(ы) подтверждения/чека (receipt), если есть,
+    - сумму и количество товаров (total, item_count) — поддерживаются
+      при изменении состава заказа и цен, а не считаются при чтении,
+    - пакет массового создания (batch), если заказ пришёл через bulk API.
     """
 
+    class Meta:
+        """
+        Индекс (user, created_at) обслуживает список заказов
+        с фильтром по пользователю и периоду.
+        """
+        indexes = [
+            models.Index(fields=["user", "created_at"], name="order_user_created_idx"),
+        ]
+
     delivery_address = models.TextField(null=True, blank=True)
     promocode = models.CharField(max_length=20, null=False, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     user = ForeignKey(User, on_delete=models.PROTECT)
     products = models.ManyToManyField(Product, related_name="orders")
-    receipt = models.FileField(null=True, upload_to="orders/receipts/")
\ No newline at end of file
+    receipt = models.FileField(null=True, upload_to="orders/receipts/")
+    total = models.DecimalField(default=0, max_digits=12, decimal_places=2, editable=False)
+    item_count = models.PositiveIntegerField(default=0, editable=False)
+    batch = ForeignKey(
+        OrderBatch,
+        null=True,
+        blank=True,
+        editable=False,
+        on_delete=models.SET_NULL,
+        related_name="orders",
+    )
+
+
+class ExportJob(models.Model):
+    """
+    Фоновая выгрузка выборки админки в CSV (gzip).
+
+    Хранит параметры выборки (JSON), список полей, прогресс
+    (``processed`` из ``total`` строк) и готовый файл.
+    См. ``shopapp.exports``.
+    """
+
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    model_label = models.CharField(max_length=100)
+    selection = models.JSONField(default=dict, editable=False)
+    fields = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    file = models.FileField(null=True, blank=True, upload_to="exports/")
+    error = models.TextField(blank=True)
+    created_by = ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def progress(self) -> int:
+        """Процент выгруженных строк."""
+        if not self.total:
+            return 100 if self.status == self.STATUS_DONE else 0
+        return min(100, self.processed * 100 // self.total)
+
+    def __str__(self) -> str:
+        return f"ExportJob(pk={self.pk}, model={self.model_label!r}, status={self.status})"
+
+
+class RollupState(models.Model):
+    """
+    Состояние инкрементальной сводки.
+
+    ``high_water`` — последний обработанный id (для продаж — id строки
+    таблицы связей заказ–товар), ``token`` — версия исходных данных
+    для сводок, которые пересчитываются только при изменениях.
+    """
+
+    name = models.CharField(max_length=50, primary_key=True)
+    high_water = models.BigIntegerField(default=0)
+    token = models.CharField(max_length=64, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"RollupState(name={self.name!r}, high_water={self.high_water})"
+
+
+class DailyProductSales(models.Model):
+    """
+    Продажи товара за день: количество заказов с товаром и выручка.
+
+    Выручка считается по цене товара на момент обработки строки
+    сводкой (цена позиции в заказе не хранится).
+    """
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["day", "product"], name="daily_sales_day_product_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["product", "day"], name="daily_sales_product_day_idx"),
+        ]
+
+    day = models.DateField()
+    product = ForeignKey(Product, on_delete=CASCADE, related_name="daily_sales")
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(default=0, max_digits=14, decimal_places=2)
+
+
+class SalesDirtyDay(models.Model):
+    """
+    День, продажи которого нужно пересчитать целиком.
+
+    Отмечается при удалении товаров из заказа и удалении заказов —
+    такие изменения не видны по high-water mark.
+    """
+
+    day = models.DateField(unique=True)
+
+
+class CatalogPriceStats(models.Model):
+    """Сводка цен каталога (одна строка, pk=1)."""
+
+    products = models.PositiveIntegerField(default=0)
+    active = models.PositiveIntegerField(default=0)
+    archived = models.PositiveIntegerField(default=0)
+    min_price = models.DecimalField(null=True, max_digits=8, decimal_places=2)
+    max_price = models.DecimalField(null=True, max_digits=8, decimal_places=2)
+    avg_price = models.DecimalField(null=True, max_digits=10, decimal_places=2)
+    updated_at = models.DateTimeField(auto_now=True)
@@ -0,0 +1,129 @@
+"""
+Денормализованные итоги заказов: ``Order.total`` и ``Order.item_count``.
+
+Итоги поддерживаются инкрементально (см. обработчики в ``signals``),
+а ``recompute_order_totals`` пересчитывает их по таблице связей
+одним UPDATE с подзапросами — для точечных исправлений и сверки.
+``bulk_create_orders`` создаёт пакет заказов с уже посчитанными итогами.
+"""
+
+from collections.abc import Sequence
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef, QuerySet, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Order, OrderBatch
+
+# Сколько строк заказов/связей писать одним INSERT при массовом создании.
+BULK_ORDERS_BATCH_SIZE = 1000
+
+
+def recompute_order_totals(orders: QuerySet) -> int:
+    """
+    Пересчитывает итоги заказов из выборки одним запросом.
+
+    :param orders: queryset заказов
+    :return: количество обновлённых заказов
+    """
+    links = (
+        Order.products.through.objects
+        .filter(order_id=OuterRef("pk"))
+        .order_by()
+        .values("order_id")
+    )
+    return orders.order_by().update(
+        total=Coalesce(
+            Subquery(links.annotate(total=Sum("product__price")).values("total")),
+            Value(Decimal("0.00")),
+        ),
+        item_count=Coalesce(
+            Subquery(links.annotate(count=Count("pk")).values("count")),
+            Value(0),
+        ),
+    )
+
+
+def add_to_order_totals(order_ids, total: Decimal, item_count: int) -> int:
+    """Сдвигает итоги заказов на известную разницу."""
+    return Order.objects.filter(pk__in=order_ids).update(
+        total=F("total") + total,
+        item_count=F("item_count") + item_count,
+    )
+
+
+def reconcile_order_totals(batch_size: int = 5000) -> int:
+    """
+    Пересчитывает итоги всех заказов пачками по диапазонам pk.
+
+    :return: количество обновлённых заказов
+    """
+    last_pk = Order.objects.aggregate(last=Max("pk"))["last"] or 0
+    updated = 0
+    for start in range(0, last_pk, batch_size):
+        updated += recompute_order_totals(
+            Order.objects.filter(pk__gt=start, pk__lte=start + batch_size)
+        )
+    return updated
+
+
+def bulk_create_orders(
+    items: Sequence[dict],
+    prices: dict,
+    user,
+    key: str | None = None,
+    batch_size: int = BULK_ORDERS_BATCH_SIZE,
+) -> tuple[list[Order], bool]:
+    """
+    Создаёт пакет заказов в одной транзакции.
+
+    Заказы пишутся одним ``bulk_create``, все их товары — одним
+    ``bulk_create`` по таблице связей; итоги (total, item_count)
+    считаются здесь же по ``prices``, так как ``m2m_changed`` при этом
+    не отправляется. Повтор с тем же ``key`` ничего не создаёт.
+
+    :param items: заказы: ``delivery_address``, ``promocode``,
+        ``products`` (id товаров) и необязательный ``user`` (id)
+    :param prices: цены товаров по id (все товары из ``items``)
+    :param user: владелец пакета и заказов без ``user``
+    :param key: ключ идемпотентности
+    :param batch_size: размер пачки INSERT
+    :return: заказы пакета и признак, что они созданы сейчас
+    """
+    # signals импортирует этот модуль.
+    from .signals import orders_changed
+
+    with transaction.atomic():
+        batch = None
+        if key:
+            batch, created = OrderBatch.objects.get_or_create(user=user, key=key)
+            if not created:
+                return list(batch.orders.order_by("pk")), False
+
+        orders = []
+        order_products = []
+        for item in items:
+            product_ids = list(dict.fromkeys(item["products"]))
+            order_products.append(product_ids)
+            orders.append(Order(
+                user_id=item.get("user") or user.pk,
+                delivery_address=item.get("delivery_address"),
+                promocode=item.get("promocode", ""),
+                batch=batch,
+                total=sum((prices[pk] for pk in product_ids), Decimal("0.00")),
+                item_count=len(product_ids),
+            ))
+        Order.objects.bulk_create(orders, batch_size=batch_size)
+
+        through = Order.products.through
+        through.objects.bulk_create(
+            (
+                through(order_id=order.pk, product_id=product_id)
+                for order, product_ids in zip(orders, order_products)
+                for product_id in product_ids
+            ),
+            batch_size=batch_size,
+        )
+    orders_changed.send(sender=Order)
+    return orders, True
@@ -0,0 +1,258 @@
+import json
+from hashlib import md5
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    BasePagination,
+    CursorPagination,
+    PageNumberPagination,
+)
+
+from mysite.caching import get_version
+
+from .signals import ORDERS_CACHE_NAMESPACE, PRODUCTS_CACHE_NAMESPACE
+
+
+class ProductCursorPagination(CursorPagination):
+    """
+    Keyset-пагинация товаров.
+
+    Вместо ``COUNT(*)`` и ``OFFSET`` страница выбирается условием по
+    последней увиденной паре (значение поля сортировки, ``pk``)::
+
+        price < 10 OR (price = 10 AND id < 42)
+
+    Пара уникальна, поэтому глубокие страницы стоят столько же, сколько
+    первая, и при повторяющихся значениях поля (цена): смещение внутри
+    группы одинаковых значений, как у ``CursorPagination``, не нужно.
+    Сортировка — первое поле из OrderingFilter, дополненное ``pk``
+    в том же направлении.
+    """
+
+    ordering = "pk"
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if ordering[0].lstrip("-") == "pk":
+            return ordering[:1]
+        tie_breaker = "-pk" if ordering[0].startswith("-") else "pk"
+        return (ordering[0], tie_breaker)
+
+    def _get_position_from_instance(self, instance, ordering):
+        position = super()._get_position_from_instance(instance, ordering)
+        if len(ordering) == 1:
+            return position
+        pk = instance["pk"] if isinstance(instance, dict) else instance.pk
+        return json.dumps([position, pk])
+
+    def seek(self, queryset, position: str, reverse: bool):
+        """Строки после ``position`` в порядке выдачи (до неё при ``reverse``)."""
+        order = self.ordering[0]
+        # (курсор назад) XOR (убывающая сортировка)
+        lookup = "lt" if reverse != order.startswith("-") else "gt"
+        field = order.lstrip("-")
+        try:
+            if len(self.ordering) == 1:
+                return queryset.filter(**{f"{field}__{lookup}": position})
+            value, pk = json.loads(position)
+            return queryset.filter(
+                Q(**{f"{field}__{lookup}": value}) | Q(**{field: value, f"pk__{lookup}": pk})
+            )
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message) from None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # CursorPagination.paginate_queryset, где фильтр по позиции
+        # заменён на seek() по паре (значение, pk).
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            offset, reverse, current_position = 0, False, None
+        else:
+            offset, reverse, current_position = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*(
+                order[1:] if order.startswith("-") else f"-{order}" for order in self.ordering
+            ))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if current_position is not None:
+            queryset = self.seek(queryset, current_position, reverse)
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = current_position is not None or offset > 0
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+
+class ProductPagination(BasePagination):
+    """
+    Пагинация товаров с выбором режима клиентом.
+
+    По умолчанию — постраничная (с общим количеством ``count``).
+    Keyset-режим включается параметром ``?pagination=cursor``;
+    ссылки next/previous в этом режиме уже содержат ``cursor``.
+    """
+
+    mode_query_param = "pagination"
+
+    def __init__(self):
+        self.paginator = PageNumberPagination()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (request.query_params.get(self.mode_query_param) == "cursor"
+                or ProductCursorPagination.cursor_query_param in request.query_params):
+            self.paginator = ProductCursorPagination()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.paginator.get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        parameters = [
+            *PageNumberPagination().get_schema_operation_parameters(view),
+            *ProductCursorPagination().get_schema_operation_parameters(view),
+        ]
+        parameters.append({
+            "name": self.mode_query_param,
+            "required": False,
+            "in": "query",
+            "description": "Set to 'cursor' for keyset pagination without total count.",
+            "schema": {"type": "string", "enum": ["page", "cursor"]},
+        })
+        return parameters
+
+    @property
+    def display_page_controls(self):
+        return self.paginator.display_page_controls
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator, кэширующий ``COUNT(*)`` выборки.
+
+    Ключ строится из SQL запроса и версии пространства кэша
+    ``cache_namespace``, поэтому количество пересчитывается только
+    после изменения данных.
+    """
+
+    cache_namespace = None
+    count_timeout = 600
+
+    @cached_property
+    def count(self):
+        query = str(self.object_list.query).encode()
+        key = "count:{namespace}:{version}:{digest}".format(
+            namespace=self.cache_namespace,
+            version=get_version(self.cache_namespace),
+            digest=md5(query).hexdigest(),
+        )
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, self.count_timeout)
+        return count
+
+
+class ProductsPaginator(CachedCountPaginator):
+    cache_namespace = PRODUCTS_CACHE_NAMESPACE
+
+
+def estimated_count(queryset) -> int | None:
+    """
+    Оценка числа строк таблицы без ``COUNT(*)``.
+
+    PostgreSQL — статистика планировщика (``pg_class.reltuples``),
+    SQLite — ``MAX(rowid)`` по первичному ключу (завышена на число
+    удалённых строк). Для других СУБД возвращает ``None``.
+    """
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [table],
+            )
+        elif connection.vendor == "sqlite":
+            cursor.execute(f"SELECT MAX(rowid) FROM {connection.ops.quote_name(table)}")
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+class EstimatedCountPaginator(CachedCountPaginator):
+    """
+    Paginator для больших таблиц (списки админки).
+
+    Без фильтров количество берётся из оценки СУБД, если таблица
+    больше ``estimate_threshold`` строк; иначе, а также для выборок
+    с фильтрами и поиском — точный ``COUNT(*)`` из кэша.
+    """
+
+    estimate_threshold = 100_000
+
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        if not query.where and not query.extra_tables:
+            estimate = estimated_count(self.object_list)
+            if estimate is not None and estimate >= self.estimate_threshold:
+                return estimate
+        return super().count
+
+
+class ProductsAdminPaginator(EstimatedCountPaginator):
+    cache_namespace = PRODUCTS_CACHE_NAMESPACE
+
+
+class OrdersAdminPaginator(EstimatedCountPaginator):
+    cache_namespace = ORDERS_CACHE_NAMESPACE
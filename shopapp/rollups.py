@@ -0,0 +1,193 @@
+"""
+Сводные таблицы продаж и цен каталога.
+
+Продажи по дням (:model:`shopapp.DailyProductSales`) строятся
+инкрементально: обрабатываются только строки таблицы связей
+заказ–товар с id больше сохранённого high-water mark, их вклад
+прибавляется к уже посчитанным дням. Удаление товаров из заказов
+и удаление заказов по high-water mark не видно, поэтому такие дни
+отмечаются «грязными» (:model:`shopapp.SalesDirtyDay`) и
+пересчитываются целиком.
+
+Сводка цен каталога пересчитывается, только если изменилась версия
+кэша товаров (её меняет любое изменение каталога).
+"""
+
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Avg, Count, Max, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from mysite.caching import get_version
+
+from .models import (
+    CatalogPriceStats,
+    DailyProductSales,
+    Order,
+    Product,
+    RollupState,
+    SalesDirtyDay,
+)
+
+SALES_ROLLUP = "daily_product_sales"
+CATALOG_ROLLUP = "catalog_price_stats"
+# Сколько строк таблицы связей обрабатывать в одной транзакции.
+ROLLUP_CHUNK_SIZE = 100_000
+
+
+def day_range(day) -> tuple[datetime, datetime]:
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def mark_days_dirty(days) -> None:
+    """Отмечает дни для полного пересчёта продаж."""
+    days = {day for day in days if day}
+    if days:
+        SalesDirtyDay.objects.bulk_create(
+            [SalesDirtyDay(day=day) for day in days],
+            ignore_conflicts=True,
+        )
+
+
+def order_days(order_ids) -> set:
+    """Дни создания заказов (в текущем часовом поясе)."""
+    return set(
+        Order.objects
+        .filter(pk__in=list(order_ids))
+        .annotate(day=TruncDate("created_at"))
+        .values_list("day", flat=True)
+    )
+
+
+def _sales_rows(links):
+    return (
+        links
+        .annotate(day=TruncDate("order__created_at"))
+        .values("day", "product_id")
+        .annotate(quantity=Count("pk"), revenue=Sum("product__price"))
+        .order_by()
+    )
+
+
+def _add_sales(rows) -> int:
+    """Прибавляет строки ``(day, product_id, quantity, revenue)`` к сводке."""
+    rows = list(rows)
+    if not rows:
+        return 0
+    existing = {
+        (sales.day, sales.product_id): sales
+        for sales in DailyProductSales.objects.filter(
+            day__in={row["day"] for row in rows},
+            product_id__in={row["product_id"] for row in rows},
+        )
+    }
+    changed, created = [], []
+    for row in rows:
+        sales = existing.get((row["day"], row["product_id"]))
+        if sales is None:
+            created.append(DailyProductSales(
+                day=row["day"],
+                product_id=row["product_id"],
+                quantity=row["quantity"],
+                revenue=row["revenue"] or Decimal("0"),
+            ))
+        else:
+            sales.quantity += row["quantity"]
+            sales.revenue += row["revenue"] or Decimal("0")
+            changed.append(sales)
+    DailyProductSales.objects.bulk_update(changed, ["quantity", "revenue"], batch_size=1000)
+    DailyProductSales.objects.bulk_create(created, batch_size=1000)
+    return len(rows)
+
+
+def build_sales_rollup(chunk_size: int = ROLLUP_CHUNK_SIZE) -> dict:
+    """
+    Доводит сводку продаж до текущего состояния.
+
+    Каждая пачка строк связей обрабатывается в своей транзакции вместе
+    со сдвигом high-water mark, поэтому прерванную сборку можно
+    продолжить с того же места.
+
+    :return: обработанные строки, пересчитанные дни и новый high-water mark
+    """
+    through = Order.products.through
+    state, _ = RollupState.objects.get_or_create(name=SALES_ROLLUP)
+    last_id = through.objects.aggregate(last=Max("pk"))["last"] or 0
+    processed = 0
+
+    with transaction.atomic():
+        state = RollupState.objects.select_for_update().get(pk=state.pk)
+        dirty = list(SalesDirtyDay.objects.values_list("day", flat=True))
+        if dirty:
+            # Грязные дни пересчитываются целиком по уже обработанным строкам.
+            DailyProductSales.objects.filter(day__in=dirty).delete()
+            in_dirty_days = reduce(or_, (
+                Q(order__created_at__gte=start, order__created_at__lt=stop)
+                for start, stop in map(day_range, dirty)
+            ))
+            _add_sales(_sales_rows(
+                through.objects.filter(in_dirty_days, pk__lte=state.high_water)
+            ))
+            SalesDirtyDay.objects.filter(day__in=dirty).delete()
+
+    high_water = state.high_water
+    while high_water < last_id:
+        stop = min(high_water + chunk_size, last_id)
+        with transaction.atomic():
+            processed += _add_sales(_sales_rows(
+                through.objects.filter(pk__gt=high_water, pk__lte=stop)
+            ))
+            RollupState.objects.filter(pk=state.pk).update(
+                high_water=stop,
+                updated_at=timezone.now(),
+            )
+        high_water = stop
+
+    return {"rows": processed, "dirty_days": len(dirty), "high_water": high_water}
+
+
+def build_catalog_stats() -> dict:
+    """
+    Пересчитывает сводку цен каталога, если каталог менялся.
+
+    :return: пересчитана ли сводка
+    """
+    from .signals import PRODUCTS_CACHE_NAMESPACE
+
+    version = get_version(PRODUCTS_CACHE_NAMESPACE)
+    state, _ = RollupState.objects.get_or_create(name=CATALOG_ROLLUP)
+    if state.token == version and CatalogPriceStats.objects.exists():
+        return {"rebuilt": False}
+
+    stats = Product.objects.aggregate(
+        products=Count("pk"),
+        archived=Count("pk", filter=Q(archived=True)),
+        min_price=Min("price"),
+        max_price=Max("price"),
+        avg_price=Avg("price"),
+    )
+    with transaction.atomic():
+        CatalogPriceStats.objects.update_or_create(
+            pk=1,
+            defaults={
+                **stats,
+                "active": stats["products"] - stats["archived"],
+                "avg_price": (
+                    round(Decimal(stats["avg_price"]), 2)
+                    if stats["avg_price"] is not None else None
+                ),
+            },
+        )
+        state.token = version
+        state.save(update_fields=["token", "updated_at"])
+    return {"rebuilt": True}
+
+
+def build_rollups() -> dict:
+    return {"sales": build_sales_rollup(), "catalog": build_catalog_stats()}
@@ -0,0 +1,166 @@
+"""
+Полнотекстовый поиск товаров на SQLite FTS5.
+
+Индекс — внешняя (external content) таблица FTS5 поверх ``shopapp_product``,
+которую синхронизируют триггеры, поэтому в актуальном состоянии её держат
+любые записи: ``save``, ``bulk_create``, ``QuerySet.update`` и SQL.
+
+На других СУБД (или без FTS5) поиск откатывается на обычный ``icontains``.
+"""
+
+import re
+
+from django.db import connection as default_connection
+from django.db.models import QuerySet
+from rest_framework.filters import SearchFilter, OrderingFilter
+
+from .models import Product
+
+FTS_TABLE = "shopapp_product_fts"
+PRODUCT_TABLE = Product._meta.db_table
+# Вес совпадения в названии относительно описания для bm25().
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+CREATE_FTS_TABLE = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+    name,
+    description,
+    content='{PRODUCT_TABLE}',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+)
+"""
+
+FTS_TRIGGERS = {
+    f"{FTS_TABLE}_ai": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {PRODUCT_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, name, description)
+            VALUES (new.id, new.name, new.description);
+        END
+    """,
+    f"{FTS_TABLE}_ad": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {PRODUCT_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+        END
+    """,
+    f"{FTS_TABLE}_au": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+        AFTER UPDATE OF name, description ON {PRODUCT_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+            INSERT INTO {FTS_TABLE}(rowid, name, description)
+            VALUES (new.id, new.name, new.description);
+        END
+    """,
+}
+
+
+def fts_available(connection=default_connection) -> bool:
+    return connection.vendor == "sqlite"
+
+
+def ensure_product_fts(connection=default_connection) -> None:
+    """
+    Создаёт FTS-таблицу и триггеры, если их нет.
+
+    SQLite-миграции, меняющие ``shopapp_product``, пересоздают таблицу
+    и теряют её триггеры, поэтому функция вызывается и после каждого
+    ``migrate``; если триггеры пришлось восстановить, индекс перестраивается.
+    """
+    if not fts_available(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(CREATE_FTS_TABLE)
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s",
+            [PRODUCT_TABLE],
+        )
+        existing = {name for name, in cursor.fetchall()}
+        missing = [name for name in FTS_TRIGGERS if name not in existing]
+        for name in missing:
+            cursor.execute(FTS_TRIGGERS[name])
+        if missing:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def drop_product_fts(connection=default_connection) -> None:
+    if not fts_available(connection):
+        return
+    with connection.cursor() as cursor:
+        for name in FTS_TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def build_match_query(text: str) -> str:
+    """
+    Превращает пользовательский ввод в безопасный запрос FTS5.
+
+    Каждое слово ищется по префиксу, все слова должны найтись:
+    ``"lapt del"`` -> ``"lapt"* "del"*``.
+    """
+    terms = re.findall(r"\w+", text)
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def search_products(queryset: QuerySet, text: str) -> QuerySet:
+    """
+    Фильтрует товары по полнотекстовому индексу.
+
+    Выборка ведётся от FTS-таблицы (join по rowid), к товарам
+    добавляется ``search_rank`` — bm25, где меньше значит релевантнее.
+    """
+    match = build_match_query(text)
+    if not match:
+        return queryset
+    return queryset.extra(
+        select={
+            "search_rank": f"bm25({FTS_TABLE}, %s, %s)",
+        },
+        select_params=(NAME_WEIGHT, DESCRIPTION_WEIGHT),
+        tables=[FTS_TABLE],
+        where=[
+            f"{FTS_TABLE}.rowid = {PRODUCT_TABLE}.id",
+            f"{FTS_TABLE} MATCH %s",
+        ],
+        params=[match],
+    )
+
+
+class ProductFullTextSearchFilter(SearchFilter):
+    """
+    Замена SearchFilter для товаров: поиск по FTS5 с префиксами.
+
+    Параметр запроса тот же (``?search=``). Без FTS5 работает как обычный
+    SearchFilter по ``search_fields`` представления.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        if not fts_available():
+            return super().filter_queryset(request, queryset, view)
+        text = request.query_params.get(self.search_param, "")
+        return search_products(queryset, text)
+
+
+class RankedOrderingFilter(OrderingFilter):
+    """
+    OrderingFilter, который при поиске без явного ``?ordering=``
+    сортирует по релевантности.
+
+    Keyset-пагинация по вычисляемому рангу невозможна, поэтому в режиме
+    ``cursor`` остаётся сортировка по умолчанию.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        params = request.query_params
+        if (
+            "search_rank" in queryset.query.extra_select
+            and self.ordering_param not in params
+            and params.get("pagination") != "cursor"
+            and "cursor" not in params
+        ):
+            return ["search_rank", "pk"]
+        return super().get_ordering(request, queryset, view)
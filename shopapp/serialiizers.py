@@ -1,8 +1,103 @@
+from django.contrib.auth.models import User
 from rest_framework import serializers
 
-from shopapp.models import Product
+from shopapp.models import CatalogPriceStats, Order, Product
+
+# Сколько заказов принимает один запрос массового создания.
+BULK_ORDERS_MAX = 5000
+
 
 class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+
+class OrderSerializer(serializers.ModelSerializer):
+    user = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), required=False)
+
+    class Meta:
+        model = Order
+        fields = (
+            "id",
+            "user",
+            "delivery_address",
+            "promocode",
+            "products",
+            "total",
+            "item_count",
+            "created_at",
+        )
+        read_only_fields = ("total", "item_count", "created_at")
+
+
+class BulkOrderItemSerializer(serializers.Serializer):
+    """
+    Заказ в массовом запросе.
+
+    Товары и пользователь — просто id: их существование проверяет
+    ``BulkOrderSerializer`` одним запросом на весь пакет.
+    """
+
+    user = serializers.IntegerField(required=False, min_value=1)
+    delivery_address = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    promocode = serializers.CharField(required=False, allow_blank=True, max_length=20, default="")
+    products = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+
+
+class BulkOrderSerializer(serializers.Serializer):
+    orders = BulkOrderItemSerializer(many=True, allow_empty=False, max_length=BULK_ORDERS_MAX)
+
+    def validate_orders(self, orders):
+        product_ids = {pk for order in orders for pk in order["products"]}
+        self.prices = dict(
+            Product.objects
+            .filter(pk__in=product_ids)
+            .values_list("pk", "price")
+        )
+        missing = product_ids - self.prices.keys()
+        if missing:
+            raise serializers.ValidationError(f"Unknown products: {sorted(missing)[:20]}")
+
+        user_ids = {order["user"] for order in orders if order.get("user")}
+        found = set(User.objects.filter(pk__in=user_ids).values_list("pk", flat=True))
+        if user_ids - found:
+            raise serializers.ValidationError(f"Unknown users: {sorted(user_ids - found)[:20]}")
+        return orders
+
+    def validate(self, attrs):
+        attrs["prices"] = self.prices
+        return attrs
+
+
+class SalesReportQuerySerializer(serializers.Serializer):
+    """Параметры отчёта по продажам (все необязательные)."""
+
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    product = serializers.IntegerField(required=False, min_value=1)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=100, default=10)
+
+    def validate(self, attrs):
+        if attrs.get("date_from") and attrs.get("date_to") and attrs["date_from"] > attrs["date_to"]:
+            raise serializers.ValidationError("date_from is after date_to")
+        return attrs
+
+
+class SalesDaySerializer(serializers.Serializer):
+    day = serializers.DateField()
+    quantity = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=16, decimal_places=2)
+
+
+class TopProductSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    product__name = serializers.CharField()
+    quantity = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=16, decimal_places=2)
+
+
+class CatalogPriceStatsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CatalogPriceStats
+        exclude = ("id",)
@@ -0,0 +1,214 @@
+"""
+Сигналы ShopApp и их обработчики.
+
+``products_changed`` и ``orders_changed`` отправляются после массовых
+операций над товарами и заказами (``QuerySet.update``, ``bulk_create``),
+для которых Django не шлёт ``post_save``/``post_delete``.
+"""
+
+from django.db import connections
+from django.db.models import F, Sum
+from django.db.models.signals import (
+    pre_save, post_save, pre_delete, post_delete, post_migrate, m2m_changed,
+)
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from mysite.caching import bump_version_on_commit
+
+from .models import Order, Product, ProductImage
+from .images import image_dimensions, schedule_derivatives
+from .orders import add_to_order_totals, recompute_order_totals
+from .rollups import mark_days_dirty, order_days
+from .search import ensure_product_fts
+
+# Пространство версий кэша для всего, что строится из товаров.
+PRODUCTS_CACHE_NAMESPACE = "products"
+
+# Версия кэша заказов (количество строк в списках, в том числе отфильтрованных).
+ORDERS_CACHE_NAMESPACE = "orders"
+
+products_changed = Signal()
+orders_changed = Signal()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(products_changed)
+def invalidate_products_cache(sender, **kwargs):
+    """Сбрасывает кэш товаров при любом изменении каталога (после коммита)."""
+    bump_version_on_commit(PRODUCTS_CACHE_NAMESPACE)
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+@receiver(orders_changed)
+def invalidate_orders_cache(sender, **kwargs):
+    """
+    Любое изменение заказа: кэшируются и количества отфильтрованных
+    выборок (по пользователю, адресу, ...), их меняет и правка.
+    """
+    bump_version_on_commit(ORDERS_CACHE_NAMESPACE)
+
+
+@receiver(m2m_changed, sender=Order.products.through)
+def invalidate_orders_cache_on_products(sender, action, **kwargs):
+    """Фильтры по товарам заказа зависят и от состава заказов."""
+    if action.startswith("post_"):
+        bump_version_on_commit(ORDERS_CACHE_NAMESPACE)
+
+
+@receiver(post_save, sender=ProductImage)
+def touch_product(sender, instance: ProductImage, **kwargs):
+    """
+    Новая картинка меняет и updated_at товара (для ETag).
+
+    На post_delete обработчика нет намеренно: без него удаление
+    картинок через QuerySet идёт одним DELETE, а товар обновляют
+    те, кто удаляет (форма товара, replace_product_images).
+    """
+    Product.objects.filter(pk=instance.product_id).update(updated_at=timezone.now())
+
+
+@receiver(pre_save, sender=Product)
+def store_preview_dimensions(sender, instance: Product, raw=False, **kwargs):
+    """Запоминает размеры нового превью (для width/height и srcset)."""
+    if raw:
+        return
+    if not instance.preview:
+        instance.preview_width = instance.preview_height = None
+        return
+    width, height = image_dimensions(instance.preview)
+    if width:
+        instance.preview_width, instance.preview_height = width, height
+
+
+@receiver(pre_save, sender=ProductImage)
+def store_image_dimensions(sender, instance: ProductImage, raw=False, **kwargs):
+    width, height = image_dimensions(instance.image)
+    if width and not raw:
+        instance.width, instance.height = width, height
+
+
+def image_field_name(sender) -> str:
+    return "preview" if sender is Product else "image"
+
+
+@receiver(pre_save, sender=Product)
+@receiver(pre_save, sender=ProductImage)
+def mark_new_image_file(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Запоминает, загружается ли с этим save() новый файл.
+
+    После сохранения файл уже записан в хранилище (``_committed``),
+    поэтому проверять приходится до него.
+    """
+    name = image_field_name(sender)
+    field_file = getattr(instance, name)
+    instance._new_image_file = bool(
+        field_file
+        and not field_file._committed
+        and not raw
+        and (update_fields is None or name in update_fields)
+    )
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductImage)
+def build_image_derivatives(sender, instance, **kwargs):
+    """Миниатюры строятся в фоне после коммита, только для нового файла."""
+    if getattr(instance, "_new_image_file", False):
+        instance._new_image_file = False
+        schedule_derivatives(getattr(instance, image_field_name(sender)).name)
+
+
+@receiver(m2m_changed, sender=Order.products.through)
+def update_order_totals(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Поддерживает Order.total и Order.item_count при изменении состава заказа.
+
+    Добавление сдвигает итоги на сумму добавленного (в ``post_add``
+    ``pk_set`` содержит только действительно новые связи), удаление
+    и очистка пересчитывают затронутые заказы.
+    """
+    if action == "pre_clear" and reverse:
+        instance._cleared_order_ids = list(instance.orders.values_list("pk", flat=True))
+        return
+    if not action.startswith("post_"):
+        return
+
+    if not reverse:
+        orders = Order.objects.filter(pk=instance.pk)
+        if action == "post_add" and pk_set:
+            total = Product.objects.filter(pk__in=pk_set).aggregate(total=Sum("price"))["total"]
+            add_to_order_totals([instance.pk], total, len(pk_set))
+        elif action == "post_clear":
+            orders.update(total=0, item_count=0)
+        elif action == "post_remove" and pk_set:
+            recompute_order_totals(orders)
+        return
+
+    if action == "post_add" and pk_set:
+        add_to_order_totals(pk_set, instance.price, 1)
+    elif action == "post_remove" and pk_set:
+        recompute_order_totals(Order.objects.filter(pk__in=pk_set))
+    elif action == "post_clear":
+        order_ids = getattr(instance, "_cleared_order_ids", [])
+        recompute_order_totals(Order.objects.filter(pk__in=order_ids))
+
+
+@receiver(m2m_changed, sender=Order.products.through)
+def mark_sales_dirty(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Удаление товаров из заказов не видно по high-water mark сводки
+    продаж — отмечаем дни этих заказов для полного пересчёта.
+    """
+    if action not in ("post_remove", "post_clear"):
+        return
+    if not reverse:
+        mark_days_dirty(order_days([instance.pk]))
+    elif action == "post_remove" and pk_set:
+        mark_days_dirty(order_days(pk_set))
+    elif action == "post_clear":
+        mark_days_dirty(order_days(getattr(instance, "_cleared_order_ids", [])))
+
+
+@receiver(post_delete, sender=Order)
+def mark_deleted_order_sales_dirty(sender, instance: Order, **kwargs):
+    if instance.created_at:
+        mark_days_dirty([timezone.localdate(instance.created_at)])
+
+
+@receiver(post_save, sender=Product)
+def apply_price_change(sender, instance: Product, created=False, raw=False, **kwargs):
+    """Переносит изменение цены товара в итоги заказов с этим товаром."""
+    price = Product._meta.get_field("price").to_python(instance.price)
+    loaded = getattr(instance, "_loaded_price", None)
+    instance._loaded_price = price
+    if created or raw:
+        return
+    if loaded is None:
+        # Цена не загружалась (например, .only()) — разницу не знаем.
+        recompute_order_totals(Order.objects.filter(products=instance))
+    elif loaded != price:
+        Order.objects.filter(products=instance).update(total=F("total") + (price - loaded))
+
+
+@receiver(pre_delete, sender=Product)
+def remember_product_orders(sender, instance: Product, **kwargs):
+    instance._order_ids = list(instance.orders.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_from_totals(sender, instance: Product, **kwargs):
+    """Связи удаляются каскадом без m2m_changed — пересчитываем заказы."""
+    order_ids = getattr(instance, "_order_ids", None)
+    if order_ids:
+        recompute_order_totals(Order.objects.filter(pk__in=order_ids))
+
+
+@receiver(post_migrate)
+def restore_product_fts(sender, app_config, using, **kwargs):
+    """Восстанавливает триггеры FTS, потерянные при пересоздании таблицы."""
+    if app_config.name == "shopapp":
+        ensure_product_fts(connections[using])
@@ -0,0 +1,61 @@
+"""
+Фоновые задачи ShopApp (выполняет ``manage.py runworker``, см. jobsapp).
+"""
+
+from dataclasses import asdict
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from jobsapp.registry import task
+
+from .common import save_csv_products
+from .exports import run_export_job
+from .images import build_derivatives, delete_files
+from .orders import reconcile_order_totals
+from .rollups import build_rollups
+
+# Куда складываются загруженные CSV до обработки задачей.
+IMPORT_UPLOADS_DIR = "jobs/imports"
+
+
+def store_import_file(file) -> str:
+    """Сохраняет загруженный CSV в хранилище; возвращает его имя."""
+    return default_storage.save(f"{IMPORT_UPLOADS_DIR}/products.csv", file)
+
+
+# Параллельные upsert'ы по sku мешали бы друг другу; повтор после частичного
+# импорта задублировал бы строки без sku, поэтому одна попытка.
+@task("shopapp.import_products_csv", concurrency=1, max_attempts=1)
+def import_products_csv(payload: dict) -> dict:
+    """Импорт товаров из CSV; файл удаляется после успешного импорта."""
+    with default_storage.open(payload["name"], "rb") as file:
+        summary = save_csv_products(file, payload.get("encoding") or "utf-8")
+    default_storage.delete(payload["name"])
+    return asdict(summary)
+
+
+@task("shopapp.export_csv", concurrency=1, max_attempts=1)
+def export_csv(payload: dict) -> dict:
+    """Выгрузка сама распределяет диапазоны по SHOPAPP_EXPORT_WORKERS процессам."""
+    return {"status": run_export_job(payload["export_job"])}
+
+
+@task("shopapp.build_derivatives", concurrency=settings.SHOPAPP_IMAGE_WORKERS or None)
+def build_image_derivatives(payload: dict) -> dict:
+    return {"created": build_derivatives(str(settings.MEDIA_ROOT), payload["names"])}
+
+
+@task("shopapp.delete_files", concurrency=settings.SHOPAPP_IMAGE_WORKERS or None)
+def delete_image_files(payload: dict) -> dict:
+    return {"deleted": delete_files(str(settings.MEDIA_ROOT), payload["names"])}
+
+
+@task("shopapp.reconcile_order_totals", concurrency=1)
+def reconcile_orders(payload: dict) -> dict:
+    return {"updated": reconcile_order_totals(payload.get("batch_size", 5000))}
+
+
+@task("shopapp.build_rollups", concurrency=1)
+def build_sales_rollups(payload: dict) -> dict:
+    return build_rollups()
@@ -0,0 +1,41 @@
+from django import template
+from django.utils.html import format_html
+
+from shopapp.images import srcset
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(image, width=None, height=None, sizes="100vw", alt=""):
+    """
+    Разметка ``<picture>`` с WebP-вариантами и миниатюрами в srcset.
+
+    Пример::
+
+        {% responsive_image product.preview product.preview_width product.preview_height %}
+
+    :param image: значение ImageField
+    :param width: ширина оригинала (width_field)
+    :param height: высота оригинала (height_field)
+    :param sizes: значение атрибута sizes
+    :param alt: альтернативный текст (по умолчанию имя файла)
+    """
+    if not image:
+        return ""
+    webp = srcset(image.name, width, "webp")
+    source = format_html(
+        '<source type="image/webp" srcset="{}" sizes="{}">', webp, sizes,
+    ) if webp else ""
+    dimensions = format_html(
+        ' width="{}" height="{}"', width, height,
+    ) if width and height else ""
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" alt="{}"{} loading="lazy"></picture>',
+        source,
+        image.url,
+        srcset(image.name, width),
+        sizes,
+        alt or image.name,
+        dimensions,
+    )
@@ -1,13 +1,38 @@
-from itertools import product
+import csv
+import gzip
+import multiprocessing
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
 from random import choices
 from string import ascii_letters
+from unittest.mock import patch
 
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone, translation
 from django.conf import settings
+from PIL import Image
 
-from .models import Product
+from mysite.cache_backends import TieredCache
+from mysite.caching import bump_version, get_version
+
+from .images import (
+    THUMBNAIL_WIDTHS, build_derivatives, derivative_name, generate_derivatives, srcset,
+)
+from .models import DailyProductSales, ExportJob, Order, Product, ProductImage
+from .pagination import ProductsAdminPaginator
+from .rollups import build_catalog_stats, build_sales_rollup
+from .signals import PRODUCTS_CACHE_NAMESPACE, products_changed
+from .views import products_export_dataset
 from .utils import add_two_numbers
 
 class AddTwoNumbersTestCase(TestCase):
@@ -97,6 +122,268 @@ class OrdersListViewTestCase(TestCase):
         self.assertEqual(response.status_code, 302)
         self.assertIn(str(settings.LOGIN_URL),response.url)
 
+
+class OrdersListPaginationTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="buyer", password="qwerty")
+        self.other = User.objects.create_user(username="other", password="qwerty")
+        products = [Product.objects.create(name=f"Item {i}", price=i) for i in range(3)]
+        for i in range(45):
+            order = Order.objects.create(user=self.user, delivery_address=f"Street {i}")
+            order.products.set(products)
+        Order.objects.create(user=self.other, delivery_address="Other street")
+        self.client.force_login(self.user)
+        with translation.override("en"):
+            self.url = reverse("shopapp:orders_list")
+
+    def test_page_within_query_budget(self):
+        # пользователь, count, заказы с user, товары страницы (сессия — из кэша)
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url, {"user": self.user.pk, "page": 2})
+        self.assertEqual(response.status_code, 200)
+        page = response.context["page_obj"]
+        self.assertEqual((page.paginator.count, len(page.object_list)), (45, 20))
+        self.assertContains(response, f"user={self.user.pk}&amp;page=3")
+
+    def test_date_filter(self):
+        today = timezone.localdate()
+        response = self.client.get(self.url, {"created_before": today - timedelta(days=1)})
+        self.assertEqual(response.context["paginator"].count, 0)
+        response = self.client.get(self.url, {"created_after": today})
+        self.assertEqual(response.context["paginator"].count, 46)
+
+
+class AdminChangeListTestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="admin", password="qwerty")
+        product = Product.objects.create(name="Phone", price="10.00", description="x" * 100)
+        for i in range(5):
+            Order.objects.create(user=self.admin, delivery_address=f"Street {i}").products.add(product)
+        self.client.force_login(self.admin)
+        translation.activate("en")
+        self.addCleanup(translation.deactivate)
+
+    def test_order_changelist_is_lean(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("admin:shopapp_order_changelist"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["cl"].result_count, 5)
+        sql = [query["sql"] for query in queries]
+        self.assertEqual(sum("COUNT(" in query for query in sql), 1)
+        self.assertFalse(any("shopapp_order_products" in query for query in sql))
+        self.assertFalse(any('"shopapp_order"."receipt"' in query for query in sql))
+
+    def test_unfiltered_count_is_estimated(self):
+        Product.objects.create(name="Deleted").delete()
+        Product.objects.create(name="Kept")
+        with patch.object(ProductsAdminPaginator, "estimate_threshold", 1):
+            response = self.client.get(reverse("admin:shopapp_product_changelist"))
+            # MAX(rowid) учитывает и удалённую строку
+            self.assertEqual(response.context["cl"].result_count, 3)
+            self.assertContains(response, "x" * 40 + "...")
+            response = self.client.get(reverse("admin:shopapp_product_changelist"), {"q": "phone"})
+            self.assertEqual(response.context["cl"].result_count, 1)
+
+    def test_filtered_order_count_follows_updates(self):
+        url = reverse("admin:shopapp_order_changelist")
+        response = self.client.get(url, {"delivery_address__contains": "Street 1"})
+        self.assertEqual(response.context["cl"].result_count, 1)
+        order = Order.objects.get(delivery_address="Street 1")
+        order.delivery_address = "Avenue 1"
+        order.save()
+        response = self.client.get(url, {"delivery_address__contains": "Street 1"})
+        self.assertEqual(response.context["cl"].result_count, 0)
+
+
+class AdminExportJobTestCase(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = self.settings(MEDIA_ROOT=self.media_root, SHOPAPP_EXPORT_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.admin = User.objects.create_superuser(username="admin", password="qwerty")
+        self.client.force_login(self.admin)
+        translation.activate("en")
+        self.addCleanup(translation.deactivate)
+        for i in range(7):
+            Product.objects.create(name=f"Product {i}", price=i, archived=i == 3)
+
+    def test_export_action_writes_gzip_in_pk_ranges(self):
+        selected = Product.objects.filter(archived=False)
+        with patch("shopapp.exports.EXPORT_RANGE_SIZE", 2):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    reverse("admin:shopapp_product_changelist"),
+                    {
+                        "action": "export_as_csv",
+                        "_selected_action": [product.pk for product in selected],
+                    },
+                )
+        self.assertEqual(response.status_code, 302)
+        job = ExportJob.objects.get()
+        self.assertEqual(
+            (job.status, job.total, job.processed, job.progress),
+            (ExportJob.STATUS_DONE, 6, 6, 100),
+        )
+        with gzip.open(os.path.join(self.media_root, job.file.name), "rt") as file:
+            rows = list(csv.reader(file))
+        self.assertEqual(rows[0][:3], ["id", "sku", "name"])
+        self.assertEqual([row[2] for row in rows[1:]], [p.name for p in selected.order_by("pk")])
+        self.assertEqual(os.listdir(os.path.join(self.media_root, "exports")), [os.path.basename(job.file.name)])
+
+        response = self.client.get(reverse("admin:shopapp_exportjob_changelist"))
+        self.assertContains(response, "6 / 6 (100%)")
+        self.assertContains(response, job.file.url)
+
+    def test_select_across_stores_changelist_filters(self):
+        Product.objects.create(name="Phone", price=1, archived=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("admin:shopapp_product_changelist") + "?archived__exact=0&q=product&o=2",
+                {
+                    "action": "export_as_csv",
+                    "select_across": "1",
+                    "_selected_action": [Product.objects.first().pk],
+                },
+            )
+        job = ExportJob.objects.get()
+        self.assertEqual(job.selection, {"lookups": {"archived__exact": ["0"]}, "search": "product"})
+        self.assertEqual(job.total, 6)
+
+
+class OrderBulkApiTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="seller", password="qwerty")
+        self.products = [Product.objects.create(name=f"Item {i}", price=10 + i) for i in range(4)]
+        self.client.force_login(self.user)
+        with translation.override("en"):
+            self.url = reverse("shopapp:order-bulk")
+
+    def payload(self, count=30):
+        ids = [product.pk for product in self.products]
+        return {
+            "orders": [
+                {"delivery_address": f"Street {i}", "products": ids[: i % 4 + 1] + ids[:1]}
+                for i in range(count)
+            ],
+        }
+
+    def test_bulk_create_is_batched_and_idempotent(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                self.url, self.payload(), content_type="application/json",
+                headers={"Idempotency-Key": "sync-1"},
+            )
+        self.assertEqual(response.status_code, 201, response.content)
+        inserts = [q["sql"] for q in queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 3)  # пакет, заказы, связи
+        ids = response.json()["ids"]
+        self.assertEqual(len(ids), 30)
+        order = Order.objects.get(pk=ids[2])
+        self.assertEqual((str(order.total), order.item_count), ("33.00", 3))
+        self.assertEqual(order.products.count(), 3)
+        self.assertEqual(order.user, self.user)
+
+        response = self.client.post(
+            self.url, self.payload(), content_type="application/json",
+            headers={"Idempotency-Key": "sync-1"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["ids"], ids)
+        self.assertEqual(Order.objects.count(), 30)
+
+    def test_unknown_products_rejected(self):
+        payload = {"orders": [{"delivery_address": "x", "products": [999]}]}
+        response = self.client.post(self.url, payload, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+
+class SalesRollupTestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="boss", password="qwerty")
+        self.phone = Product.objects.create(name="Phone", price=100)
+        self.case = Product.objects.create(name="Case", price=5)
+        self.yesterday = Order.objects.create(user=self.admin, delivery_address="a")
+        self.yesterday.products.add(self.phone, self.case)
+        Order.objects.filter(pk=self.yesterday.pk).update(
+            created_at=timezone.now() - timedelta(days=1),
+        )
+        self.today = Order.objects.create(user=self.admin, delivery_address="b")
+        self.today.products.add(self.phone)
+        self.client.force_login(self.admin)
+        translation.activate("en")
+        self.addCleanup(translation.deactivate)
+
+    def sales(self):
+        return {
+            (row.day, row.product_id): (row.quantity, str(row.revenue))
+            for row in DailyProductSales.objects.all()
+        }
+
+    def test_incremental_build_and_dirty_days(self):
+        result = build_sales_rollup(chunk_size=2)
+        self.assertEqual(result["rows"], 3)
+        today, yesterday = timezone.localdate(), timezone.localdate() - timedelta(days=1)
+        self.assertEqual(self.sales(), {
+            (yesterday, self.phone.pk): (1, "100.00"),
+            (yesterday, self.case.pk): (1, "5.00"),
+            (today, self.phone.pk): (1, "100.00"),
+        })
+
+        # Новые строки только прибавляются, старые не перечитываются.
+        order = Order.objects.create(user=self.admin, delivery_address="c")
+        order.products.add(self.phone)
+        self.assertEqual(build_sales_rollup()["rows"], 1)
+        self.assertEqual(self.sales()[today, self.phone.pk], (2, "200.00"))
+
+        # Удаления по high-water mark не видны: день пересчитывается целиком.
+        self.yesterday.products.remove(self.case)
+        order.delete()
+        result = build_sales_rollup()
+        self.assertEqual((result["rows"], result["dirty_days"]), (0, 2))
+        self.assertEqual(self.sales(), {
+            (yesterday, self.phone.pk): (1, "100.00"),
+            (today, self.phone.pk): (1, "100.00"),
+        })
+
+    def test_catalog_stats_rebuilt_only_on_change(self):
+        self.assertTrue(build_catalog_stats()["rebuilt"])
+        self.assertFalse(build_catalog_stats()["rebuilt"])
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name="Charger", price=20, archived=True)
+        self.assertTrue(build_catalog_stats()["rebuilt"])
+        response = self.client.get(reverse("shopapp:report-catalog"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["products"], 3)
+        self.assertEqual(response.json()["archived"], 1)
+        self.assertEqual(response.json()["max_price"], "100.00")
+
+    def test_reports_api(self):
+        call_command("build_rollups", stdout=StringIO())
+        with self.assertNumQueries(3):  # пользователь, состояние, отчёт
+            response = self.client.get(reverse("shopapp:report-sales"))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["high_water"], 3)
+        self.assertEqual(
+            [(row["quantity"], row["revenue"]) for row in data["results"]],
+            [(2, "105.00"), (1, "100.00")],
+        )
+        response = self.client.get(reverse("shopapp:report-top-products"), {"limit": 1})
+        self.assertEqual(response.json()["results"][0]["product__name"], "Phone")
+        response = self.client.get(
+            reverse("shopapp:report-sales"),
+            {"date_from": "2030-01-02", "date_to": "2030-01-01"},
+        )
+        self.assertEqual(response.status_code, 400)
+
+        self.client.force_login(User.objects.create_user(username="clerk", password="qwerty"))
+        response = self.client.get(reverse("shopapp:report-sales"))
+        self.assertEqual(response.status_code, 403)
+
+
 class ProductsExportViewTestCase(TestCase):
     fixtures = [
         "products-fixture.json",
@@ -120,3 +407,477 @@ class ProductsExportViewTestCase(TestCase):
         self.assertEqual(products_data['products'],
                              expected_data
                              )
+
+
+class ProductsDownloadCSVTestCase(TestCase):
+    fixtures = [
+        "products-fixture.json",
+    ]
+
+    def test_download_csv_streams_filtered_rows(self):
+        response = self.client.get(
+            reverse("shopapp:product-download-csv"),
+            {"archived": "false"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(
+            b"".join(response.streaming_content).decode().splitlines()
+        ))
+        self.assertEqual(rows[0], ["name", "description", "price", "discount"])
+        expected = Product.objects.filter(archived=False).order_by("pk")
+        self.assertEqual([row[0] for row in rows[1:]],
+                         [product.name for product in expected])
+
+    def test_download_csv_gzip(self):
+        response = self.client.get(
+            reverse("shopapp:product-download-csv"),
+            {"compress": "gzip"},
+        )
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        content = gzip.decompress(b"".join(response.streaming_content))
+        self.assertEqual(len(content.decode().splitlines()),
+                         Product.objects.count() + 1)
+
+
+class ProductsUploadCSVTestCase(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = self.settings(MEDIA_ROOT=self.media_root, JOBS_RUN_INLINE=True)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def upload(self, content: str):
+        file = SimpleUploadedFile("products.csv", content.encode(), "text/csv")
+        return self.client.post(
+            reverse("shopapp:product-upload-csv"),
+            {"file": file},
+        )
+
+    def test_upload_csv_inserts_updates_and_rejects(self):
+        Product.objects.create(sku="LAP-1", name="Old laptop", price="10.00")
+        response = self.upload(
+            "sku,name,description,price,discount\n"
+            "LAP-1,Laptop,Updated,1599.00,15\n"
+            "DESK-1,Desktop,,2999.99,\n"
+            ",Tablet,No sku,499,5\n"
+            "BAD-1,Broken,,not-a-price,1\n"
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["status"], "done")
+        summary = response.json()["result"]
+        self.assertEqual(summary["inserted"], 2)
+        self.assertEqual(summary["updated"], 1)
+        self.assertEqual(summary["rejected"], 1)
+        self.assertEqual(summary["errors"][0]["line"], 5)
+        self.assertIn("price", summary["errors"][0]["errors"])
+
+        laptop = Product.objects.get(sku="LAP-1")
+        self.assertEqual(laptop.name, "Laptop")
+        self.assertEqual(str(laptop.price), "1599.00")
+        self.assertEqual(Product.objects.get(sku="DESK-1").discount, 0)
+        self.assertFalse(Product.objects.filter(sku="BAD-1").exists())
+
+
+class ProductsExportCacheTestCase(TestCase):
+    fixtures = [
+        "products-fixture.json",
+    ]
+
+    def test_export_served_from_cache_until_products_change(self):
+        url = reverse("shopapp:products-export")
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(len(response.json()["products"]), Product.objects.count())
+
+        product = Product.objects.order_by("pk").first()
+        product.name = "Renamed product"
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        response = self.client.get(url)
+        self.assertEqual(response.json()["products"][0]["name"], "Renamed product")
+
+    def test_bulk_update_signal_invalidates_export(self):
+        url = reverse("shopapp:products-export")
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.update(archived=True)
+            products_changed.send(sender=Product)
+        response = self.client.get(url)
+        self.assertTrue(all(p["archived"] for p in response.json()["products"]))
+
+    def test_version_bumped_again_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            Product.objects.create(name="Cable", price=5)
+            # Может быть закэширована пересборкой, прочитавшей строки до коммита.
+            version = get_version(PRODUCTS_CACHE_NAMESPACE)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_version(PRODUCTS_CACHE_NAMESPACE), version)
+
+
+class ProductKeysetPaginationTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Product.objects.bulk_create(
+            Product(name=f"Product {i:02}", price=i % 5)
+            for i in range(25)
+        )
+
+    def collect(self, params: dict) -> list:
+        url = reverse("shopapp:product-list")
+        response = self.client.get(url, {"pagination": "cursor", **params})
+        names = []
+        while True:
+            data = response.json()
+            self.assertNotIn("count", data)
+            names.extend(item["name"] for item in data["results"])
+            if not data["next"]:
+                return names
+            response = self.client.get(data["next"])
+
+    def test_cursor_pages_follow_pk(self):
+        names = self.collect({})
+        self.assertEqual(
+            names,
+            list(Product.objects.order_by("pk").values_list("name", flat=True)),
+        )
+
+    def test_cursor_pages_follow_non_unique_ordering(self):
+        names = self.collect({"ordering": "-price"})
+        self.assertEqual(
+            names,
+            list(Product.objects.order_by("-price", "-pk").values_list("name", flat=True)),
+        )
+
+    def test_cursor_seeks_by_value_and_pk(self):
+        # Одна цена на несколько страниц подряд.
+        Product.objects.bulk_create(Product(name=f"Same {i:02}", price=100) for i in range(25))
+        url = reverse("shopapp:product-list")
+        response = self.client.get(url, {"pagination": "cursor", "ordering": "price"})
+        pages = [response.json()]
+        while pages[-1]["next"]:
+            with CaptureQueriesContext(connection) as queries:
+                pages.append(self.client.get(pages[-1]["next"]).json())
+            # Ни OFFSET, ни смещения в курсоре: на странице все цены повторяются.
+            self.assertFalse(any("OFFSET" in query["sql"] for query in queries))
+        back = self.client.get(pages[-1]["previous"]).json()
+        self.assertEqual(back["results"], pages[-2]["results"])
+        names = [item["name"] for page in pages for item in page["results"]]
+        self.assertEqual(names, list(Product.objects.order_by("price", "pk").values_list("name", flat=True)))
+
+    def test_page_number_mode_keeps_count(self):
+        response = self.client.get(reverse("shopapp:product-list"))
+        self.assertEqual(response.json()["count"], 25)
+
+
+class ProductFullTextSearchTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.laptop = Product.objects.create(name="Laptop Dell", description="Small and light")
+        cls.bag = Product.objects.create(name="Bag", description="Fits any laptop")
+        Product.objects.create(name="Desktop", description="Big tower")
+
+    def search(self, text: str) -> list:
+        response = self.client.get(reverse("shopapp:product-list"), {"search": text})
+        return [item["name"] for item in response.json()["results"]]
+
+    def test_prefix_search_ranks_name_matches_first(self):
+        self.assertEqual(self.search("lapt"), ["Laptop Dell", "Bag"])
+        self.assertEqual(self.search("lapt del"), ["Laptop Dell"])
+
+    def test_index_follows_updates_and_deletes(self):
+        Product.objects.filter(pk=self.bag.pk).update(description="Fits a tablet")
+        self.assertEqual(self.search("tablet"), ["Bag"])
+        self.assertEqual(self.search("laptop"), ["Laptop Dell"])
+        self.laptop.delete()
+        self.assertEqual(self.search("laptop"), [])
+
+    def test_punctuation_is_not_fts_syntax(self):
+        self.assertEqual(self.search('"desk" -('), ["Desktop"])
+
+
+class ProductConditionalGetTestCase(TestCase):
+    fixtures = [
+        "products-fixture.json",
+    ]
+
+    def test_list_returns_304_until_collection_changes(self):
+        url = reverse("shopapp:product-list")
+        response = self.client.get(url, {"archived": "false"})
+        etag = response["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {"archived": "false"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Product.objects.filter(archived=False).first().save()
+        response = self.client.get(url, {"archived": "false"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_api_detail_with_malformed_pk_returns_404(self):
+        url = reverse("shopapp:product-detail", kwargs={"pk": "abc"})
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_detail_page_returns_304(self):
+        product = Product.objects.first()
+        url = reverse("shopapp:product_details", kwargs={"pk": product.pk})
+        response = self.client.get(url)
+        self.assertIn("Last-Modified", response)
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_export_etag_follows_cache_version(self):
+        url = reverse("shopapp:products-export")
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_stale_export_keeps_its_etag(self):
+        url = reverse("shopapp:products-export")
+        etag = self.client.get(url)["ETag"]
+        bump_version(PRODUCTS_CACHE_NAMESPACE)
+        # Another worker is rebuilding: the previous payload is served
+        # under its own version, not the new one.
+        cache.add(products_export_dataset.lock_key, True, 30)
+        self.addCleanup(cache.delete, products_export_dataset.lock_key)
+        self.assertEqual(self.client.get(url)["ETag"], etag)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+class ProductsListPaginationTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Product.objects.bulk_create(
+            Product(name=f"Product {i:02}", description="x" * 1000)
+            for i in range(45)
+        )
+        products_changed.send(sender=Product)
+
+    def test_pages_are_trimmed_and_cached(self):
+        url = reverse("shopapp:products_list")
+        response = self.client.get(url, {"page": 3})
+        self.assertEqual(len(response.context["products"]), 5)
+        self.assertContains(response, "There are 45")
+        self.assertIn("description", response.context["products"][0].get_deferred_fields())
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {"page": 3})
+        self.assertContains(response, "Product 44")
+
+    def test_fragment_cache_invalidated_on_change(self):
+        url = reverse("shopapp:products_list")
+        self.client.get(url)
+        product = Product.objects.get(name="Product 00")
+        product.name = "Product 00 renamed"
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        response = self.client.get(url)
+        self.assertContains(response, "Product 00 renamed")
+
+
+class ProductImageDerivativesTestCase(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = self.settings(
+            MEDIA_ROOT=self.media_root,
+            SHOPAPP_IMAGE_WORKERS=0,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def make_image(self, size=(800, 600)) -> SimpleUploadedFile:
+        buffer = BytesIO()
+        Image.new("RGB", size, "red").save(buffer, "JPEG")
+        return SimpleUploadedFile("photo.jpg", buffer.getvalue(), "image/jpeg")
+
+    def test_preview_derivatives_and_srcset(self):
+        product = Product.objects.create(name="Camera")
+        with self.captureOnCommitCallbacks(execute=True):
+            product.preview = self.make_image()
+            product.save()
+        self.assertEqual((product.preview_width, product.preview_height), (800, 600))
+        for width in THUMBNAIL_WIDTHS:
+            for fmt in (None, "webp"):
+                name = derivative_name(product.preview.name, width, fmt)
+                self.assertTrue(os.path.exists(os.path.join(self.media_root, name)), name)
+
+        response = self.client.get(
+            reverse("shopapp:product_details", kwargs={"pk": product.pk})
+        )
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, '_320w.webp 320w')
+        self.assertContains(response, 'width="800" height="600"')
+
+    def test_srcset_does_not_touch_storage(self):
+        with patch("shopapp.images.default_storage.exists") as exists:
+            value = srcset("products/photo.jpg", 400, "webp")
+        exists.assert_not_called()
+        self.assertEqual(len(value.split(", ")), 2)
+        self.assertIn("derivatives/photo_320w.webp 320w", value)
+
+    def test_derivatives_scheduled_only_for_new_files(self):
+        product = Product.objects.create(name="Camera")
+        with patch("shopapp.signals.schedule_derivatives") as schedule:
+            product.preview = self.make_image()
+            product.save()
+            schedule.assert_called_once_with(product.preview.name)
+            schedule.reset_mock()
+            product.name = "Camera 2"
+            product.save()
+            ProductImage.objects.create(product=product, image=self.make_image()).save()
+        schedule.assert_called_once()
+
+    def test_up_to_date_derivatives_skip_decoding(self):
+        product = Product.objects.create(name="Camera")
+        with self.captureOnCommitCallbacks(execute=True):
+            product.preview = self.make_image()
+            product.save()
+        with patch("shopapp.images.ImageOps.exif_transpose") as transpose:
+            self.assertEqual(generate_derivatives(self.media_root, product.preview.name), [])
+        transpose.assert_not_called()
+
+    def test_built_derivatives_invalidate_product_caches(self):
+        product = Product.objects.create(name="Camera")
+        image = ProductImage.objects.create(product=product, image=self.make_image())
+        Product.objects.update(updated_at=timezone.now() - timedelta(days=1))
+        version = get_version(PRODUCTS_CACHE_NAMESPACE)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(build_derivatives(self.media_root, [image.image.name]), 6)
+        product.refresh_from_db()
+        self.assertGreater(product.updated_at, timezone.now() - timedelta(minutes=1))
+        self.assertNotEqual(get_version(PRODUCTS_CACHE_NAMESPACE), version)
+
+        version = get_version(PRODUCTS_CACHE_NAMESPACE)
+        self.assertEqual(build_derivatives(self.media_root, [image.image.name]), 0)
+        self.assertEqual(get_version(PRODUCTS_CACHE_NAMESPACE), version)
+
+    def test_update_view_replaces_images_in_bulk(self):
+        product = Product.objects.create(name="Camera", price="10.00")
+        old = ProductImage.objects.create(product=product, image=self.make_image())
+        old_path = os.path.join(self.media_root, old.image.name)
+        self.assertTrue(os.path.exists(old_path))
+
+        images = [self.make_image((64, 48)) for _ in range(30)]
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    reverse("shopapp:product_update", kwargs={"pk": product.pk}),
+                    {"name": "Camera", "price": "10.00", "discount": "0", "images": images},
+                )
+        self.assertEqual(response.status_code, 302)
+        self.assertLess(len(queries), 15)
+        self.assertFalse(os.path.exists(old_path))
+        new_images = list(product.images.all())
+        self.assertEqual(len(new_images), 30)
+        self.assertEqual((new_images[0].width, new_images[0].height), (64, 48))
+        for image in new_images:
+            self.assertTrue(os.path.exists(os.path.join(self.media_root, image.image.name)))
+
+
+class OrderTotalsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="totals", password="qwerty")
+        self.phone = Product.objects.create(name="Phone", price="100.00")
+        self.case = Product.objects.create(name="Case", price="15.50")
+        self.order = Order.objects.create(user=self.user, delivery_address="Street 1")
+
+    def assertTotals(self, total, item_count):
+        self.order.refresh_from_db()
+        self.assertEqual((str(self.order.total), self.order.item_count), (total, item_count))
+
+    def test_totals_follow_order_items(self):
+        self.order.products.add(self.phone, self.case)
+        self.assertTotals("115.50", 2)
+        self.order.products.add(self.phone)
+        self.assertTotals("115.50", 2)
+        self.order.products.remove(self.phone)
+        self.assertTotals("15.50", 1)
+        self.phone.orders.add(self.order)
+        self.assertTotals("115.50", 2)
+        self.case.orders.clear()
+        self.assertTotals("100.00", 1)
+        self.order.products.clear()
+        self.assertTotals("0.00", 0)
+
+    def test_totals_follow_prices_and_deletes(self):
+        self.order.products.set([self.phone, self.case])
+        phone = Product.objects.get(pk=self.phone.pk)
+        phone.price = "90.00"
+        phone.save()
+        self.assertTotals("105.50", 2)
+        self.case.delete()
+        self.assertTotals("90.00", 1)
+
+    def test_reconcile_command_fixes_drift(self):
+        self.order.products.add(self.phone, self.case)
+        Order.objects.update(total=0, item_count=0)
+        call_command("reconcile_order_totals", batch_size=1, stdout=StringIO())
+        self.assertTotals("115.50", 2)
+
+
+def _set_in_child(location, key, value):
+    TieredCache(location, {}).set(key, value)
+
+
+class TieredCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.location = os.path.join(directory.name, "cache.sqlite3")
+
+    def make_cache(self, **options):
+        return TieredCache(self.location, {"OPTIONS": options})
+
+    def test_operations(self):
+        cache = self.make_cache()
+        cache.set("product", {"name": "Laptop"})
+        self.assertEqual(cache.get("product"), {"name": "Laptop"})
+        self.assertEqual(cache.get("product"), {"name": "Laptop"})
+        self.assertFalse(cache.add("product", "other"))
+        self.assertTrue(cache.add("lock", 1, 60))
+        cache.set("expired", 1, -1)
+        self.assertIsNone(cache.get("expired"))
+        self.assertTrue(cache.add("expired", 2))
+        self.assertEqual(cache.incr("expired"), 3)
+        self.assertTrue(cache.delete("lock"))
+        self.assertIsNone(cache.get("lock"))
+
+        stats = cache.stats()
+        self.assertEqual((stats["l1_hits"], stats["l2_hits"], stats["misses"]), (1, 2, 2))
+        cache.clear()
+        self.assertIsNone(cache.get("product"))
+
+    def test_writes_invalidate_other_processes(self):
+        cache = self.make_cache()
+        cache.set("version", "a")
+        self.assertEqual(cache.get("version"), "a")
+        self.assertEqual(cache.get("version"), "a")  # from L1
+
+        child = multiprocessing.get_context("fork").Process(
+            target=_set_in_child, args=(self.location, "version", "b"),
+        )
+        child.start()
+        child.join(timeout=30)
+        self.assertEqual(cache.get("version"), "b")
+
+    def test_eviction(self):
+        cache = self.make_cache(MAX_ENTRIES=100)
+        for i in range(150):
+            cache.set(f"expired-{i}", i, -1)
+        for i in range(150):
+            cache.set(f"key-{i}", i, 60 + i)
+        cache.set("forever", 1, None)
+        while cache.evict():
+            pass
+        keys = [row[0] for row in cache._connection().execute("SELECT key FROM cache")]
+        self.assertEqual(len(keys), 100)
+        self.assertIn(cache.make_key("forever"), keys)
+        self.assertNotIn(cache.make_key("key-0"), keys)
+        self.assertIn(cache.make_key("key-149"), keys)
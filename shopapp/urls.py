@@ -15,13 +15,18 @@ from .views import (
     OrderUpdateView,
     OrderDeleteView,
     ProductsExportView,
+    ProductsExportCacheStatsView,
     ProductViewSet,
+    OrderViewSet,
+    ReportViewSet,
 )
 
 app_name = "shopapp"
 
 routers = DefaultRouter()
 routers.register(r"products", ProductViewSet)
+routers.register(r"orders", OrderViewSet, basename="order")
+routers.register(r"reports", ReportViewSet, basename="report")
 
 urlpatterns = [
     path("", ShopIndexView.as_view() , name="index"),
@@ -33,6 +38,7 @@ urlpatterns = [
     path("products/confirm-delete/<int:pk>/", ProductDeleteView.as_view(), name ="product_delete"),
     path("products/update/<int:pk>/", ProductUpdateView.as_view(), name ="product_update"),
     path("products/export", ProductsExportView.as_view(), name ="products-export"),
+    path("products/export/cache-stats/", ProductsExportCacheStatsView.as_view(), name="products-export-cache-stats"),
     path("orders/", OrderListView.as_view(), name="orders_list"),
     path("orders/create/", OrderCreateView.as_view(), name="order_create"),
     path("orders/<int:pk>/", OrderDetailView.as_view(), name="order_details"),
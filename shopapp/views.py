@@ -1,29 +1,62 @@
 import logging
-from csv import DictWriter
+from datetime import date, datetime, time, timedelta
+from functools import partial
 from timeit import default_timer
 
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.models import Group
-from django.http import HttpResponse, HttpRequest, HttpResponseRedirect, JsonResponse
+from django.http import (
+    HttpResponse,
+    HttpRequest,
+    HttpResponseRedirect,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import render, redirect, reverse
+from django.db.models import Prefetch, Sum
 from django.urls import reverse_lazy
+from django.utils import timezone
 from django.views import View
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django_filters.rest_framework import DjangoFilterBackend
-from django.core.cache import cache
-from rest_framework.viewsets import ModelViewSet
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.viewsets import ModelViewSet, ViewSet
 from rest_framework.decorators import action
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework import status
 from drf_spectacular.utils import extend_schema, OpenApiResponse
 from yaml import serialize
 
-from .models import Product, Order, ProductImage
-from .forms import GroupForm, ProductForm
-from .serialiizers import ProductSerializer
-from .common import save_csv_products
+from jobsapp.registry import enqueue
+from jobsapp.serializers import JobSerializer
+from mysite.caching import CachedDataset, get_version
+from mysite.conditional import (
+    collection_validators,
+    conditional_response,
+    object_validators,
+)
+
+from .models import CatalogPriceStats, DailyProductSales, Product, Order, RollupState
+from .forms import GroupForm, ProductForm, OrderFilterForm
+from .serialiizers import (
+    BulkOrderSerializer,
+    CatalogPriceStatsSerializer,
+    OrderSerializer,
+    ProductSerializer,
+    SalesDaySerializer,
+    SalesReportQuerySerializer,
+    TopProductSerializer,
+)
+from .pagination import ProductPagination, ProductsPaginator
+from .search import ProductFullTextSearchFilter, RankedOrderingFilter
+from .common import iter_csv, gzip_chunks
+from .tasks import store_import_file
+from .images import replace_product_images
+from .orders import bulk_create_orders
+from .rollups import SALES_ROLLUP
+from .signals import PRODUCTS_CACHE_NAMESPACE
 
 log = logging.getLogger(__name__)
 
@@ -45,20 +78,22 @@ class ProductViewSet(ModelViewSet):
     - сортировка результатов запроса.
 
     Используемые фильтры:
-    - SearchFilter — для текстового поиска;
+    - ProductFullTextSearchFilter — полнотекстовый поиск (FTS5);
     - DjangoFilterBackend — для точной фильтрации;
-    - OrderingFilter — для сортировки.
+    - RankedOrderingFilter — сортировка, при поиске — по релевантности.
 
     По умолчанию результаты сортируются по первичному ключу (pk).
+    Список поддерживает keyset-пагинацию (``?pagination=cursor``),
+    см. :class:`shopapp.pagination.ProductPagination`.
     """
 
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
 
     filter_backends = [
-        SearchFilter,
+        ProductFullTextSearchFilter,
         DjangoFilterBackend,
-        OrderingFilter,
+        RankedOrderingFilter,
     ]
 
     search_fields = [
@@ -74,8 +109,9 @@ class ProductViewSet(ModelViewSet):
         "archived",
     ]
 
-    ordering_fields = ["pk"]
+    ordering_fields = ["pk", "name", "price", "created_at"]
     ordering = ["pk"]
+    pagination_class = ProductPagination
 
     @extend_schema(
         summary="Get one product dy ID",
@@ -85,14 +121,47 @@ class ProductViewSet(ModelViewSet):
             404: OpenApiResponse(description="Empty response, product by ID not found"),
         }
     )
-    def retrieve(self, *args, **kwargs):
-        return super().retrieve(*args, **kwargs)
+    def retrieve(self, request: Request, *args, **kwargs):
+        validators = object_validators(self.get_queryset(), kwargs[self.lookup_field])
+        return conditional_response(
+            request,
+            self.format_validators(request, validators),
+            partial(super().retrieve, request, *args, **kwargs),
+        )
+
+    def list(self, request: Request, *args, **kwargs):
+        """
+        Список товаров с поддержкой условных GET.
+
+        ETag/Last-Modified считаются одним агрегатным запросом
+        по отфильтрованной выборке; при совпадении отдаётся 304
+        без сериализации.
+        """
+        validators = collection_validators(self.filter_queryset(self.get_queryset()))
+        return conditional_response(
+            request,
+            self.format_validators(request, validators),
+            partial(super().list, request, *args, **kwargs),
+        )
+
+    @staticmethod
+    def format_validators(request: Request, validators):
+        """ETag зависит и от формата ответа (json, api, ...)."""
+        etag, last_modified = validators
+        if etag is not None:
+            etag = f"{request.accepted_renderer.format}-{etag}"
+        return etag, last_modified
 
     @action(methods=["get"], detail=False)
     def download_csv(self, request: Request):
-        response = HttpResponse(content_type='text/csv')
-        filename = 'products-export.csv'
-        response['Content-Disposition'] = f'attachment; filename={filename}'
+        """
+        Потоковая выгрузка товаров в CSV.
+
+        Учитывает те же фильтры, поиск и сортировку, что и список.
+        Строки читаются с серверного курсора и сразу уходят клиенту,
+        поэтому память воркера не растёт вместе с каталогом.
+        С параметром ``?compress=gzip`` файл сжимается на лету.
+        """
         queryset = self.filter_queryset(self.get_queryset())
         fields = [
             "name",
@@ -100,15 +169,15 @@ class ProductViewSet(ModelViewSet):
             "price",
             "discount",
         ]
-        queryset = queryset.only(*fields)
-        write = DictWriter(response, fieldnames=fields)
-        write.writeheader()
-
-        for product in queryset:
-            write.writerow({
-                field: getattr(product, field)
-                for field in fields
-            })
+        chunks = iter_csv(queryset, fields)
+        filename = "products-export.csv"
+        content_type = "text/csv"
+        if request.query_params.get("compress") == "gzip":
+            chunks = gzip_chunks(chunks)
+            filename += ".gz"
+            content_type = "application/gzip"
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response["Content-Disposition"] = f"attachment; filename={filename}"
         return response
 
     @action(
@@ -117,12 +186,168 @@ class ProductViewSet(ModelViewSet):
         parser_classes=[MultiPartParser],
     )
     def upload_csv(self, request: Request):
-        products = save_csv_products(
-            file=request.FILES['file'].file,
-            encoding=request.encoding,
+        """
+        Импорт товаров из CSV фоновой задачей.
+
+        Файл сохраняется, импорт ставится в очередь; ответ ``202``
+        содержит задачу (см. ``jobs/api/jobs/<id>/``). Её ``result`` —
+        сводка: сколько товаров добавлено, обновлено по sku и какие
+        строки отклонены (с номерами строк и ошибками).
+        """
+        job = enqueue(
+            "shopapp.import_products_csv",
+            {
+                "name": store_import_file(request.FILES["file"]),
+                "encoding": request.encoding,
+            },
+            user=request.user,
         )
-        serializer = self.get_serializer(products, many=True)
-        return Response(serializer.data)
+        return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+class OrderViewSet(ModelViewSet):
+    """
+    ViewSet для работы с заказами (Order).
+
+    Пользователь видит и создаёт только свои заказы, персонал — любые.
+    Итоги заказа (total, item_count) только для чтения.
+
+    ``POST orders/bulk/`` создаёт пакет заказов одной транзакцией
+    (см. :func:`shopapp.orders.bulk_create_orders`); заголовок
+    ``Idempotency-Key`` делает повтор запроса безопасным.
+    """
+
+    serializer_class = OrderSerializer
+    permission_classes = [IsAuthenticated]
+    filterset_fields = ["user", "promocode"]
+
+    def get_queryset(self):
+        queryset = (
+            Order.objects
+            .select_related("user")
+            .prefetch_related(Prefetch("products", queryset=Product.objects.only("pk")))
+            .order_by("-created_at", "-pk")
+        )
+        if getattr(self, "swagger_fake_view", False):
+            return queryset.none()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(user=self.request.user)
+        return queryset
+
+    def perform_create(self, serializer):
+        if self.request.user.is_staff and serializer.validated_data.get("user"):
+            serializer.save()
+        else:
+            serializer.save(user=self.request.user)
+
+    def perform_update(self, serializer):
+        if self.request.user.is_staff:
+            serializer.save()
+        else:
+            serializer.save(user=self.request.user)
+
+    @extend_schema(
+        summary="Create orders in bulk",
+        request=BulkOrderSerializer,
+        responses={
+            201: OpenApiResponse(description="Orders created: ids in payload order"),
+            200: OpenApiResponse(description="Repeated Idempotency-Key, orders of the first request"),
+        },
+    )
+    @action(methods=["post"], detail=False, url_path="bulk")
+    def bulk(self, request: Request):
+        """Массовое создание заказов; ``user`` в заказах учитывается только для персонала."""
+        serializer = BulkOrderSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data["orders"]
+        if not request.user.is_staff:
+            for item in items:
+                item.pop("user", None)
+        orders, created = bulk_create_orders(
+            items,
+            serializer.validated_data["prices"],
+            user=request.user,
+            key=request.headers.get("Idempotency-Key"),
+        )
+        return Response(
+            {"created": created, "ids": [order.pk for order in orders]},
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+
+class ReportViewSet(ViewSet):
+    """
+    Отчёты для дашборда по сводным таблицам (только чтение).
+
+    Запросы читают только сводки (:mod:`shopapp.rollups`), поэтому их
+    время не зависит от числа заказов. Ответ содержит ``high_water`` и
+    ``updated_at`` сводки: данные актуальны на момент её последней сборки.
+    """
+
+    permission_classes = [IsAdminUser]
+    serializer_class = SalesDaySerializer
+
+    def sales_queryset(self, params: dict):
+        queryset = DailyProductSales.objects.order_by()
+        if params.get("date_from"):
+            queryset = queryset.filter(day__gte=params["date_from"])
+        if params.get("date_to"):
+            queryset = queryset.filter(day__lte=params["date_to"])
+        if params.get("product"):
+            queryset = queryset.filter(product_id=params["product"])
+        return queryset
+
+    def freshness(self) -> dict:
+        state = RollupState.objects.filter(pk=SALES_ROLLUP).first()
+        return {
+            "high_water": state.high_water if state else 0,
+            "updated_at": state.updated_at if state else None,
+        }
+
+    @extend_schema(
+        summary="Daily sales totals",
+        parameters=[SalesReportQuerySerializer],
+        responses=SalesDaySerializer(many=True),
+    )
+    @action(methods=["get"], detail=False)
+    def sales(self, request: Request):
+        """Количество и выручка по дням."""
+        params = SalesReportQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        days = (
+            self.sales_queryset(params.validated_data)
+            .values("day")
+            .annotate(quantity=Sum("quantity"), revenue=Sum("revenue"))
+            .order_by("day")
+        )
+        return Response({**self.freshness(), "results": SalesDaySerializer(days, many=True).data})
+
+    @extend_schema(
+        summary="Best selling products",
+        parameters=[SalesReportQuerySerializer],
+        responses=TopProductSerializer(many=True),
+    )
+    @action(methods=["get"], detail=False, url_path="top-products")
+    def top_products(self, request: Request):
+        """Товары с наибольшей выручкой за период."""
+        params = SalesReportQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        products = (
+            self.sales_queryset(params.validated_data)
+            .values("product_id", "product__name")
+            .annotate(quantity=Sum("quantity"), revenue=Sum("revenue"))
+            .order_by("-revenue", "product_id")[:params.validated_data["limit"]]
+        )
+        return Response({
+            **self.freshness(),
+            "results": TopProductSerializer(products, many=True).data,
+        })
+
+    @extend_schema(summary="Catalog price statistics", responses=CatalogPriceStatsSerializer)
+    @action(methods=["get"], detail=False)
+    def catalog(self, request: Request):
+        stats = CatalogPriceStats.objects.filter(pk=1).first() or CatalogPriceStats()
+        return Response(CatalogPriceStatsSerializer(stats).data)
 
 
 class ShopIndexView(View):
@@ -169,15 +394,48 @@ class ProductDetailsView(DetailView):
     model = Product
     context_object_name = "product"
 
+    def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        validators = object_validators(Product.objects, kwargs["pk"])
+        return conditional_response(
+            request,
+            validators,
+            partial(super().get, request, *args, **kwargs),
+        )
+
 
 class ProductsListView(ListView):
-    # model = Product
-    queryset = Product.objects.select_related("images")
+    """
+    Постраничный список товаров.
+
+    Из БД выбираются только выводимые поля, количество товаров
+    кэшируется, а сама разметка страницы кэшируется фрагментом
+    (по номеру страницы, языку и версии кэша товаров).
+    """
+
     template_name = "shopapp/products-list.html"
     context_object_name = "products"
+    paginate_by = 20
+    paginator_class = ProductsPaginator
 
     def get_queryset(self):
-        return Product.objects.filter(archived=False)
+        return (
+            Product.objects
+            .filter(archived=False)
+            .only(
+                "pk",
+                "name",
+                "price",
+                "discount",
+                "preview",
+                "preview_width",
+                "preview_height",
+            )
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["products_version"] = get_version(PRODUCTS_CACHE_NAMESPACE)
+        return context
 
 
 class ProductCreateView(CreateView):
@@ -202,17 +460,9 @@ class ProductUpdateView(UpdateView):
 
         images = self.request.FILES.getlist("images")
 
-        # Если новые изображения вообще пришли
+        # Если новые изображения вообще пришли — заменяем ими старые
         if images:
-            # 1. удаляем старые изображения (и файлы, и записи)
-            self.object.images.all().delete()
-
-            # 2. сохраняем только новые
-            for image in images:
-                ProductImage.objects.create(
-                    product=self.object,
-                    image=image,
-                )
+            replace_product_images(self.object, images)
         return response
 
 
@@ -227,11 +477,57 @@ class ProductDeleteView(DeleteView):
         return HttpResponseRedirect(success_url)
 
 
+def start_of_day(day: date) -> datetime:
+    """Начало дня в текущем часовом поясе."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
 class OrderListView(LoginRequiredMixin, ListView):
-    queryset = (Order.objects
-        .select_related("user")
-        .prefetch_related("products")
-    )
+    """
+    Постраничный список заказов.
+
+    Поддерживает фильтры ``?user=<id>``, ``?created_after=`` и
+    ``?created_before=`` (даты включительно). Товары подгружаются
+    одним запросом на страницу и только с выводимыми полями.
+    """
+
+    paginate_by = 20
+
+    def get_filter_form(self) -> OrderFilterForm:
+        if not hasattr(self, "filter_form"):
+            self.filter_form = OrderFilterForm(self.request.GET)
+        return self.filter_form
+
+    def get_queryset(self):
+        queryset = (
+            Order.objects
+            .select_related("user")
+            .prefetch_related(
+                Prefetch("products", queryset=Product.objects.only("pk", "name", "price")),
+            )
+            .order_by("-created_at", "-pk")
+        )
+        form = self.get_filter_form()
+        if form.is_valid():
+            data = form.cleaned_data
+            if data["user"]:
+                queryset = queryset.filter(user_id=data["user"])
+            # Границы-моменты, а не created_at__date: так работает индекс.
+            if data["created_after"]:
+                queryset = queryset.filter(created_at__gte=start_of_day(data["created_after"]))
+            if data["created_before"]:
+                queryset = queryset.filter(
+                    created_at__lt=start_of_day(data["created_before"] + timedelta(days=1)),
+                )
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.copy()
+        query.pop("page", None)
+        context["filter_form"] = self.get_filter_form()
+        context["filter_query"] = query.urlencode()
+        return context
 
 
 class OrderDetailView(DetailView):
@@ -267,20 +563,48 @@ class OrderDeleteView(DeleteView):
         return HttpResponseRedirect(success_url)
 
 
+def build_products_export() -> list:
+    """Собирает данные для выгрузки всех товаров."""
+    return list(
+        Product.objects
+        .order_by("pk")
+        .values("pk", "name", "price", "archived")
+    )
+
+
+products_export_dataset = CachedDataset(
+    "products_export",
+    build_products_export,
+    namespace=PRODUCTS_CACHE_NAMESPACE,
+)
+
+
 class ProductsExportView(View):
+    """
+    Выгрузка всех товаров в JSON.
+
+    Данные берутся из кэша, который сбрасывается при изменении товаров;
+    при промахе пересборку выполняет только один воркер.
+    Поддерживает If-None-Match по версии кэша.
+    """
+
+    def get(self, request: HttpRequest) -> HttpResponse:
+        # ETag — версия кэша, под которой собраны отдаваемые данные
+        # (пока пересборка не закончена, это ещё предыдущая версия);
+        # запроса к БД не требует.
+        version, products = products_export_dataset.get_versioned()
+        return conditional_response(
+            request,
+            (version, None),
+            lambda: JsonResponse({"products": products}),
+        )
+
+
+class ProductsExportCacheStatsView(UserPassesTestMixin, View):
+    """Счётчики кэша выгрузки товаров (для персонала)."""
+
+    def test_func(self):
+        return self.request.user.is_staff
+
     def get(self, request: HttpRequest) -> JsonResponse:
-        cache_key = "products_data_export"
-        products_data = cache.get(cache_key)
-        if products_data is None:
-            products = Product.objects.order_by("pk").all()
-            products_data = [
-                {
-                    "pk": product.pk,
-                    "name": product.name,
-                    "price": product.price,
-                    "archived": product.archived,
-                }
-            for product in products
-            ]
-        cache.set(cache_key, products_data, 300)
-        return JsonResponse({"products": products_data})
+        return JsonResponse(products_export_dataset.stats())